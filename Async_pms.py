@@ -0,0 +1,349 @@
+"""asyncio version of the Backend_pms API, on psycopg 3 and its async connection pool.
+
+Covers employees, goals, tasks, feedback and insights with the same names, rows
+and error handling as the blocking functions. Independent queries run at the
+same time on separate pooled connections: get_goal_details() loads a goal's
+tasks and feedback together, and get_performance_history() loads all tasks and
+feedback together once the goals are known. Reads share Backend_pms's cache and
+writes invalidate it, so sync and async callers in one process stay consistent.
+
+Needs the optional psycopg 3 packages (pip install "psycopg[binary,pool]"):
+
+    async def main():
+        await abe.init_pool()
+        tasks, feedback = await abe.get_goal_details(goal_id)
+        await abe.close_pool()
+"""
+import asyncio
+import contextvars
+import os
+from contextlib import asynccontextmanager
+from functools import wraps
+
+try:
+    import psycopg
+    from psycopg.conninfo import make_conninfo
+    from psycopg_pool import AsyncConnectionPool, PoolTimeout
+except ImportError:
+    psycopg = None
+
+import Backend_pms as be
+
+# --- Database Connection ---
+_pool = None
+_pool_lock = asyncio.Lock()
+_current = contextvars.ContextVar("pms_async_connection", default=None)
+_pending = contextvars.ContextVar("pms_async_pending_invalidations", default=None)
+_failed = contextvars.ContextVar("pms_async_connection_failed", default=None)
+
+async def init_pool(minconn=None, maxconn=None, **connect_kwargs):
+    """Creates (or recreates) the async connection pool.
+
+    Uses the same DB_* and DB_POOL_* environment variables as Backend_pms.
+    """
+    global _pool
+    if psycopg is None:
+        raise RuntimeError('Async_pms needs psycopg 3: pip install "psycopg[binary,pool]"')
+    if minconn is None:
+        minconn = int(os.environ.get("DB_POOL_MIN", 1))
+    if maxconn is None:
+        maxconn = int(os.environ.get("DB_POOL_MAX", 10))
+    params = be._connection_params()
+    params["dbname"] = params.pop("database")
+    params.update(connect_kwargs)
+    if _pool is not None:
+        await _pool.close()
+    _pool = AsyncConnectionPool(
+        make_conninfo(**params),
+        min_size=minconn,
+        max_size=maxconn,
+        timeout=float(os.environ.get("DB_POOL_TIMEOUT", 30)),
+        open=False,
+    )
+    await _pool.open()
+    return _pool
+
+async def close_pool():
+    """Closes every connection held by the pool."""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+    _pool = None
+
+@asynccontextmanager
+async def transaction():
+    """Unit of work: calls awaited inside the block share one connection and one commit.
+
+    Queries gathered inside a transaction take turns on its connection.
+    """
+    conn = _current.get()
+    if conn is not None:
+        yield conn
+        return
+    async with _connection() as conn:
+        if conn is None:
+            raise psycopg.OperationalError("Could not obtain a database connection.")
+        token = _current.set(conn)
+        try:
+            yield conn
+        finally:
+            _current.reset(token)
+
+@asynccontextmanager
+async def _connection():
+    """Yields the current transaction's connection, or borrows one and commits it on exit.
+
+    Yields None if no connection could be obtained.
+    """
+    conn = _current.get()
+    if conn is not None:
+        yield conn
+        return
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                await init_pool()
+    try:
+        conn = await _pool.getconn()
+    except (psycopg.OperationalError, PoolTimeout) as e:
+        print(f"Error connecting to the database: {e}")
+        _failed.set(True)
+        yield None
+        return
+    pending = set()
+    token = _pending.set(pending)
+    try:
+        yield conn
+        await conn.commit()
+    except BaseException:
+        await conn.rollback()
+        raise
+    finally:
+        _pending.reset(token)
+        await _pool.putconn(conn)
+        # Readers may have re-cached a key between the write and the commit.
+        be._cache.invalidate(*pending)
+
+# --- Shared Cache ---
+def _cached(entity):
+    """Async counterpart of Backend_pms._cached, using the same keys and cache."""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            if _current.get() is not None:
+                return await func(*args, **kwargs)
+            key = (entity,) + args + tuple(sorted(kwargs.items()))
+            hit, value = be._cache.get(key)
+            if hit:
+                return list(value)
+            generation = be._cache.generation
+            token = _failed.set(False)
+            try:
+                value = await func(*args, **kwargs)
+                failed = _failed.get()
+            finally:
+                _failed.reset(token)
+            if not failed:
+                be._cache.put(key, list(value), generation)
+            return value
+        return wrapper
+    return decorator
+
+def _invalidate(*keys):
+    be._cache.invalidate(*keys)
+    pending = _pending.get()
+    if pending is not None:
+        pending.update(keys)
+
+async def _execute(conn, query, params=()):
+    async with conn.cursor() as cur:
+        await cur.execute(query, params)
+
+async def _fetchall(conn, query, params=()):
+    async with conn.cursor() as cur:
+        await cur.execute(query, params)
+        return await cur.fetchall()
+
+async def _fetchone(conn, query, params=()):
+    async with conn.cursor() as cur:
+        await cur.execute(query, params)
+        return await cur.fetchone()
+
+# --- Employees ---
+async def create_employee(name, manager_id=None):
+    """Creates a new employee."""
+    async with _connection() as conn:
+        if conn:
+            await _execute(conn, be._CREATE_EMPLOYEE_SQL, (name, manager_id))
+            _invalidate(("employees",), *be._HIERARCHY_ENTITIES)
+
+@_cached("employees")
+async def get_employees():
+    """Retrieves all employees."""
+    async with _connection() as conn:
+        if conn:
+            return await _fetchall(conn, be._EMPLOYEES_SQL)
+    return []
+
+# --- Goals ---
+async def create_goal(employee_id, description, due_date):
+    """Creates a new Draft goal for an employee."""
+    async with _connection() as conn:
+        if conn:
+            await _execute(conn, be._CREATE_GOAL_SQL, (employee_id, description, due_date))
+            _invalidate(("goals", employee_id))
+
+@_cached("goals")
+async def get_goals_for_employee(employee_id):
+    """Retrieves all goals for a specific employee."""
+    async with _connection() as conn:
+        if conn:
+            return await _fetchall(conn, be._GOALS_FOR_EMPLOYEE_SQL, (employee_id,))
+    return []
+
+async def update_goal_status(goal_id, status):
+    """Updates the status of a goal."""
+    async with _connection() as conn:
+        if conn:
+            row = await _fetchone(conn, be._UPDATE_GOAL_STATUS_SQL, (status, goal_id))
+            if row:
+                # Completing a goal also inserts automated feedback.
+                _invalidate(("goals", row[0]), ("feedback", goal_id))
+
+async def delete_goal(goal_id):
+    """Deletes a goal with its tasks and feedback."""
+    async with _connection() as conn:
+        if conn:
+            row = await _fetchone(conn, be._DELETE_GOAL_SQL, (goal_id,))
+            if row:
+                _invalidate(("goals", row[0]), ("tasks", goal_id), ("feedback", goal_id))
+
+# --- Tasks ---
+async def create_task(goal_id, description):
+    """Logs a task for a goal."""
+    async with _connection() as conn:
+        if conn:
+            await _execute(conn, be._CREATE_TASK_SQL, (goal_id, description))
+            _invalidate(("tasks", goal_id))
+
+@_cached("tasks")
+async def get_tasks_for_goal(goal_id):
+    """Retrieves all tasks for a specific goal."""
+    async with _connection() as conn:
+        if conn:
+            return await _fetchall(conn, be._TASKS_FOR_GOAL_SQL, (goal_id,))
+    return []
+
+async def approve_task(task_id):
+    """Approves a task."""
+    async with _connection() as conn:
+        if conn:
+            row = await _fetchone(conn, be._APPROVE_TASK_SQL, (task_id,))
+            if row:
+                _invalidate(("tasks", row[0]))
+
+async def delete_task(task_id):
+    """Deletes a task."""
+    async with _connection() as conn:
+        if conn:
+            row = await _fetchone(conn, be._DELETE_TASK_SQL, (task_id,))
+            if row:
+                _invalidate(("tasks", row[0]))
+
+# --- Feedback ---
+async def create_feedback(goal_id, manager_id, feedback_text):
+    """Adds a manager's written feedback to a goal."""
+    async with _connection() as conn:
+        if conn:
+            await _execute(conn, be._CREATE_FEEDBACK_SQL, (goal_id, manager_id, feedback_text))
+            _invalidate(("feedback", goal_id))
+
+@_cached("feedback")
+async def get_feedback_for_goal(goal_id):
+    """Retrieves all feedback for a specific goal."""
+    async with _connection() as conn:
+        if conn:
+            return await _fetchall(conn, be._FEEDBACK_FOR_GOAL_SQL, (goal_id,))
+    return []
+
+# --- Batched and Concurrent Loaders ---
+async def _load_many(entity, goal_ids, query):
+    """Serves goal_ids from the shared cache where possible and fetches the rest in one query."""
+    result = {}
+    in_transaction = _current.get() is not None
+    missing = []
+    for goal_id in dict.fromkeys(goal_ids):
+        hit, value = (False, None) if in_transaction else be._cache.get((entity, goal_id))
+        if hit:
+            result[goal_id] = list(value)
+        else:
+            missing.append(goal_id)
+    if missing:
+        generation = be._cache.generation
+        async with _connection() as conn:
+            if conn:
+                loaded = be._group_by_goal(missing, await _fetchall(conn, query, (missing,)))
+                if not in_transaction:
+                    for goal_id, rows in loaded.items():
+                        be._cache.put((entity, goal_id), list(rows), generation)
+                result.update(loaded)
+        for goal_id in missing:
+            result.setdefault(goal_id, [])
+    return result
+
+async def get_tasks_for_goals(goal_ids):
+    """Retrieves the tasks for a list of goals, as a dict of goal id to task rows."""
+    return await _load_many("tasks", goal_ids, be._TASKS_FOR_GOALS_SQL)
+
+async def get_feedback_for_goals(goal_ids):
+    """Retrieves the feedback for a list of goals, as a dict of goal id to feedback rows."""
+    return await _load_many("feedback", goal_ids, be._FEEDBACK_FOR_GOALS_SQL)
+
+async def get_goal_details(goal_id):
+    """Loads a goal's tasks and feedback at the same time; returns (tasks, feedback)."""
+    return tuple(await asyncio.gather(get_tasks_for_goal(goal_id), get_feedback_for_goal(goal_id)))
+
+async def get_performance_history(employee_id):
+    """Like Backend_pms.get_performance_history(); tasks and feedback are loaded concurrently."""
+    goals = await get_goals_for_employee(employee_id)
+    goal_ids = [goal[0] for goal in goals]
+    tasks, feedback = await asyncio.gather(get_tasks_for_goals(goal_ids), get_feedback_for_goals(goal_ids))
+    return [(goal, tasks[goal[0]], feedback[goal[0]]) for goal in goals]
+
+# --- Business Insights ---
+async def get_performance_insights(top_n=5):
+    """Gathers the dashboard metrics from the precomputed goal statistics in one query."""
+    async with _connection() as conn:
+        if conn:
+            row = await _fetchone(conn, be._INSIGHTS_SQL, be._insights_params(top_n))
+            return be._insights_from_row(row)
+    return {}
+
+async def get_employee_percentile(employee_id):
+    """Returns the percentage of employees who have completed fewer goals than this one."""
+    async with _connection() as conn:
+        if conn:
+            row = await _fetchone(conn, be._PERCENTILE_SQL, (employee_id,))
+            return float(row[0]) if row else None
+    return None
+
+async def get_employee_percentiles(employee_ids):
+    """Percentiles of a list of employees in one query, as a dict of employee id to percentile.
+
+    Employees without goal statistics map to None, as in get_employee_percentile().
+    """
+    employee_ids = list(employee_ids)
+    percentiles = dict.fromkeys(employee_ids)
+    if employee_ids:
+        async with _connection() as conn:
+            if conn:
+                rows = await _fetchall(conn, be._PERCENTILES_SQL, (employee_ids,))
+                percentiles.update((employee_id, float(percentile)) for employee_id, percentile in rows)
+    return percentiles
+
+async def get_employee_insights(employee_ids, top_n=5):
+    """Dashboard metrics plus each listed employee's percentile, as two concurrent queries.
+
+    Returns (insights, {employee_id: percentile}).
+    """
+    return tuple(await asyncio.gather(get_performance_insights(top_n), get_employee_percentiles(employee_ids)))
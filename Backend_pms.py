@@ -1,309 +1,1825 @@
 import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+import inspect
+import itertools
+import json
 import os
+import select
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
 from datetime import date
 
+import Metrics_pms as metrics
+import Migrations_pms as migrations
+
 # --- Database Connection ---
-def get_db_connection():
-    """Establishes a connection to the PostgreSQL database."""
+_pool = None
+_pool_slots = None
+_pool_lock = threading.Lock()
+_borrowed = {}
+_local = threading.local()
+
+def _connection_params():
+    """Connection settings taken from the DB_* environment variables."""
+    return {
+        "host": os.environ.get("DB_HOST", "localhost"),
+        "database": os.environ.get("DB_NAME", "PMS"),
+        "user": os.environ.get("DB_USER", "postgres"),
+        "password": os.environ.get("DB_PASSWORD", "Suy23"),
+    }
+
+def init_connection_pool(minconn=None, maxconn=None, replica_dsns=None, **connect_kwargs):
+    """Creates (or recreates) the process-wide connection pool.
+
+    Sizes default to the DB_POOL_MIN and DB_POOL_MAX environment variables, and
+    replica_dsns to DB_REPLICA_DSNS. Extra keyword arguments are passed through to
+    psycopg2.connect().
+    """
+    with _pool_lock:
+        return _create_pool(minconn, maxconn, connect_kwargs, replica_dsns)
+
+def _create_pool(minconn, maxconn, connect_kwargs, replica_dsns=None):
+    """Replaces the pool and the replica pools; the caller must hold _pool_lock."""
+    global _pool, _pool_slots, _replicas
+    if minconn is None:
+        minconn = int(os.environ.get("DB_POOL_MIN", 1))
+    if maxconn is None:
+        maxconn = int(os.environ.get("DB_POOL_MAX", 10))
+    params = _connection_params()
+    if metrics.ENABLED:
+        params["cursor_factory"] = metrics.InstrumentedCursor
+    params.update(connect_kwargs)
+    if _pool is not None:
+        _pool.closeall()
+    for replica in _replicas:
+        replica.close()
+    if replica_dsns is None:
+        replica_dsns = [dsn.strip() for dsn in os.environ.get("DB_REPLICA_DSNS", "").split(";") if dsn.strip()]
+    _replicas = [_Replica(dsn, minconn, maxconn, params) for dsn in replica_dsns]
     try:
-        conn = psycopg2.connect(
-            host=os.environ.get("DB_HOST", "localhost"),
-            database=os.environ.get("DB_NAME", "PMS"),
-            user=os.environ.get("DB_USER", "postgres"),
-            password=os.environ.get("DB_PASSWORD", "Suy23")
-        )
-        return conn
+        _pool = psycopg2.pool.ThreadedConnectionPool(minconn, maxconn, **params)
+        _pool_slots = threading.BoundedSemaphore(maxconn)
     except psycopg2.OperationalError as e:
+        print(f"Error connecting to the database: {e}")
+        _pool = None
+        _pool_slots = None
+    return _pool
+
+def close_connection_pool():
+    """Closes every connection held by the pool."""
+    global _pool, _pool_slots, _replicas
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+        for replica in _replicas:
+            replica.close()
+        _pool = None
+        _pool_slots = None
+        _replicas = []
+
+def get_db_connection():
+    """Borrows a connection from the pool, waiting up to DB_POOL_TIMEOUT seconds for a free one."""
+    with _pool_lock:
+        if _pool is None:
+            _create_pool(None, None, {})
+        pool, slots = _pool, _pool_slots
+    if pool is None:
+        return None
+    return _borrow(pool, slots)
+
+def _borrow(pool, slots):
+    """Takes a connection from pool, waiting on slots; returns None on failure."""
+    started = time.perf_counter()
+    if not slots.acquire(timeout=float(os.environ.get("DB_POOL_TIMEOUT", 30))):
+        print("Error connecting to the database: connection pool exhausted")
+        return None
+    try:
+        conn = pool.getconn()
+    except (psycopg2.OperationalError, psycopg2.pool.PoolError) as e:
+        slots.release()
         print(f"Error connecting to the database: {e}")
         return None
+    metrics.record_acquire((time.perf_counter() - started) * 1000)
+    _borrowed[id(conn)] = (pool, slots)
+    return conn
 
-def setup_database():
-    """Sets up the necessary tables in the database if they don't exist."""
+def release_db_connection(conn):
+    """Returns a borrowed connection to the pool, discarding it if it is broken."""
+    pool, slots = _borrowed.pop(id(conn), (None, None))
+    if pool is None:
+        conn.close()
+        return
+    broken = bool(conn.closed)
+    if not broken and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            broken = True
+    try:
+        pool.putconn(conn, close=broken)
+    except psycopg2.pool.PoolError:
+        # The pool was closed or recreated while the connection was out.
+        conn.close()
+    finally:
+        slots.release()
+
+@contextmanager
+def transaction():
+    """Unit of work: backend calls made inside the block share one connection and one commit.
+
+    The transaction is committed when the block exits normally and rolled back
+    if it raises. Nested blocks join the outer transaction.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        yield conn
+        return
     conn = get_db_connection()
-    if conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS employees (
-                    id SERIAL PRIMARY KEY,
-                    name VARCHAR(255) NOT NULL,
-                    manager_id INTEGER REFERENCES employees(id)
-                );
-            """)
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS goals (
-                    id SERIAL PRIMARY KEY,
-                    employee_id INTEGER REFERENCES employees(id) ON DELETE CASCADE,
-                    description TEXT NOT NULL,
-                    due_date DATE NOT NULL,
-                    status VARCHAR(50) NOT NULL CHECK (status IN ('Draft', 'In Progress', 'Completed', 'Cancelled'))
-                );
-            """)
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS tasks (
-                    id SERIAL PRIMARY KEY,
-                    goal_id INTEGER REFERENCES goals(id) ON DELETE CASCADE,
-                    description TEXT NOT NULL,
-                    is_approved BOOLEAN DEFAULT FALSE
-                );
-            """)
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS feedback (
-                    id SERIAL PRIMARY KEY,
-                    goal_id INTEGER REFERENCES goals(id) ON DELETE CASCADE,
-                    manager_id INTEGER REFERENCES employees(id),
-                    feedback_text TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-            """)
-            # --- Automated Feedback Trigger ---
-            cur.execute("""
-                CREATE OR REPLACE FUNCTION goal_completed_feedback()
-                RETURNS TRIGGER AS $$
-                BEGIN
-                    IF NEW.status = 'Completed' AND OLD.status != 'Completed' THEN
-                        INSERT INTO feedback (goal_id, manager_id, feedback_text, created_at)
-                        VALUES (NEW.id, (SELECT manager_id FROM employees WHERE id = NEW.employee_id), 'Great job on completing this goal!', NOW());
-                    END IF;
-                    RETURN NEW;
-                END;
-                $$ LANGUAGE plpgsql;
-
-                DROP TRIGGER IF EXISTS goal_completed_trigger ON goals;
-                CREATE TRIGGER goal_completed_trigger
-                AFTER UPDATE ON goals
-                FOR EACH ROW
-                EXECUTE FUNCTION goal_completed_feedback();
-            """)
+    if conn is None:
+        raise psycopg2.OperationalError("Could not obtain a database connection.")
+    _local.conn = conn
+    outer_invalidations = getattr(_local, "pending_invalidations", None)
+    pending = _local.pending_invalidations = set()
+    try:
+        _tag_session(conn)
+        yield conn
         conn.commit()
-        conn.close()
+        if _replicas:
+            _note_write(conn)
+    except BaseException:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        _local.conn = None
+        release_db_connection(conn)
+        # Readers may have re-cached a key between the write and the commit.
+        _cache.invalidate(*pending)
+        _local.pending_invalidations = outer_invalidations
+
+@contextmanager
+def _connection(read_only=False):
+    """Yields the current unit-of-work connection, or borrows one and commits it on exit.
+
+    read_only blocks go to a read replica when one is healthy and caught up with
+    this session's writes, and to the primary otherwise. Yields None if no
+    connection could be obtained.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        yield conn
+        return
+    replica, conn = _replica_connection() if read_only else (None, None)
+    if conn is None:
+        conn = get_db_connection()
+    if conn is None:
+        _local.connection_failed = True
+        yield None
+        return
+    # A block nested inside another (each on its own connection) keeps its own
+    # keys and hands the outer block's back when it ends.
+    outer_invalidations = getattr(_local, "pending_invalidations", None)
+    pending = _local.pending_invalidations = set()
+    try:
+        if not read_only:
+            _tag_session(conn)
+        yield conn
+        conn.commit()
+        if not read_only and _replicas:
+            _note_write(conn)
+    except BaseException as e:
+        failed = replica is not None and isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+        # Only a broken connection says the replica is down; a cancelled query
+        # (e.g. a recovery conflict, reported as SerializationFailure) does not.
+        if failed and (conn.closed or isinstance(e, psycopg2.InterfaceError)
+                       or (e.pgcode is None and not isinstance(e, _QUERY_CANCELLED))):
+            replica.mark_down(e)
+        if not conn.closed:
+            conn.rollback()
+        if failed:
+            raise _ReplicaFailed(f"Read replica {replica.name} failed: {e}") from e
+        raise
+    finally:
+        release_db_connection(conn)
+        _cache.invalidate(*pending)
+        _local.pending_invalidations = outer_invalidations
+
+# --- Read Replicas ---
+# Read-only calls are spread over the replicas in DB_REPLICA_DSNS (separated by
+# ";"; settings missing from a DSN come from the DB_* variables). Each replica
+# is health-checked at most every DB_REPLICA_CHECK_INTERVAL seconds and skipped
+# while unreachable or more than DB_REPLICA_MAX_LAG seconds behind. After every
+# commit on the primary its WAL position is recorded for the session, and that
+# session's reads only go to replicas known to have replayed past it, so a
+# session always sees its own writes.
+_replicas = []
+_replica_turns = itertools.count()
+_write_lock = threading.Lock()
+_write_positions = OrderedDict()
+_last_write_position = 0
+_MAX_TRACKED_SESSIONS = 10000
+
+def _lsn(text):
+    """Turns a pg_lsn such as '16/B374D848' into an integer for comparisons."""
+    high, low = text.split("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+class _Replica:
+    """A read replica's connection pool and the result of its latest health check."""
+
+    def __init__(self, dsn, minconn, maxconn, params):
+        self.params = dict(params)
+        self.params["dbname"] = self.params.pop("database")
+        self.params.setdefault("connect_timeout", 2)
+        self.params.update(psycopg2.extensions.parse_dsn(dsn))
+        self.name = f"{self.params.get('host', 'localhost')}:{self.params.get('port', 5432)}"
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.pool = None
+        self.slots = None
+        self.healthy = False
+        self.replayed = 0
+        self.checked_at = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    def check_if_due(self):
+        """Runs a health check if the last one is older than DB_REPLICA_CHECK_INTERVAL.
+
+        Only one thread checks at a time; the others use the previous result.
+        """
+        interval = float(os.environ.get("DB_REPLICA_CHECK_INTERVAL", 5))
+        if self.checked_at is not None and time.monotonic() - self.checked_at < interval:
+            return
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._check()
+        finally:
+            self._lock.release()
+
+    def _check(self):
+        try:
+            if self.pool is None:
+                self.pool = psycopg2.pool.ThreadedConnectionPool(self.minconn, self.maxconn, **self.params)
+                self.slots = threading.BoundedSemaphore(self.maxconn)
+            conn = _borrow(self.pool, self.slots)
+            if conn is None:
+                raise psycopg2.OperationalError("no replica connection available")
+            try:
+                # A plain cursor: the check is not part of the traced call that happens to trigger it.
+                with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+                    cur.execute(
+                        """SELECT pg_is_in_recovery(), pg_last_wal_replay_lsn()::text,
+                                  COALESCE(pg_last_wal_receive_lsn() > pg_last_wal_replay_lsn()
+                                           AND now() - pg_last_xact_replay_timestamp() > make_interval(secs => %s), FALSE)""",
+                        (float(os.environ.get("DB_REPLICA_MAX_LAG", 30)),)
+                    )
+                    in_recovery, replayed, lagging = cur.fetchone()
+            finally:
+                release_db_connection(conn)
+        except psycopg2.Error as e:
+            self.mark_down(e)
+            return
+        if not in_recovery or replayed is None:
+            # Promoted or not a standby at all: its data may have diverged.
+            self.mark_down("not in recovery")
+            return
+        self.replayed = _lsn(replayed)
+        self.healthy = not lagging
+        self.error = "replication lag above DB_REPLICA_MAX_LAG" if lagging else None
+        self.checked_at = time.monotonic()
+
+    def mark_down(self, error):
+        """Takes the replica out of rotation until its next health check."""
+        print(f"Read replica {self.name} unavailable: {error}")
+        self.healthy = False
+        self.error = str(error)
+        self.checked_at = time.monotonic()
+        self.close()
+
+    def close(self):
+        pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.closeall()
+
+def _session_key():
+    return getattr(_local, "session", None) or ("thread", threading.get_ident())
+
+def set_session(key):
+    """Ties this thread's backend calls to a user session, e.g. a Streamlit session id.
+
+    Reads then see every write made under the same key, wherever replicas are in
+    their replay. Without a key each thread counts as its own session.
+    """
+    _local.session = key
+
+def _tag_session(conn):
+    """Names this thread's session in the change events the transaction sends (migration 12)."""
+    session = getattr(_local, "session", None)
+    if session is not None:
+        with conn.cursor() as cur:
+            cur.execute("SELECT set_config('pms.session', %s, TRUE)", (str(session),))
+
+def _note_write(conn):
+    """Records the primary's WAL position just after a commit for the current session."""
+    global _last_write_position
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_current_wal_insert_lsn()::text")
+            position = _lsn(cur.fetchone()[0])
+    finally:
+        conn.autocommit = False
+    session = _session_key()
+    with _write_lock:
+        _last_write_position = max(_last_write_position, position)
+        _write_positions[session] = max(position, _write_positions.get(session, 0))
+        _write_positions.move_to_end(session)
+        while len(_write_positions) > _MAX_TRACKED_SESSIONS:
+            _write_positions.popitem(last=False)
+
+def _replica_connection():
+    """Borrows a connection from a healthy, caught-up replica; returns (replica, conn) or (None, None)."""
+    with _pool_lock:
+        if _pool is None:
+            _create_pool(None, None, {})
+        replicas = _replicas
+    if not replicas or getattr(_local, "use_primary", False):
+        return None, None
+    with _write_lock:
+        required = _write_positions.get(_session_key(), 0)
+    start = next(_replica_turns) % len(replicas)
+    for replica in replicas[start:] + replicas[:start]:
+        replica.check_if_due()
+        pool, slots = replica.pool, replica.slots
+        if not replica.healthy or replica.replayed < required or pool is None:
+            continue
+        conn = _borrow(pool, slots)
+        if conn is None:
+            continue
+        # Another session's write may not have arrived yet; such reads must not be cached.
+        if replica.replayed < _last_write_position:
+            _local.stale_read = True
+        return replica, conn
+    return None, None
+
+_QUERY_CANCELLED = (psycopg2.extensions.TransactionRollbackError, psycopg2.extensions.QueryCanceledError)
+
+class _ReplicaFailed(psycopg2.OperationalError):
+    """A read-only block failed on a replica; @_replica_fallback reruns it on the primary."""
+
+@contextmanager
+def _on_primary():
+    """Sends this thread's read-only blocks to the primary for the duration."""
+    previous = getattr(_local, "use_primary", False)
+    _local.use_primary = True
+    try:
+        yield
+    finally:
+        _local.use_primary = previous
+
+def _replica_fallback(func):
+    """Reruns a read-only call once on the primary if its replica fails mid-query.
+
+    A generator is rerun only if it failed before yielding anything; after that
+    the caller already has part of the result and gets the error.
+    """
+    if inspect.isgeneratorfunction(func):
+        @wraps(func)
+        def generator(*args, **kwargs):
+            items = func(*args, **kwargs)
+            try:
+                first = next(items)
+            except StopIteration:
+                return
+            except _ReplicaFailed as e:
+                print(f"{e}; retrying on the primary.")
+                items = func(*args, **kwargs)
+                with _on_primary():
+                    try:
+                        first = next(items)
+                    except StopIteration:
+                        return
+            yield first
+            yield from items
+        return generator
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except _ReplicaFailed as e:
+            print(f"{e}; retrying on the primary.")
+            with _on_primary():
+                return func(*args, **kwargs)
+    return wrapper
+
+def get_replica_status():
+    """Reports each configured read replica's health, replay position and last error."""
+    now = time.monotonic()
+    return [
+        {
+            "replica": replica.name,
+            "healthy": replica.healthy,
+            "replayed_lsn": f"{replica.replayed >> 32:X}/{replica.replayed & 0xFFFFFFFF:X}",
+            "checked_seconds_ago": None if replica.checked_at is None else round(now - replica.checked_at, 1),
+            "error": replica.error,
+        }
+        for replica in _replicas
+    ]
+
+# --- Read-Through Cache ---
+class _TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a fixed number of seconds."""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns (True, value) on a fresh hit and (False, None) otherwise."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value, generation):
+        """Stores value unless something was invalidated since generation was read."""
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *keys):
+        """Drops the given keys; a one-element key such as ("subtree",) drops that whole entity."""
+        if not keys:
+            return
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                if len(key) == 1:
+                    matches = [k for k in self._entries if k[0] == key[0]]
+                else:
+                    matches = [key] if key in self._entries else []
+                for match in matches:
+                    del self._entries[match]
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+            }
+
+_cache = _TTLCache(
+    ttl=float(os.environ.get("PMS_CACHE_TTL", 30)),
+    max_entries=int(os.environ.get("PMS_CACHE_MAX_ENTRIES", 2048)),
+)
+
+def _cached(entity):
+    """Caches a read function under (entity, *args, *sorted kwargs).
+
+    Reads inside transaction() bypass the cache so they see the transaction's own
+    writes, and results from a failed connection or a lagging replica are never stored.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(_local, "conn", None) is not None:
+                return func(*args, **kwargs)
+            key = (entity,) + args + tuple(sorted(kwargs.items()))
+            hit, value = _cache.get(key)
+            if hit:
+                return list(value)
+            generation = _cache.generation
+            _local.connection_failed = False
+            _local.stale_read = False
+            value = func(*args, **kwargs)
+            if not _local.connection_failed and not _local.stale_read:
+                _cache.put(key, list(value), generation)
+            return value
+        return wrapper
+    return decorator
+
+def _invalidate(*keys):
+    """Drops cache keys after a write, and again once the write's transaction has ended."""
+    _cache.invalidate(*keys)
+    pending = getattr(_local, "pending_invalidations", None)
+    if pending is not None:
+        pending.update(keys)
+
+def get_cache_stats():
+    """Returns the cache hit/miss counters and current size."""
+    return _cache.stats()
+
+def clear_cache():
+    """Empties the read cache, e.g. after changing data outside this process."""
+    _cache.clear()
+
+def configure_cache(ttl=None, max_entries=None):
+    """Changes the cache TTL (seconds) and/or size at runtime; 0 for either disables caching."""
+    with _cache._lock:
+        if ttl is not None:
+            _cache.ttl = ttl
+        if max_entries is not None:
+            _cache.max_entries = max_entries
+    _cache.clear()
+
+# --- Schema Setup ---
+_schema_ready = False
+_seeded = False
+_setup_lock = threading.Lock()
+
+def setup_database():
+    """Brings the schema up to date through the versioned migrations.
+
+    The version check runs once per process; later calls return immediately.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _setup_lock:
+        if _schema_ready:
+            return
+        applied = None
+        with _connection() as conn:
+            if conn:
+                applied = migrations.migrate(conn)
+        if applied:
+            print(f"Applied schema migrations: {applied}")
+        _schema_ready = applied is not None
+
+def get_schema_version():
+    """Returns the highest schema migration applied to the database."""
+    with _connection() as conn:
+        if conn:
+            with conn.cursor() as cur:
+                return migrations.current_version(cur)
+    return 0
 
 # --- CRUD Operations for Employees ---
+# The statements of the single-row CRUD calls are shared with Async_pms.
+_CREATE_EMPLOYEE_SQL = "INSERT INTO employees (name, manager_id) VALUES (%s, %s)"
+_EMPLOYEES_SQL = "SELECT id, name FROM employees ORDER BY name"
+
 def create_employee(name, manager_id=None):
     """Creates a new employee."""
-    conn = get_db_connection()
-    if conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO employees (name, manager_id) VALUES (%s, %s)",
-                (name, manager_id)
-            )
-        conn.commit()
-        conn.close()
+    with _connection() as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(_CREATE_EMPLOYEE_SQL, (name, manager_id))
+            _invalidate(("employees",), *_HIERARCHY_ENTITIES)
 
+@_cached("employees")
+@_replica_fallback
 def get_employees():
     """Retrieves all employees."""
-    conn = get_db_connection()
-    if conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT id, name FROM employees ORDER BY name")
-            employees = cur.fetchall()
-        conn.close()
-        return employees
+    with _connection(read_only=True) as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(_EMPLOYEES_SQL)
+                employees = cur.fetchall()
+            return employees
+    return []
+
+# --- Reporting Hierarchy ---
+# Backed by the employee_hierarchy closure table, which triggers on employees keep
+# in step with manager_id. Any org change can reshape many subtrees, so writes
+# drop these cache entities wholesale.
+_HIERARCHY_ENTITIES = [("reports",), ("subtree",), ("chain",)]
+
+def update_employee_manager(employee_id, manager_id):
+    """Moves an employee (and everyone reporting to them) under a new manager."""
+    with _connection() as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "UPDATE employees SET manager_id = %s WHERE id = %s",
+                    (manager_id, employee_id)
+                )
+            _invalidate(*_HIERARCHY_ENTITIES)
+
+@_cached("reports")
+@_replica_fallback
+def get_direct_reports(manager_id):
+    """Retrieves the employees who report directly to a manager."""
+    with _connection(read_only=True) as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT id, name FROM employees WHERE manager_id = %s ORDER BY name",
+                    (manager_id,)
+                )
+                return cur.fetchall()
+    return []
+
+@_cached("subtree")
+@_replica_fallback
+def get_subtree(manager_id, include_self=False):
+    """Retrieves everyone in a manager's reporting line as (id, name, depth), nearest levels first."""
+    with _connection(read_only=True) as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """SELECT e.id, e.name, h.depth
+                       FROM employee_hierarchy h JOIN employees e ON e.id = h.descendant_id
+                       WHERE h.ancestor_id = %s AND h.depth >= %s
+                       ORDER BY h.depth, e.name""",
+                    (manager_id, 0 if include_self else 1)
+                )
+                return cur.fetchall()
+    return []
+
+@_cached("chain")
+@_replica_fallback
+def get_chain_of_command(employee_id):
+    """Retrieves an employee's managers as (id, name, depth), from their direct manager upwards."""
+    with _connection(read_only=True) as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """SELECT e.id, e.name, h.depth
+                       FROM employee_hierarchy h JOIN employees e ON e.id = h.ancestor_id
+                       WHERE h.descendant_id = %s AND h.depth > 0
+                       ORDER BY h.depth""",
+                    (employee_id,)
+                )
+                return cur.fetchall()
+    return []
+
+def is_manager(employee_id):
+    """Returns True if anyone reports to this employee."""
+    return bool(get_direct_reports(employee_id))
+
+@_replica_fallback
+def get_team_rollups(manager_id):
+    """Rolls up goal counts for the manager and every manager below them.
+
+    Returns (manager id, name, team size, total goals, completed goals, completion rate)
+    per manager, where the team is that manager's whole subtree. Goal counts come
+    from the precomputed employee_goal_stats rather than the goals table.
+    """
+    with _connection(read_only=True) as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """SELECT m.id, m.name, COUNT(*), SUM(s.total_goals), SUM(s.completed_goals)
+                       FROM employee_hierarchy scope
+                       JOIN employees m ON m.id = scope.descendant_id
+                       JOIN employee_hierarchy team ON team.ancestor_id = m.id AND team.depth > 0
+                       JOIN employee_goal_stats s ON s.employee_id = team.descendant_id
+                       WHERE scope.ancestor_id = %s
+                       GROUP BY m.id, m.name, scope.depth
+                       ORDER BY scope.depth, m.name""",
+                    (manager_id,)
+                )
+                rows = cur.fetchall()
+            return [
+                (mid, name, size, total, completed, completed / total if total else 0.0)
+                for mid, name, size, total, completed in rows
+            ]
     return []
 
 # --- CRUD Operations for Goals ---
+_CREATE_GOAL_SQL = "INSERT INTO goals (employee_id, description, due_date, status) VALUES (%s, %s, %s, 'Draft')"
+_GOALS_FOR_EMPLOYEE_SQL = "SELECT id, description, due_date, status FROM goals WHERE employee_id = %s ORDER BY due_date DESC"
+_UPDATE_GOAL_STATUS_SQL = "UPDATE goals SET status = %s WHERE id = %s RETURNING employee_id"
+_DELETE_GOAL_SQL = "DELETE FROM goals WHERE id = %s RETURNING employee_id"
+
 # Create
 def create_goal(employee_id, description, due_date):
     """Allows a manager to create a new goal for an employee."""
-    conn = get_db_connection()
-    if conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO goals (employee_id, description, due_date, status) VALUES (%s, %s, %s, 'Draft')",
-                (employee_id, description, due_date)
-            )
-        conn.commit()
-        conn.close()
+    with _connection() as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(_CREATE_GOAL_SQL, (employee_id, description, due_date))
+            _invalidate(("goals", employee_id))
 
 # Read
+@_cached("goals")
+@_replica_fallback
 def get_goals_for_employee(employee_id):
     """Retrieves all goals for a specific employee."""
-    conn = get_db_connection()
-    if conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                "SELECT id, description, due_date, status FROM goals WHERE employee_id = %s ORDER BY due_date DESC",
-                (employee_id,)
-            )
-            goals = cur.fetchall()
-        conn.close()
-        return goals
+    with _connection(read_only=True) as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(_GOALS_FOR_EMPLOYEE_SQL, (employee_id,))
+                goals = cur.fetchall()
+            return goals
     return []
 
 # Update
 def update_goal_status(goal_id, status):
     """Allows a manager to update the status of a goal."""
-    conn = get_db_connection()
-    if conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                "UPDATE goals SET status = %s WHERE id = %s",
-                (status, goal_id)
-            )
-        conn.commit()
-        conn.close()
+    with _connection() as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(_UPDATE_GOAL_STATUS_SQL, (status, goal_id))
+                row = cur.fetchone()
+            if row:
+                # Completing a goal also inserts automated feedback.
+                _invalidate(("goals", row[0]), ("feedback", goal_id))
+
+def update_goals_status(goal_ids, status):
+    """Moves a set of goals to a new status in one statement; returns how many changed.
+
+    Goals already in that status are left alone, so they get no second automated feedback.
+    """
+    goal_ids = list(goal_ids)
+    if not goal_ids:
+        return 0
+    with _connection() as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "UPDATE goals SET status = %s WHERE id = ANY(%s) AND status <> %s RETURNING id, employee_id",
+                    (status, goal_ids, status)
+                )
+                changed = cur.fetchall()
+            employee_ids = {employee_id for _, employee_id in changed}
+            _invalidate(*[("goals", employee_id) for employee_id in employee_ids],
+                        *[("feedback", goal_id) for goal_id, _ in changed])
+            return len(changed)
+    return 0
 
 # Delete
 def delete_goal(goal_id):
     """Allows a manager to delete a goal."""
-    conn = get_db_connection()
-    if conn:
-        with conn.cursor() as cur:
-            cur.execute("DELETE FROM goals WHERE id = %s", (goal_id,))
-        conn.commit()
-        conn.close()
+    with _connection() as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(_DELETE_GOAL_SQL, (goal_id,))
+                row = cur.fetchone()
+            if row:
+                _invalidate(("goals", row[0]), ("tasks", goal_id), ("feedback", goal_id))
 
 # --- CRUD Operations for Tasks ---
+_CREATE_TASK_SQL = "INSERT INTO tasks (goal_id, description) VALUES (%s, %s)"
+_TASKS_FOR_GOAL_SQL = "SELECT id, description, is_approved FROM tasks WHERE goal_id = %s ORDER BY id"
+_APPROVE_TASK_SQL = "UPDATE tasks SET is_approved = TRUE WHERE id = %s RETURNING goal_id"
+_DELETE_TASK_SQL = "DELETE FROM tasks WHERE id = %s RETURNING goal_id"
+
 # Create
 def create_task(goal_id, description):
     """Allows an employee to log a task for a goal."""
-    conn = get_db_connection()
-    if conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO tasks (goal_id, description) VALUES (%s, %s)",
-                (goal_id, description)
-            )
-        conn.commit()
-        conn.close()
+    with _connection() as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(_CREATE_TASK_SQL, (goal_id, description))
+            _invalidate(("tasks", goal_id))
 
 # Read
+@_cached("tasks")
+@_replica_fallback
 def get_tasks_for_goal(goal_id):
     """Retrieves all tasks for a specific goal."""
-    conn = get_db_connection()
-    if conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                "SELECT id, description, is_approved FROM tasks WHERE goal_id = %s ORDER BY id",
-                (goal_id,)
-            )
-            tasks = cur.fetchall()
-        conn.close()
-        return tasks
+    with _connection(read_only=True) as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(_TASKS_FOR_GOAL_SQL, (goal_id,))
+                tasks = cur.fetchall()
+            return tasks
     return []
 
 # Update
 def approve_task(task_id):
     """Allows a manager to approve a task."""
-    conn = get_db_connection()
-    if conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                "UPDATE tasks SET is_approved = TRUE WHERE id = %s",
-                (task_id,)
-            )
-        conn.commit()
-        conn.close()
+    with _connection() as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(_APPROVE_TASK_SQL, (task_id,))
+                row = cur.fetchone()
+            if row:
+                _invalidate(("tasks", row[0]))
+
+def approve_tasks(task_ids):
+    """Approves a list of tasks in one statement; returns how many were newly approved."""
+    task_ids = list(task_ids)
+    if not task_ids:
+        return 0
+    with _connection() as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "UPDATE tasks SET is_approved = TRUE WHERE id = ANY(%s) AND is_approved IS NOT TRUE RETURNING goal_id",
+                    (task_ids,)
+                )
+                goal_ids = [row[0] for row in cur.fetchall()]
+            _invalidate(*[("tasks", goal_id) for goal_id in set(goal_ids)])
+            return len(goal_ids)
+    return 0
 
 # Delete
 def delete_task(task_id):
     """Allows a manager or employee to delete a task."""
-    conn = get_db_connection()
-    if conn:
-        with conn.cursor() as cur:
-            cur.execute("DELETE FROM tasks WHERE id = %s", (task_id,))
-        conn.commit()
-        conn.close()
+    with _connection() as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(_DELETE_TASK_SQL, (task_id,))
+                row = cur.fetchone()
+            if row:
+                _invalidate(("tasks", row[0]))
 
 # --- CRUD Operations for Feedback ---
+_CREATE_FEEDBACK_SQL = "INSERT INTO feedback (goal_id, manager_id, feedback_text) VALUES (%s, %s, %s)"
+_FEEDBACK_FOR_GOAL_SQL = "SELECT f.feedback_text, e.name, f.created_at FROM feedback f JOIN employees e ON f.manager_id = e.id WHERE f.goal_id = %s ORDER BY f.created_at DESC"
+
 # Create
 def create_feedback(goal_id, manager_id, feedback_text):
     """Allows a manager to provide written feedback on a goal."""
-    conn = get_db_connection()
-    if conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO feedback (goal_id, manager_id, feedback_text) VALUES (%s, %s, %s)",
-                (goal_id, manager_id, feedback_text)
-            )
-        conn.commit()
-        conn.close()
+    with _connection() as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(_CREATE_FEEDBACK_SQL, (goal_id, manager_id, feedback_text))
+            _invalidate(("feedback", goal_id))
 
 # Read
+@_cached("feedback")
+@_replica_fallback
 def get_feedback_for_goal(goal_id):
     """Retrieves all feedback for a specific goal."""
-    conn = get_db_connection()
-    if conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                "SELECT f.feedback_text, e.name, f.created_at FROM feedback f JOIN employees e ON f.manager_id = e.id WHERE f.goal_id = %s ORDER BY f.created_at DESC",
-                (goal_id,)
-            )
-            feedback = cur.fetchall()
-        conn.close()
-        return feedback
+    with _connection(read_only=True) as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(_FEEDBACK_FOR_GOAL_SQL, (goal_id,))
+                feedback = cur.fetchall()
+            return feedback
     return []
-    
+
+# --- Batched Loaders ---
+# These consult the per-goal cache entries first and load only the misses.
+# The SQL is shared with Async_pms; rows start with goal_id.
+_TASKS_FOR_GOALS_SQL = "SELECT goal_id, id, description, is_approved FROM tasks WHERE goal_id = ANY(%s) ORDER BY goal_id, id"
+_FEEDBACK_FOR_GOALS_SQL = "SELECT f.goal_id, f.feedback_text, e.name, f.created_at FROM feedback f JOIN employees e ON f.manager_id = e.id WHERE f.goal_id = ANY(%s) ORDER BY f.goal_id, f.created_at DESC"
+
+def _group_by_goal(goal_ids, rows):
+    """Turns (goal_id, *row) rows into a dict of goal id to row tuples, with every goal present."""
+    grouped = {goal_id: [] for goal_id in goal_ids}
+    for goal_id, *row in rows:
+        grouped[goal_id].append(tuple(row))
+    return grouped
+
+def _fetch_tasks(cur, goal_ids):
+    """Loads the tasks of several goals with one query, keyed by goal id."""
+    if not goal_ids:
+        return {}
+    cur.execute(_TASKS_FOR_GOALS_SQL, (list(goal_ids),))
+    return _group_by_goal(goal_ids, cur.fetchall())
+
+def _fetch_feedback(cur, goal_ids):
+    """Loads the feedback of several goals with one query, keyed by goal id."""
+    if not goal_ids:
+        return {}
+    cur.execute(_FEEDBACK_FOR_GOALS_SQL, (list(goal_ids),))
+    return _group_by_goal(goal_ids, cur.fetchall())
+
+def _load_many(entity, goal_ids, load, in_transaction=False):
+    """Serves goal_ids from the cache where possible and loads the rest with one load(missing) call.
+
+    load returns a dict of goal id to rows, or None if the database could not be
+    reached. Inside a transaction the cache is bypassed so its own writes are seen.
+    """
+    result = {}
+    missing = []
+    for goal_id in dict.fromkeys(goal_ids):
+        hit, value = (False, None) if in_transaction else _cache.get((entity, goal_id))
+        if hit:
+            result[goal_id] = list(value)
+        else:
+            missing.append(goal_id)
+    if missing:
+        generation = _cache.generation
+        _local.stale_read = False
+        loaded = load(missing)
+        if loaded is not None:
+            if not in_transaction and not _local.stale_read:
+                for goal_id, rows in loaded.items():
+                    _cache.put((entity, goal_id), list(rows), generation)
+            result.update(loaded)
+        for goal_id in missing:
+            result.setdefault(goal_id, [])
+    return result
+
+def _read_many(fetch):
+    """A _load_many() loader that runs fetch(cur, goal_ids) on a read-only connection."""
+    @_replica_fallback
+    def load(goal_ids):
+        with _connection(read_only=True) as conn:
+            if conn:
+                with conn.cursor() as cur:
+                    return fetch(cur, goal_ids)
+        return None
+    return load
+
+def get_tasks_for_goals(goal_ids):
+    """Retrieves the tasks for a list of goals, as a dict of goal id to get_tasks_for_goal() rows."""
+    return _load_many("tasks", goal_ids, _read_many(_fetch_tasks), getattr(_local, "conn", None) is not None)
+
+def get_feedback_for_goals(goal_ids):
+    """Retrieves the feedback for a list of goals, as a dict of goal id to get_feedback_for_goal() rows."""
+    return _load_many("feedback", goal_ids, _read_many(_fetch_feedback), getattr(_local, "conn", None) is not None)
+
+def get_performance_history(employee_id, include_archived=False):
+    """Retrieves an employee's goals together with their tasks and feedback.
+
+    Returns a list of (goal, tasks, feedback) tuples, where goal has the same shape as a
+    get_goals_for_employee() row. Runs at most three queries, however many goals there are.
+    include_archived adds the goals of archived review cycles (see get_archived_history()).
+    """
+    goals = get_goals_for_employee(employee_id)
+    goal_ids = [goal[0] for goal in goals]
+    tasks = get_tasks_for_goals(goal_ids)
+    feedback = get_feedback_for_goals(goal_ids)
+    history = [(goal, tasks[goal[0]], feedback[goal[0]]) for goal in goals]
+    if include_archived:
+        history += get_archived_history(employee_id)
+        history.sort(key=lambda entry: (entry[0][2], entry[0][0]), reverse=True)
+    return history
+
+# --- Paginated Listings ---
+# Keyset pagination: each page is fetched with an index range scan that starts
+# right after the last row of the previous page, so deep pages cost the same as
+# the first one. Cursors are opaque tuples handed back by the previous call.
+def _split_page(rows, page_size, cursor_of):
+    """Trims the look-ahead row and returns (rows, cursor for the next page or None)."""
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, cursor_of(rows[-1])
+    return rows, None
+
+@_replica_fallback
+def get_goals_for_employee_page(employee_id, page_size=20, after=None):
+    """Retrieves one page of an employee's goals, newest due date first.
+
+    Returns (goals, next_cursor); pass next_cursor as after to get the following
+    page. next_cursor is None on the last page.
+    """
+    with _connection(read_only=True) as conn:
+        if conn:
+            with conn.cursor() as cur:
+                if after is None:
+                    cur.execute(
+                        "SELECT id, description, due_date, status FROM goals WHERE employee_id = %s ORDER BY due_date DESC, id DESC LIMIT %s",
+                        (employee_id, page_size + 1)
+                    )
+                else:
+                    cur.execute(
+                        "SELECT id, description, due_date, status FROM goals WHERE employee_id = %s AND (due_date, id) < (%s, %s) ORDER BY due_date DESC, id DESC LIMIT %s",
+                        (employee_id, after[0], after[1], page_size + 1)
+                    )
+                rows = cur.fetchall()
+            return _split_page(rows, page_size, lambda goal: (goal[2], goal[0]))
+    return [], None
+
+# Task and feedback counts per goal row, each from an index range scan.
+_GOAL_COUNTS = """
+    CROSS JOIN LATERAL (
+        SELECT COUNT(*) AS total, COUNT(*) FILTER (WHERE is_approved) AS approved
+        FROM tasks WHERE goal_id = g.id
+    ) t
+    CROSS JOIN LATERAL (SELECT COUNT(*) AS total FROM feedback WHERE goal_id = g.id) f
+"""
+
+@_replica_fallback
+def get_goal_summaries_page(employee_id, page_size=20, after=None):
+    """Like get_goals_for_employee_page(), with task and feedback counts, in one query.
+
+    Rows are (id, description, due_date, status, task_count, approved_task_count,
+    feedback_count), so a page can show progress without loading any tasks.
+    """
+    with _connection(read_only=True) as conn:
+        if conn:
+            with conn.cursor() as cur:
+                if after is None:
+                    cur.execute(
+                        "SELECT g.id, g.description, g.due_date, g.status, t.total, t.approved, f.total FROM goals g" + _GOAL_COUNTS
+                        + "WHERE g.employee_id = %s ORDER BY g.due_date DESC, g.id DESC LIMIT %s",
+                        (employee_id, page_size + 1)
+                    )
+                else:
+                    cur.execute(
+                        "SELECT g.id, g.description, g.due_date, g.status, t.total, t.approved, f.total FROM goals g" + _GOAL_COUNTS
+                        + "WHERE g.employee_id = %s AND (g.due_date, g.id) < (%s, %s) ORDER BY g.due_date DESC, g.id DESC LIMIT %s",
+                        (employee_id, after[0], after[1], page_size + 1)
+                    )
+                rows = cur.fetchall()
+            return _split_page(rows, page_size, lambda goal: (goal[2], goal[0]))
+    return [], None
+
+@_replica_fallback
+def get_goal_summaries(goal_ids):
+    """Task and feedback counts for several goals in one query.
+
+    Returns a dict of goal id to (task_count, approved_task_count, feedback_count).
+    """
+    summaries = {goal_id: (0, 0, 0) for goal_id in goal_ids}
+    if not summaries:
+        return summaries
+    with _connection(read_only=True) as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT g.id, t.total, t.approved, f.total FROM unnest(%s::int[]) AS g(id)" + _GOAL_COUNTS,
+                    (list(summaries),)
+                )
+                for goal_id, task_count, approved_count, feedback_count in cur.fetchall():
+                    summaries[goal_id] = (task_count, approved_count, feedback_count)
+    return summaries
+
+@_replica_fallback
+def get_feedback_for_goal_page(goal_id, page_size=20, after=None):
+    """Retrieves one page of a goal's feedback, newest first, as (feedback, next_cursor)."""
+    with _connection(read_only=True) as conn:
+        if conn:
+            with conn.cursor() as cur:
+                if after is None:
+                    cur.execute(
+                        "SELECT f.feedback_text, e.name, f.created_at, f.id FROM feedback f JOIN employees e ON f.manager_id = e.id WHERE f.goal_id = %s ORDER BY f.created_at DESC, f.id DESC LIMIT %s",
+                        (goal_id, page_size + 1)
+                    )
+                else:
+                    cur.execute(
+                        "SELECT f.feedback_text, e.name, f.created_at, f.id FROM feedback f JOIN employees e ON f.manager_id = e.id WHERE f.goal_id = %s AND (f.created_at, f.id) < (%s, %s) ORDER BY f.created_at DESC, f.id DESC LIMIT %s",
+                        (goal_id, after[0], after[1], page_size + 1)
+                    )
+                rows = cur.fetchall()
+            rows, next_cursor = _split_page(rows, page_size, lambda fb: (fb[2], fb[3]))
+            return [fb[:3] for fb in rows], next_cursor
+    return [], None
+
+def get_performance_history_page(employee_id, page_size=20, after=None):
+    """Like get_performance_history(), for one page of goals; returns (history, next_cursor)."""
+    goals, next_cursor = get_goals_for_employee_page(employee_id, page_size, after)
+    goal_ids = [goal[0] for goal in goals]
+    tasks = get_tasks_for_goals(goal_ids)
+    feedback = get_feedback_for_goals(goal_ids)
+    return [(goal, tasks[goal[0]], feedback[goal[0]]) for goal in goals], next_cursor
+
+# The streaming generators fetch keyset pages rather than holding a server-side
+# cursor open between rows: the thread's unit-of-work state (pending cache
+# invalidations, the replica choice) never stays open across a yield, so callers
+# can write, or interleave several generators, while iterating.
+def iter_goals_for_employee(employee_id, batch_size=1000):
+    """Streams an employee's goals, newest due date first, batch_size rows per round trip."""
+    after = None
+    while True:
+        goals, after = get_goals_for_employee_page(employee_id, batch_size, after)
+        yield from goals
+        if after is None:
+            return
+
+def iter_feedback_for_goal(goal_id, batch_size=1000):
+    """Streams a goal's feedback, newest first, batch_size rows per round trip."""
+    after = None
+    while True:
+        feedback, after = get_feedback_for_goal_page(goal_id, batch_size, after)
+        yield from feedback
+        if after is None:
+            return
+
+# --- Search ---
+# Goals, tasks and feedback each carry a generated tsvector column with a GIN
+# index, so matches come from index scans however many rows the tables hold.
+_SEARCH_SCOPES = {
+    "all": "TRUE",
+    "employee": "g.employee_id = %(scope)s",
+    "manager": "g.employee_id IN (SELECT descendant_id FROM employee_hierarchy WHERE ancestor_id = %(scope)s)",
+}
+_SEARCH_SQL = """
+    WITH q AS (SELECT websearch_to_tsquery('english', %(query)s) AS query),
+    hits AS (
+        SELECT 'goal' AS kind, g.id, g.id AS goal_id, g.employee_id, g.description AS body,
+               ts_rank(g.search_vector, q.query)::FLOAT8 AS rank
+        FROM goals g, q
+        WHERE g.search_vector @@ q.query AND {scope}
+        UNION ALL
+        SELECT 'task', t.id, t.goal_id, g.employee_id, t.description, ts_rank(t.search_vector, q.query)::FLOAT8
+        FROM tasks t JOIN goals g ON g.id = t.goal_id, q
+        WHERE t.search_vector @@ q.query AND {scope}
+        UNION ALL
+        SELECT 'feedback', f.id, f.goal_id, g.employee_id, f.feedback_text, ts_rank(f.search_vector, q.query)::FLOAT8
+        FROM feedback f JOIN goals g ON g.id = f.goal_id, q
+        WHERE f.search_vector @@ q.query AND {scope}
+    ),
+    page AS (
+        SELECT * FROM hits {after}
+        ORDER BY rank DESC, kind DESC, id DESC
+        LIMIT %(limit)s
+    )
+    SELECT p.kind, p.id, p.goal_id, p.employee_id, e.name,
+           ts_headline('english', p.body, q.query, 'StartSel=**, StopSel=**, MaxFragments=1, MinWords=5, MaxWords=20'),
+           p.rank
+    FROM page p JOIN employees e ON e.id = p.employee_id, q
+    ORDER BY p.rank DESC, p.kind DESC, p.id DESC
+"""
+
+@_replica_fallback
+def search(query, employee_id=None, manager_id=None, page_size=20, after=None):
+    """Ranked full-text search over goal descriptions, tasks and feedback.
+
+    Scoped to one employee's goals, or to the goals of a manager's whole subtree
+    (including the manager's own); with neither, the whole organisation is searched.
+    query accepts web-search syntax ("quoted phrases", or, -excluded). Returns
+    (results, next_cursor) where each result is (kind, id, goal_id, employee_id,
+    employee_name, snippet, rank) and kind is 'goal', 'task' or 'feedback'.
+    """
+    if not query or not query.strip():
+        return [], None
+    if employee_id is not None:
+        scope, scope_id = "employee", employee_id
+    elif manager_id is not None:
+        scope, scope_id = "manager", manager_id
+    else:
+        scope, scope_id = "all", None
+    params = {"query": query, "scope": scope_id, "limit": page_size + 1}
+    after_clause = ""
+    if after is not None:
+        after_clause = "WHERE (rank, kind, id) < (%(rank)s::FLOAT8, %(kind)s, %(id)s)"
+        params.update(rank=after[0], kind=after[1], id=after[2])
+    with _connection(read_only=True) as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(_SEARCH_SQL.format(scope=_SEARCH_SCOPES[scope], after=after_clause), params)
+                rows = cur.fetchall()
+            return _split_page(rows, page_size, lambda hit: (hit[6], hit[0], hit[1]))
+    return [], None
+
 # --- Business Insights ---
-def get_performance_insights():
-    """Gathers various performance metrics from the database."""
-    conn = get_db_connection()
-    if conn:
-        with conn.cursor() as cur:
-            # Total goals
-            cur.execute("SELECT COUNT(*) FROM goals;")
-            total_goals = cur.fetchone()[0]
-
-            # Goals by status
-            cur.execute("SELECT status, COUNT(*) FROM goals GROUP BY status;")
-            goals_by_status = cur.fetchall()
-
-            # Average goals per employee
-            cur.execute("""
-                SELECT AVG(goal_count) FROM (
-                    SELECT employee_id, COUNT(id) AS goal_count
-                    FROM goals
-                    GROUP BY employee_id
-                ) AS employee_goals;
-            """)
-            avg_goals = cur.fetchone()[0]
-            
-            # Employee with most completed goals
-            cur.execute("""
-                SELECT e.name, COUNT(g.id)
-                FROM employees e
-                JOIN goals g ON e.id = g.employee_id
-                WHERE g.status = 'Completed'
-                GROUP BY e.name
-                ORDER BY COUNT(g.id) DESC
-                LIMIT 1;
-            """)
-            top_performer = cur.fetchone()
-
-            # Employee with least completed goals
-            cur.execute("""
-                SELECT e.name, COUNT(g.id)
-                FROM employees e
-                LEFT JOIN goals g ON e.id = g.employee_id AND g.status = 'Completed'
-                GROUP BY e.name
-                ORDER BY COUNT(g.id) ASC
-                LIMIT 1;
-            """)
-            lowest_performer = cur.fetchone()
+# Metrics are read from employee_goal_stats, which triggers on goals and employees
+# keep up to date, so a dashboard view never scans the goals table.
+_STATUSES = ['Draft', 'In Progress', 'Completed', 'Cancelled']
+_PERCENTILES = [25, 50, 75, 90]
 
-        conn.close()
-        return {
-            "total_goals": total_goals,
-            "goals_by_status": dict(goals_by_status),
-            "average_goals_per_employee": f"{avg_goals:.2f}" if avg_goals else 0,
-            "top_performer": top_performer[0] if top_performer else "N/A",
-            "lowest_performer": lowest_performer[0] if lowest_performer else "N/A"
-        }
+_INSIGHTS_SQL = """
+    WITH totals AS (
+        SELECT COALESCE(SUM(total_goals), 0),
+               COALESCE(SUM(draft_goals), 0),
+               COALESCE(SUM(in_progress_goals), 0),
+               COALESCE(SUM(completed_goals), 0),
+               COALESCE(SUM(cancelled_goals), 0),
+               AVG(total_goals) FILTER (WHERE total_goals > 0),
+               percentile_cont(%s::FLOAT8[]) WITHIN GROUP (ORDER BY completed_goals)
+        FROM employee_goal_stats
+    )
+    SELECT totals.*,
+        (SELECT json_agg(json_build_array(r.employee_id, r.name, r.completed_goals))
+         FROM (SELECT s.employee_id, e.name, s.completed_goals
+               FROM employee_goal_stats s JOIN employees e ON e.id = s.employee_id
+               WHERE s.completed_goals > 0
+               ORDER BY s.completed_goals DESC, s.employee_id
+               LIMIT %s) r),
+        (SELECT json_agg(json_build_array(r.employee_id, r.name, r.completed_goals))
+         FROM (SELECT s.employee_id, e.name, s.completed_goals
+               FROM employee_goal_stats s JOIN employees e ON e.id = s.employee_id
+               ORDER BY s.completed_goals, s.employee_id
+               LIMIT %s) r)
+    FROM totals;
+"""
+
+def _insights_params(top_n):
+    return ([p / 100 for p in _PERCENTILES], top_n, top_n)
+
+def _insights_from_row(row):
+    """Shapes the _INSIGHTS_SQL row into the get_performance_insights() dict."""
+    total_goals, *status_counts, avg_goals, percentiles, top, lowest = row
+    top_performers = [tuple(r) for r in top or []]
+    lowest_performers = [tuple(r) for r in lowest or []]
+    return {
+        "total_goals": total_goals,
+        "goals_by_status": {status: count for status, count in zip(_STATUSES, status_counts) if count},
+        "average_goals_per_employee": f"{avg_goals:.2f}" if avg_goals else 0,
+        "top_performer": top_performers[0][1] if top_performers else "N/A",
+        "lowest_performer": lowest_performers[0][1] if lowest_performers else "N/A",
+        "top_performers": top_performers,
+        "lowest_performers": lowest_performers,
+        "completed_goal_percentiles": dict(zip(_PERCENTILES, percentiles or [])),
+    }
+
+@_replica_fallback
+def get_performance_insights(top_n=5):
+    """Gathers the dashboard metrics from the precomputed goal statistics in one query.
+
+    Rankings are by employee id, so employees who share a name are kept apart.
+    """
+    with _connection(read_only=True) as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(_INSIGHTS_SQL, _insights_params(top_n))
+                row = cur.fetchone()
+            return _insights_from_row(row)
     return {}
 
+_PERCENTILE_SQL = """
+    SELECT 100.0 * (SELECT COUNT(*) FROM employee_goal_stats o WHERE o.completed_goals < s.completed_goals)
+           / (SELECT COUNT(*) FROM employee_goal_stats)
+    FROM employee_goal_stats s
+    WHERE s.employee_id = %s
+"""
+
+# The same for a list of employees, as (employee_id, percentile) rows; used by Async_pms.
+_PERCENTILES_SQL = """
+    SELECT s.employee_id,
+           100.0 * (SELECT COUNT(*) FROM employee_goal_stats o WHERE o.completed_goals < s.completed_goals)
+           / (SELECT COUNT(*) FROM employee_goal_stats)
+    FROM employee_goal_stats s
+    WHERE s.employee_id = ANY(%s)
+"""
+
+@_replica_fallback
+def get_employee_percentile(employee_id):
+    """Returns the percentage of employees who have completed fewer goals than this one."""
+    with _connection(read_only=True) as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(_PERCENTILE_SQL, (employee_id,))
+                row = cur.fetchone()
+            return float(row[0]) if row else None
+    return None
+
+def rebuild_insights():
+    """Recomputes the precomputed goal statistics from scratch, e.g. after a manual data fix.
+
+    Archived goals are counted along with the live ones.
+    """
+    with _connection() as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute("LOCK TABLE employees, goals, goals_archive IN SHARE MODE")
+                cur.execute("TRUNCATE employee_goal_stats")
+                cur.execute("""
+                    INSERT INTO employee_goal_stats (employee_id, total_goals, draft_goals, in_progress_goals, completed_goals, cancelled_goals)
+                    SELECT e.id,
+                           COUNT(g.id),
+                           COUNT(g.id) FILTER (WHERE g.status = 'Draft'),
+                           COUNT(g.id) FILTER (WHERE g.status = 'In Progress'),
+                           COUNT(g.id) FILTER (WHERE g.status = 'Completed'),
+                           COUNT(g.id) FILTER (WHERE g.status = 'Cancelled')
+                    FROM employees e
+                    LEFT JOIN (
+                        SELECT id, employee_id, status FROM goals
+                        UNION ALL SELECT id, employee_id, status FROM goals_archive
+                    ) g ON g.employee_id = e.id
+                    GROUP BY e.id
+                """)
+
+# --- Trends ---
+# goal_trends and feedback_trends hold per-week and per-month counts. They are
+# advanced from a watermark, so a refresh reads only rows recorded since the
+# previous one. Rows younger than PMS_TREND_SETTLE_SECONDS are left for the next
+# refresh, so a transaction that commits late is not skipped.
+_TREND_PERIODS = {"week": "1 week", "month": "1 month"}
+
+_GOAL_TRENDS_REFRESH = """
+    INSERT INTO goal_trends (period, period_start, created_goals, completed_goals, overdue_goals)
+    SELECT p.period, date_trunc(p.period, e.at)::DATE, SUM(e.created), SUM(e.completed), SUM(e.overdue)
+    FROM (
+        SELECT created_at AS at, 1 AS created, 0 AS completed, 0 AS overdue
+        FROM {goals} WHERE created_at >= %(lower)s AND created_at < %(upper)s
+        UNION ALL
+        SELECT completed_at, 0, 1, 0
+        FROM {goals} WHERE completed_at >= %(lower)s AND completed_at < %(upper)s
+        UNION ALL
+        -- A goal is overdue in the period of its due date once that date has passed
+        -- without the goal being completed in time.
+        SELECT due_date, 0, 0, 1
+        FROM {goals}
+        WHERE due_date >= %(lower)s::DATE AND due_date < %(upper)s::DATE
+          AND status <> 'Cancelled' AND (completed_at IS NULL OR completed_at::DATE > due_date)
+    ) e
+    CROSS JOIN (VALUES ('week'), ('month')) AS p(period)
+    GROUP BY 1, 2
+    ON CONFLICT (period, period_start) DO UPDATE SET
+        created_goals = goal_trends.created_goals + EXCLUDED.created_goals,
+        completed_goals = goal_trends.completed_goals + EXCLUDED.completed_goals,
+        overdue_goals = goal_trends.overdue_goals + EXCLUDED.overdue_goals
+"""
+
+_FEEDBACK_TRENDS_REFRESH = """
+    INSERT INTO feedback_trends (period, manager_id, period_start, feedback_count)
+    SELECT p.period, f.manager_id, date_trunc(p.period, f.created_at)::DATE, COUNT(*)
+    FROM {feedback} f
+    CROSS JOIN (VALUES ('week'), ('month')) AS p(period)
+    WHERE f.created_at >= %(lower)s AND f.created_at < %(upper)s AND f.manager_id IS NOT NULL
+    GROUP BY 1, 2, 3
+    ON CONFLICT (period, manager_id, period_start) DO UPDATE SET
+        feedback_count = feedback_trends.feedback_count + EXCLUDED.feedback_count
+"""
+
+# Incremental refreshes only read the live tables: rows are archived only after
+# the rollups have counted them. A rebuild counts the archive as well.
+_TREND_SOURCES = {
+    False: {"goals": "goals", "feedback": "feedback"},
+    True: {
+        "goals": """(SELECT created_at, completed_at, due_date, status FROM goals
+                     UNION ALL SELECT created_at, completed_at, due_date, status FROM goals_archive) goals""",
+        "feedback": """(SELECT manager_id, created_at FROM feedback
+                        UNION ALL SELECT manager_id, created_at FROM feedback_archive)""",
+    },
+}
+
+def _refresh_trends(cur, include_archive=False):
+    """Folds the rows recorded since the watermark into the rollups and moves the watermark on.
+
+    Returns whether any rollup row changed; the watermark moves on with the clock
+    even when nothing new was recorded.
+    """
+    cur.execute(
+        "SELECT processed_until, LOCALTIMESTAMP - make_interval(secs => %s) FROM trend_watermark FOR UPDATE",
+        (float(os.environ.get("PMS_TREND_SETTLE_SECONDS", 300)),)
+    )
+    lower, upper = cur.fetchone()
+    if upper <= lower:
+        return False
+    sources = _TREND_SOURCES[include_archive]
+    cur.execute(_GOAL_TRENDS_REFRESH.format(**sources), {"lower": lower, "upper": upper})
+    changed = cur.rowcount
+    cur.execute(_FEEDBACK_TRENDS_REFRESH.format(**sources), {"lower": lower, "upper": upper})
+    changed += cur.rowcount
+    cur.execute("UPDATE trend_watermark SET processed_until = %s", (upper,))
+    return changed > 0
+
+def refresh_trends():
+    """Brings the trend rollups up to date; cheap when little has changed since the last call.
+
+    Returns False if another session is already refreshing (its result will cover
+    the same rows) or the database is unreachable.
+    """
+    with _connection() as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_try_advisory_xact_lock(hashtext('pms_trend_refresh'))")
+                if not cur.fetchone()[0]:
+                    return False
+                changed = _refresh_trends(cur)
+            if changed:
+                _invalidate(("goal_trends",), ("feedback_trends",))
+            return True
+    return False
+
+def rebuild_trends():
+    """Recomputes the trend rollups from scratch, e.g. after importing backdated goals or feedback."""
+    with _connection() as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext('pms_trend_refresh'))")
+                cur.execute("TRUNCATE goal_trends, feedback_trends")
+                cur.execute("UPDATE trend_watermark SET processed_until = '-infinity'")
+                _refresh_trends(cur, include_archive=True)
+            _invalidate(("goal_trends",), ("feedback_trends",))
+
+# refresh_trends() writes on the primary, so pages only read the rollups; one
+# background thread per process keeps them current instead.
+_trend_refresher = None
+_trend_refresher_stop = threading.Event()
+_trend_refresher_lock = threading.Lock()
+
+def _refresh_trends_periodically(interval):
+    while True:
+        try:
+            refresh_trends()
+        except Exception as e:
+            print(f"Trend refresh failed: {e}")
+        if _trend_refresher_stop.wait(interval):
+            return
+
+def start_trend_refresher(interval=None):
+    """Starts a thread that calls refresh_trends() every PMS_TREND_REFRESH_SECONDS (default 60).
+
+    Does nothing if this process's refresher is already running.
+    """
+    global _trend_refresher
+    if interval is None:
+        interval = float(os.environ.get("PMS_TREND_REFRESH_SECONDS", 60))
+    with _trend_refresher_lock:
+        if _trend_refresher is not None and _trend_refresher.is_alive():
+            return _trend_refresher
+        _trend_refresher_stop.clear()
+        _trend_refresher = threading.Thread(
+            target=_refresh_trends_periodically, args=(interval,), name="pms-trend-refresh", daemon=True
+        )
+        _trend_refresher.start()
+        return _trend_refresher
+
+def stop_trend_refresher(timeout=5):
+    """Stops the trend refresher thread."""
+    global _trend_refresher
+    _trend_refresher_stop.set()
+    if _trend_refresher is not None:
+        _trend_refresher.join(timeout)
+    _trend_refresher = None
+
+def _trend_params(period, periods, **extra):
+    if period not in _TREND_PERIODS:
+        raise ValueError(f"period must be one of {', '.join(_TREND_PERIODS)}")
+    return dict(extra, period=period, periods=periods, step=_TREND_PERIODS[period])
+
+@_cached("goal_trends")
+@_replica_fallback
+def get_goal_trends(period="week", periods=12):
+    """Goals created, completed and overdue in each of the last `periods` weeks or months.
+
+    Returns (period_start, created, completed, overdue) rows, oldest first, with
+    zeros for quiet periods. Figures are as of the last refresh_trends().
+    """
+    params = _trend_params(period, periods)
+    with _connection(read_only=True) as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT s.period_start::DATE,
+                           COALESCE(t.created_goals, 0), COALESCE(t.completed_goals, 0), COALESCE(t.overdue_goals, 0)
+                    FROM generate_series(
+                        date_trunc(%(period)s, CURRENT_DATE) - (%(periods)s - 1) * %(step)s::INTERVAL,
+                        date_trunc(%(period)s, CURRENT_DATE),
+                        %(step)s::INTERVAL
+                    ) AS s(period_start)
+                    LEFT JOIN goal_trends t ON t.period = %(period)s AND t.period_start = s.period_start::DATE
+                    ORDER BY 1
+                """, params)
+                return cur.fetchall()
+    return []
+
+@_cached("feedback_trends")
+@_replica_fallback
+def get_feedback_trends(manager_id, period="week", periods=12):
+    """Feedback written per week or month by each manager in manager_id's reporting line.
+
+    Covers manager_id and every manager below them. Returns (period_start,
+    manager_id, manager_name, feedback_count) rows, oldest first; periods without
+    feedback are left out. Figures are as of the last refresh_trends().
+    """
+    params = _trend_params(period, periods, manager_id=manager_id)
+    with _connection(read_only=True) as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT t.period_start, t.manager_id, e.name, t.feedback_count
+                    FROM employee_hierarchy h
+                    JOIN feedback_trends t ON t.manager_id = h.descendant_id AND t.period = %(period)s
+                     AND t.period_start >= (date_trunc(%(period)s, CURRENT_DATE) - (%(periods)s - 1) * %(step)s::INTERVAL)::DATE
+                    JOIN employees e ON e.id = t.manager_id
+                    WHERE h.ancestor_id = %(manager_id)s
+                    ORDER BY t.period_start, e.name, t.manager_id
+                """, params)
+                return cur.fetchall()
+    return []
+
+# --- Archival ---
+# Completed and Cancelled goals of closed review cycles are moved, with their tasks
+# and feedback, into goals_archive, tasks_archive and feedback_archive (migration
+# 11), which are partitioned by year of the goal's due date. The live tables then
+# hold only open goals and recent cycles, so the everyday queries stay small.
+# Archived goals still count in insights and trends and can be read back for
+# reporting with get_archived_history().
+REVIEW_CYCLE_MONTHS = int(os.environ.get("PMS_REVIEW_CYCLE_MONTHS", 6))
+HOT_REVIEW_CYCLES = int(os.environ.get("PMS_HOT_REVIEW_CYCLES", 2))
+_ARCHIVE_TABLES = ("goals_archive", "tasks_archive", "feedback_archive")
+
+# Goals are only moved once the trend rollups have counted them and their feedback.
+_ARCHIVE_CANDIDATES = """
+    SELECT g.id, g.employee_id
+    FROM goals g, trend_watermark w
+    WHERE g.due_date < %(before)s AND g.due_date < w.processed_until
+      AND g.status IN ('Completed', 'Cancelled')
+      AND g.created_at < w.processed_until AND COALESCE(g.completed_at, g.created_at) < w.processed_until
+      AND NOT EXISTS (SELECT 1 FROM feedback f WHERE f.goal_id = g.id AND f.created_at >= w.processed_until)
+    ORDER BY g.due_date, g.id
+    LIMIT %(batch_size)s
+    FOR UPDATE OF g SKIP LOCKED
+"""
+
+def archive_cutoff(today=None):
+    """First day of the oldest review cycle kept live; closed goals due before it can be archived.
+
+    Cycles are PMS_REVIEW_CYCLE_MONTHS long, counted from January, and the current
+    cycle plus the PMS_HOT_REVIEW_CYCLES - 1 before it stay in the live tables.
+    """
+    today = today or date.today()
+    month = today.year * 12 + today.month - 1
+    month -= month % REVIEW_CYCLE_MONTHS + (HOT_REVIEW_CYCLES - 1) * REVIEW_CYCLE_MONTHS
+    return date(month // 12, month % 12 + 1, 1)
+
+def _archive_batch(cur, before, batch_size):
+    """Moves up to batch_size archivable goals with their tasks and feedback; returns the (id, employee_id) moved."""
+    # One archiver at a time, so yearly partitions are created exactly once.
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext('pms_archive'))")
+    cur.execute(_ARCHIVE_CANDIDATES, {"before": before, "batch_size": batch_size})
+    moved = cur.fetchall()
+    if not moved:
+        return moved
+    goal_ids = [goal_id for goal_id, _ in moved]
+    cur.execute("SELECT DISTINCT EXTRACT(YEAR FROM due_date)::INTEGER FROM goals WHERE id = ANY(%s)", (goal_ids,))
+    for (year,) in cur.fetchall():
+        for table in _ARCHIVE_TABLES:
+            cur.execute(
+                f"CREATE TABLE IF NOT EXISTS {table}_{year} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+            )
+    # Hold off edits to the goals' tasks and feedback until the move commits.
+    cur.execute("SELECT 1 FROM tasks WHERE goal_id = ANY(%s) FOR UPDATE", (goal_ids,))
+    cur.execute("SELECT 1 FROM feedback WHERE goal_id = ANY(%s) FOR UPDATE", (goal_ids,))
+    cur.execute("""
+        INSERT INTO goals_archive (id, employee_id, description, due_date, status, created_at, completed_at)
+        SELECT id, employee_id, description, due_date, status, created_at, completed_at
+        FROM goals WHERE id = ANY(%s)
+    """, (goal_ids,))
+    cur.execute("""
+        INSERT INTO tasks_archive (id, goal_id, goal_due_date, description, is_approved)
+        SELECT t.id, t.goal_id, g.due_date, t.description, t.is_approved
+        FROM tasks t JOIN goals g ON g.id = t.goal_id WHERE t.goal_id = ANY(%s)
+    """, (goal_ids,))
+    cur.execute("""
+        INSERT INTO feedback_archive (id, goal_id, goal_due_date, manager_id, feedback_text, created_at)
+        SELECT f.id, f.goal_id, g.due_date, f.manager_id, f.feedback_text, f.created_at
+        FROM feedback f JOIN goals g ON g.id = f.goal_id WHERE f.goal_id = ANY(%s)
+    """, (goal_ids,))
+    # Tasks and feedback go with their goals through ON DELETE CASCADE.
+    cur.execute("SELECT set_config('pms.archiving', 'on', TRUE)")
+    cur.execute("DELETE FROM goals WHERE id = ANY(%s)", (goal_ids,))
+    cur.execute("SELECT set_config('pms.archiving', 'off', TRUE)")
+    return moved
+
+def archive_closed_goals(before=None, batch_size=1000):
+    """Moves Completed and Cancelled goals due before `before` (default archive_cutoff()) to the archive.
+
+    Each batch of batch_size goals is committed on its own, so the live tables stay
+    writable throughout. Goals with activity the trend rollups have not counted yet
+    are left for a later run. Returns how many goals were moved.
+    """
+    before = before or archive_cutoff()
+    refresh_trends()
+    total = 0
+    while True:
+        with _connection() as conn:
+            if not conn:
+                break
+            with conn.cursor() as cur:
+                moved = _archive_batch(cur, before, batch_size)
+            _invalidate(
+                *{("goals", employee_id) for _, employee_id in moved},
+                *[(entity, goal_id) for goal_id, _ in moved for entity in ("tasks", "feedback")],
+            )
+        total += len(moved)
+        if len(moved) < batch_size:
+            break
+    return total
+
+@_replica_fallback
+def get_archived_history(employee_id):
+    """Retrieves an employee's archived goals with their tasks and feedback, newest due date first.
+
+    Same (goal, tasks, feedback) shape as get_performance_history().
+    """
+    with _connection(read_only=True) as conn:
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT id, description, due_date, status FROM goals_archive WHERE employee_id = %s ORDER BY due_date DESC, id DESC",
+                    (employee_id,)
+                )
+                goals = cur.fetchall()
+                goal_ids = [goal[0] for goal in goals]
+                # Matching on the partition key as well lets each query skip unrelated years.
+                due_dates = list({goal[2] for goal in goals})
+                cur.execute(
+                    """SELECT goal_id, id, description, is_approved FROM tasks_archive
+                       WHERE goal_id = ANY(%s) AND goal_due_date = ANY(%s) ORDER BY goal_id, id""",
+                    (goal_ids, due_dates)
+                )
+                tasks = _group_by_goal(goal_ids, cur.fetchall())
+                cur.execute(
+                    """SELECT f.goal_id, f.feedback_text, e.name, f.created_at
+                       FROM feedback_archive f JOIN employees e ON f.manager_id = e.id
+                       WHERE f.goal_id = ANY(%s) AND f.goal_due_date = ANY(%s) ORDER BY f.goal_id, f.created_at DESC""",
+                    (goal_ids, due_dates)
+                )
+                feedback = _group_by_goal(goal_ids, cur.fetchall())
+            return [(goal, tasks[goal[0]], feedback[goal[0]]) for goal in goals]
+    return []
+
+# --- Change Feed ---
+# Triggers send a NOTIFY on CHANGE_CHANNEL for every statement that writes goals,
+# tasks or feedback (migration 10) or employees (migration 13), from any process.
+# The listener turns each event into targeted invalidations of this process's
+# read cache and hands it on to subscribers, such as the frontend's per-session
+# caches.
+CHANGE_CHANNEL = "pms_changes"
+_CHANGE_KEYS = {"goals": ("goals", "employees"), "tasks": ("tasks", "goals"), "feedback": ("feedback", "goals")}
+_listener = None
+_listener_stop = threading.Event()
+_subscribers = []
+_subscribers_lock = threading.Lock()
+
+def subscribe_changes(callback):
+    """Calls callback(change) for each change event this process receives.
+
+    change is a dict with "table" ("goals", "tasks", "feedback" or "employees"), the
+    ids of the "goals" and "employees" whose rows changed, and the set_session() key of the
+    writer as "session" (None if it had none); an id list is None when the
+    statement touched too many rows to list. After the listener reconnects, events
+    may have been missed, and callbacks get {"table": None, "goals": None,
+    "employees": None, "session": None}, meaning anything may have changed.
+    Callbacks run on the listener thread and must not block.
+    """
+    with _subscribers_lock:
+        _subscribers.append(callback)
+
+def unsubscribe_changes(callback):
+    with _subscribers_lock:
+        if callback in _subscribers:
+            _subscribers.remove(callback)
+
+def _change_invalidations(change):
+    """Cache keys made stale by a change event."""
+    if change["table"] is None:
+        return [(entity,) for entity, _ in _CHANGE_KEYS.values()] + [("employees",), *_HIERARCHY_ENTITIES]
+    if change["table"] == "employees":
+        # Any org change can reshape many reporting lines (see _HIERARCHY_ENTITIES).
+        return [("employees",), *_HIERARCHY_ENTITIES]
+    entity, id_field = _CHANGE_KEYS[change["table"]]
+    if change[id_field] is None:
+        return [(entity,)]
+    return [(entity, key_id) for key_id in change[id_field]]
+
+def _dispatch_change(change):
+    _cache.invalidate(*_change_invalidations(change))
+    with _subscribers_lock:
+        callbacks = list(_subscribers)
+    for callback in callbacks:
+        try:
+            callback(change)
+        except Exception as e:
+            print(f"Change feed subscriber failed: {e}")
+
+def _listen():
+    """Listener thread: holds its own LISTEN connection and reconnects with backoff."""
+    delay = 1
+    connected_before = False
+    while not _listener_stop.is_set():
+        try:
+            conn = psycopg2.connect(**_connection_params())
+        except psycopg2.OperationalError as e:
+            print(f"Change feed could not connect: {e}")
+            _listener_stop.wait(delay)
+            delay = min(delay * 2, 30)
+            continue
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CHANGE_CHANNEL}")
+            delay = 1
+            if connected_before:
+                _dispatch_change({"table": None, "goals": None, "employees": None, "session": None})
+            connected_before = True
+            while not _listener_stop.is_set():
+                # The timeout only bounds how long stop_change_listener() waits.
+                if not select.select([conn], [], [], 1.0)[0]:
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    change = json.loads(conn.notifies.pop(0).payload)
+                    # Events from a database before migration 12 name no session.
+                    change.setdefault("session", None)
+                    _dispatch_change(change)
+        except (psycopg2.Error, OSError) as e:
+            print(f"Change feed lost its connection: {e}")
+        finally:
+            conn.close()
+
+def start_change_listener():
+    """Starts this process's change listener thread, unless it is already running."""
+    global _listener
+    with _subscribers_lock:
+        if _listener is not None and _listener.is_alive():
+            return _listener
+        _listener_stop.clear()
+        _listener = threading.Thread(target=_listen, name="pms-change-feed", daemon=True)
+        _listener.start()
+        return _listener
+
+def stop_change_listener(timeout=5):
+    """Stops the listener thread and closes its connection."""
+    global _listener
+    _listener_stop.set()
+    if _listener is not None:
+        _listener.join(timeout)
+    _listener = None
+
 # --- Initial Data Seeding ---
-def seed_data():
-    """Populates the database with initial sample data."""
-    conn = get_db_connection()
-    if conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT COUNT(*) FROM employees")
-            if cur.fetchone()[0] == 0:
-                # Managers
-                cur.execute("INSERT INTO employees (name) VALUES ('Alice Manager') RETURNING id;")
-                alice_id = cur.fetchone()[0]
-                # Employees
-                cur.execute("INSERT INTO employees (name, manager_id) VALUES ('Bob Smith', %s)", (alice_id,))
-                cur.execute("INSERT INTO employees (name, manager_id) VALUES ('Charlie Brown', %s)", (alice_id,))
-        conn.commit()
-        conn.close()
+def seed_data(scale=None):
+    """Populates the database with initial sample data. Runs once per process.
+
+    A scale above 0 (default: the PMS_SEED_SCALE environment variable) also loads a
+    synthetic org of that size from Synthetic_pms into a freshly seeded database.
+    """
+    global _seeded
+    if scale is None:
+        scale = float(os.environ.get("PMS_SEED_SCALE", 0))
+    if _seeded:
+        return
+    with _setup_lock:
+        if _seeded:
+            return
+        seeded = False
+        loaded_synthetic = False
+        with _connection() as conn:
+            if conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT EXISTS (SELECT 1 FROM employees)")
+                    if not cur.fetchone()[0]:
+                        # Managers
+                        cur.execute("INSERT INTO employees (name) VALUES ('Alice Manager') RETURNING id;")
+                        alice_id = cur.fetchone()[0]
+                        # Employees
+                        cur.execute("INSERT INTO employees (name, manager_id) VALUES ('Bob Smith', %s)", (alice_id,))
+                        cur.execute("INSERT INTO employees (name, manager_id) VALUES ('Charlie Brown', %s)", (alice_id,))
+                        if scale > 0:
+                            import Synthetic_pms
+                            Synthetic_pms.load_org(conn, scale)
+                            _cache.clear()
+                            loaded_synthetic = True
+                        _invalidate(("employees",), *_HIERARCHY_ENTITIES)
+                seeded = True
+        if loaded_synthetic:
+            rebuild_trends()
+        _seeded = seeded
+
+# --- Storage Engines ---
+# PMS_STORAGE=sqlite serves the functions below from the in-process SQLite engine
+# in Sqlite_pms instead of PostgreSQL. Functions built on them, such as
+# is_manager() and get_performance_history(), follow automatically. The pool,
+# cache, replica and change feed plumbing, and the Bulk, Synthetic, Reports,
+# Query_plans and Async tools, are PostgreSQL only.
+STORAGE = os.environ.get("PMS_STORAGE", "postgres")
+STORAGE_INTERFACE = (
+    "transaction", "setup_database", "get_schema_version", "seed_data",
+    "create_employee", "get_employees", "update_employee_manager",
+    "get_direct_reports", "get_subtree", "get_chain_of_command", "get_team_rollups",
+    "create_goal", "get_goals_for_employee", "update_goal_status", "update_goals_status", "delete_goal",
+    "create_task", "get_tasks_for_goal", "approve_task", "approve_tasks", "delete_task",
+    "create_feedback", "get_feedback_for_goal", "get_tasks_for_goals", "get_feedback_for_goals",
+    "get_goals_for_employee_page", "get_goal_summaries_page", "get_goal_summaries",
+    "get_feedback_for_goal_page", "iter_goals_for_employee", "iter_feedback_for_goal", "search",
+    "get_performance_insights", "get_employee_percentile", "rebuild_insights",
+    "refresh_trends", "rebuild_trends", "get_goal_trends", "get_feedback_trends",
+    "start_change_listener", "stop_change_listener", "archive_closed_goals", "get_archived_history",
+)
+
+if STORAGE == "sqlite":
+    import Sqlite_pms
+    for _name in STORAGE_INTERFACE:
+        globals()[_name] = getattr(Sqlite_pms, _name)
+elif STORAGE != "postgres":
+    raise ValueError(f"PMS_STORAGE must be 'postgres' or 'sqlite', not {STORAGE!r}")
+
+# --- Instrumentation ---
+# Pool and cache plumbing is measured through the calls that use it.
+_NOT_INSTRUMENTED = {
+    "init_connection_pool", "close_connection_pool", "get_db_connection", "release_db_connection",
+    "transaction", "get_cache_stats", "clear_cache", "configure_cache", "set_session",
+    "get_replica_status", "subscribe_changes", "unsubscribe_changes", "start_change_listener",
+    "stop_change_listener", "archive_cutoff", "start_trend_refresher", "stop_trend_refresher",
+}
+
+if metrics.ENABLED:
+    for _name, _func in list(globals().items()):
+        if (inspect.isfunction(_func) and (_func.__module__ == __name__ or _name in STORAGE_INTERFACE)
+                and not _name.startswith("_") and _name not in _NOT_INSTRUMENTED):
+            globals()[_name] = metrics.instrument(_func)
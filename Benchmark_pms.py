@@ -0,0 +1,188 @@
+"""Latency and throughput benchmark for every Backend_pms query path.
+
+Times each call from Query_plans_pms.hot_calls at every requested concurrency and
+writes the results to a JSON file, so runs can be compared across changes. Writes
+are rolled back. The read cache is disabled unless --with-cache is given.
+
+Point the DB_* environment variables at a scratch database, then:
+
+    python Benchmark_pms.py --scales 1,10,100 --reset --output bench.json
+    python Benchmark_pms.py --concurrency 1,8 --iterations 50
+
+--reset empties the core tables before loading each scale. Without --scales the
+data already in the database is benchmarked.
+"""
+import argparse
+import inspect
+import json
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import Backend_pms as be
+import Query_plans_pms as plans
+import Synthetic_pms
+
+class _Rollback(Exception):
+    pass
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _reset_and_load(scale, seed):
+    """Empties the core tables and loads a synthetic org of the given scale."""
+    with be.transaction() as conn:
+        with conn.cursor() as cur:
+            cur.execute("TRUNCATE employees, goals, tasks, feedback RESTART IDENTITY CASCADE")
+        counts = Synthetic_pms.load_org(conn, scale, seed)
+    be.clear_cache()
+    be.rebuild_trends()
+    return counts
+
+def _call(func, args, writes):
+    """Runs one backend call to completion; writes are rolled back."""
+    if writes:
+        try:
+            with be.transaction():
+                func(*args)
+                raise _Rollback()
+        except _Rollback:
+            pass
+        return
+    result = func(*args)
+    if inspect.isgenerator(result):
+        for _ in result:
+            pass
+
+def _percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+def measure(name, args, writes, concurrency, iterations):
+    """Runs iterations calls per worker on concurrency threads; returns a result dict (ms)."""
+    func = getattr(be, name)
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(iterations):
+            start = time.perf_counter()
+            try:
+                _call(func, args, writes)
+            except Exception as e:
+                with lock:
+                    errors.append(f"{type(e).__name__}: {e}")
+                continue
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "function": name,
+        "args": repr(args),
+        "writes": writes,
+        "concurrency": concurrency,
+        "calls": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "mean_ms": sum(latencies) / len(latencies) if latencies else None,
+        "p50_ms": _percentile(latencies, 50),
+        "p95_ms": _percentile(latencies, 95),
+        "p99_ms": _percentile(latencies, 99),
+        "max_ms": latencies[-1] if latencies else None,
+        "throughput_per_s": len(latencies) / wall if wall else None,
+    }
+
+def run(scale, concurrencies, iterations, only=None):
+    """Benchmarks every hot call at each concurrency against the current data."""
+    conn = be.get_db_connection()
+    if conn is None:
+        raise SystemExit("Could not connect to the database.")
+    try:
+        calls = plans.hot_calls(*plans.sample_ids(conn))
+    finally:
+        be.release_db_connection(conn)
+
+    results = []
+    for name, args, writes, _ in calls:
+        if only and name not in only:
+            continue
+        for concurrency in concurrencies:
+            result = measure(name, args, writes, concurrency, iterations)
+            result["scale"] = scale
+            results.append(result)
+            p95 = f"{result['p95_ms']:.2f}" if result["p95_ms"] is not None else "-"
+            print(f"{str(scale):>6} {name:<30} c={concurrency:<3} p95={p95:>9} ms  errors={result['errors']}")
+    return results
+
+def _int_list(value):
+    return [int(item) for item in value.split(",") if item]
+
+def _float_list(value):
+    return [float(item) for item in value.split(",") if item]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Backend_pms functions at several scales and concurrency levels.")
+    parser.add_argument("--scales", type=_float_list, default=None, help="comma-separated synthetic org sizes, e.g. 1,10,100")
+    parser.add_argument("--reset", action="store_true", help="allow emptying the core tables before loading each scale")
+    parser.add_argument("--seed", type=int, default=25176)
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4, 16], help="comma-separated thread counts")
+    parser.add_argument("--iterations", type=int, default=20, help="calls per thread per function")
+    parser.add_argument("--only", type=lambda value: set(value.split(",")), default=None, help="comma-separated function names")
+    parser.add_argument("--with-cache", action="store_true", help="keep the read cache enabled")
+    parser.add_argument("--output", default="bench.json")
+    args = parser.parse_args(argv)
+
+    if args.scales and not args.reset:
+        parser.error("--scales replaces all data in the database; pass --reset to confirm")
+
+    started_at = datetime.now(timezone.utc).isoformat()
+    be.setup_database()
+    be.init_connection_pool(1, max(args.concurrency) + 1)
+    if not args.with_cache:
+        be.configure_cache(ttl=0)
+
+    results = []
+    loads = {}
+    try:
+        for scale in args.scales or [None]:
+            if scale is not None:
+                loads[str(scale)] = _reset_and_load(scale, args.seed)
+            results.extend(run(scale, args.concurrency, args.iterations, args.only))
+    finally:
+        be.close_connection_pool()
+
+    report = {
+        "meta": {
+            "started_at": started_at,
+            "git_commit": _git_commit(),
+            "seed": args.seed,
+            "iterations": args.iterations,
+            "cache": args.with_cache,
+            "loaded_rows": loads,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as out:
+        json.dump(report, out, indent=2)
+    print(f"\nWrote {len(results)} results to {args.output}")
+    return 1 if any(result["errors"] for result in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,334 @@
+"""COPY-based bulk import and streaming export for the PMS database.
+
+Rows are read from CSV or NDJSON files (or any iterable of dicts), streamed into
+temporary staging tables with COPY FROM STDIN, validated, and then inserted with
+one set-based statement per table. References between rows of the same batch are
+resolved on the server:
+
+    employees: ref, name, manager_ref | manager_id
+    goals:     ref, employee_ref | employee_id, description, due_date, status
+    tasks:     goal_ref | goal_id, description, is_approved
+    feedback:  goal_ref | goal_id, manager_ref | manager_id, feedback_text, created_at
+
+*_ref columns point at the ref of a row in the same batch; *_id columns point at
+rows that already exist in the database.
+
+    python Bulk_pms.py import --employees employees.csv --goals goals.ndjson --dry-run
+    python Bulk_pms.py export --output history.csv --include-archived
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+
+import Backend_pms as be
+
+COLUMNS = {
+    "employees": ["ref", "name", "manager_ref", "manager_id"],
+    "goals": ["ref", "employee_ref", "employee_id", "description", "due_date", "status"],
+    "tasks": ["goal_ref", "goal_id", "description", "is_approved"],
+    "feedback": ["goal_ref", "goal_id", "manager_ref", "manager_id", "feedback_text", "created_at"],
+}
+
+# Each check selects (row number, message) for offending staged rows. Values the
+# INSERTs cast are checked with pg_temp.pms_input_is_valid() (see _create_cast_check),
+# so a batch that validates also casts, and a lookup only casts an id that is valid.
+VALIDATIONS = {
+    "employees": [
+        "SELECT n, 'name is required' FROM stage_employees WHERE COALESCE(name, '') = ''",
+        "SELECT n, 'duplicate ref ' || ref FROM stage_employees s WHERE ref IS NOT NULL AND EXISTS (SELECT 1 FROM stage_employees o WHERE o.ref = s.ref AND o.n < s.n)",
+        "SELECT n, 'manager_ref ' || manager_ref || ' is not in this batch' FROM stage_employees s WHERE manager_ref IS NOT NULL AND NOT EXISTS (SELECT 1 FROM stage_employees m WHERE m.ref = s.manager_ref)",
+        "SELECT n, 'manager_id ' || manager_id || ' is not an existing employee' FROM stage_employees s WHERE manager_id IS NOT NULL AND CASE WHEN manager_id !~ '^[0-9]+$' OR NOT pg_temp.pms_input_is_valid(manager_id, 'integer') THEN TRUE ELSE NOT EXISTS (SELECT 1 FROM employees e WHERE e.id = s.manager_id::INTEGER) END",
+    ],
+    "goals": [
+        "SELECT n, 'description is required' FROM stage_goals WHERE COALESCE(description, '') = ''",
+        "SELECT n, 'due_date must be a valid YYYY-MM-DD date' FROM stage_goals WHERE COALESCE(due_date, '') !~ '^[0-9]{4}-[0-9]{2}-[0-9]{2}$' OR NOT pg_temp.pms_input_is_valid(due_date, 'date')",
+        "SELECT n, 'invalid status ' || status FROM stage_goals WHERE status IS NOT NULL AND status NOT IN ('Draft', 'In Progress', 'Completed', 'Cancelled')",
+        "SELECT n, 'duplicate ref ' || ref FROM stage_goals s WHERE ref IS NOT NULL AND EXISTS (SELECT 1 FROM stage_goals o WHERE o.ref = s.ref AND o.n < s.n)",
+        "SELECT n, 'employee_ref or employee_id is required' FROM stage_goals WHERE employee_ref IS NULL AND employee_id IS NULL",
+        "SELECT n, 'employee_ref ' || employee_ref || ' is not in this batch' FROM stage_goals s WHERE employee_ref IS NOT NULL AND NOT EXISTS (SELECT 1 FROM stage_employees e WHERE e.ref = s.employee_ref)",
+        "SELECT n, 'employee_id ' || employee_id || ' is not an existing employee' FROM stage_goals s WHERE employee_id IS NOT NULL AND CASE WHEN employee_id !~ '^[0-9]+$' OR NOT pg_temp.pms_input_is_valid(employee_id, 'integer') THEN TRUE ELSE NOT EXISTS (SELECT 1 FROM employees e WHERE e.id = s.employee_id::INTEGER) END",
+    ],
+    "tasks": [
+        "SELECT n, 'description is required' FROM stage_tasks WHERE COALESCE(description, '') = ''",
+        "SELECT n, 'is_approved must be true or false' FROM stage_tasks WHERE is_approved IS NOT NULL AND lower(is_approved) NOT IN ('true', 'false', 't', 'f', '1', '0', 'yes', 'no')",
+        "SELECT n, 'goal_ref or goal_id is required' FROM stage_tasks WHERE goal_ref IS NULL AND goal_id IS NULL",
+        "SELECT n, 'goal_ref ' || goal_ref || ' is not in this batch' FROM stage_tasks s WHERE goal_ref IS NOT NULL AND NOT EXISTS (SELECT 1 FROM stage_goals g WHERE g.ref = s.goal_ref)",
+        "SELECT n, 'goal_id ' || goal_id || ' is not an existing goal' FROM stage_tasks s WHERE goal_id IS NOT NULL AND CASE WHEN goal_id !~ '^[0-9]+$' OR NOT pg_temp.pms_input_is_valid(goal_id, 'integer') THEN TRUE ELSE NOT EXISTS (SELECT 1 FROM goals g WHERE g.id = s.goal_id::INTEGER) END",
+    ],
+    "feedback": [
+        "SELECT n, 'feedback_text is required' FROM stage_feedback WHERE COALESCE(feedback_text, '') = ''",
+        "SELECT n, 'created_at ' || created_at || ' is not a valid timestamp' FROM stage_feedback WHERE created_at IS NOT NULL AND NOT pg_temp.pms_input_is_valid(created_at, 'timestamp')",
+        "SELECT n, 'goal_ref or goal_id is required' FROM stage_feedback WHERE goal_ref IS NULL AND goal_id IS NULL",
+        "SELECT n, 'goal_ref ' || goal_ref || ' is not in this batch' FROM stage_feedback s WHERE goal_ref IS NOT NULL AND NOT EXISTS (SELECT 1 FROM stage_goals g WHERE g.ref = s.goal_ref)",
+        "SELECT n, 'goal_id ' || goal_id || ' is not an existing goal' FROM stage_feedback s WHERE goal_id IS NOT NULL AND CASE WHEN goal_id !~ '^[0-9]+$' OR NOT pg_temp.pms_input_is_valid(goal_id, 'integer') THEN TRUE ELSE NOT EXISTS (SELECT 1 FROM goals g WHERE g.id = s.goal_id::INTEGER) END",
+        "SELECT n, 'manager_ref ' || manager_ref || ' is not in this batch' FROM stage_feedback s WHERE manager_ref IS NOT NULL AND NOT EXISTS (SELECT 1 FROM stage_employees m WHERE m.ref = s.manager_ref)",
+        "SELECT n, 'manager_id ' || manager_id || ' is not an existing employee' FROM stage_feedback s WHERE manager_id IS NOT NULL AND CASE WHEN manager_id !~ '^[0-9]+$' OR NOT pg_temp.pms_input_is_valid(manager_id, 'integer') THEN TRUE ELSE NOT EXISTS (SELECT 1 FROM employees e WHERE e.id = s.manager_id::INTEGER) END",
+    ],
+}
+
+# pg_input_is_valid() needs PostgreSQL 16; older servers try the cast in a
+# subtransaction instead. The function lives as long as the pooled connection,
+# hence OR REPLACE.
+_CAST_CHECK_PG16 = """
+    CREATE OR REPLACE FUNCTION pg_temp.pms_input_is_valid(value TEXT, type_name TEXT) RETURNS BOOLEAN
+    AS 'SELECT pg_input_is_valid(value, type_name)' LANGUAGE sql STABLE
+"""
+_CAST_CHECK_FALLBACK = """
+    CREATE OR REPLACE FUNCTION pg_temp.pms_input_is_valid(value TEXT, type_name TEXT) RETURNS BOOLEAN AS $$
+    BEGIN
+        IF value IS NOT NULL THEN
+            EXECUTE format('SELECT %L::%s', value, type_name);
+        END IF;
+        RETURN TRUE;
+    EXCEPTION WHEN data_exception THEN
+        RETURN FALSE;
+    END;
+    $$ LANGUAGE plpgsql STABLE
+"""
+
+# Batch refs become real ids by drawing from the table sequences before inserting,
+# so rows can point at each other (including forward references) in one statement.
+INSERTS = {
+    "employees": [
+        "UPDATE stage_employees SET new_id = nextval(pg_get_serial_sequence('employees', 'id'))",
+        """INSERT INTO employees (id, name, manager_id)
+           SELECT s.new_id, s.name, COALESCE(m.new_id, s.manager_id::INTEGER)
+           FROM stage_employees s LEFT JOIN stage_employees m ON m.ref = s.manager_ref
+           ORDER BY s.n""",
+    ],
+    "goals": [
+        "UPDATE stage_goals SET new_id = nextval(pg_get_serial_sequence('goals', 'id'))",
+        """INSERT INTO goals (id, employee_id, description, due_date, status)
+           SELECT s.new_id, COALESCE(e.new_id, s.employee_id::INTEGER), s.description, s.due_date::DATE, COALESCE(s.status, 'Draft')
+           FROM stage_goals s LEFT JOIN stage_employees e ON e.ref = s.employee_ref
+           ORDER BY s.n""",
+    ],
+    "tasks": [
+        """INSERT INTO tasks (goal_id, description, is_approved)
+           SELECT COALESCE(g.new_id, s.goal_id::INTEGER), s.description, COALESCE(s.is_approved::BOOLEAN, FALSE)
+           FROM stage_tasks s LEFT JOIN stage_goals g ON g.ref = s.goal_ref
+           ORDER BY s.n""",
+    ],
+    "feedback": [
+        """INSERT INTO feedback (goal_id, manager_id, feedback_text, created_at)
+           SELECT COALESCE(g.new_id, s.goal_id::INTEGER), COALESCE(m.new_id, s.manager_id::INTEGER), s.feedback_text,
+                  COALESCE(s.created_at::TIMESTAMP, CURRENT_TIMESTAMP)
+           FROM stage_feedback s
+           LEFT JOIN stage_goals g ON g.ref = s.goal_ref
+           LEFT JOIN stage_employees m ON m.ref = s.manager_ref
+           ORDER BY s.n""",
+    ],
+}
+
+HISTORY_QUERY = """
+    SELECT * FROM (
+        SELECT 'goal' AS record_type, e.id AS employee_id, e.name AS employee_name, g.id AS goal_id,
+               g.description AS goal_description, g.due_date, g.status,
+               NULL::INTEGER AS item_id, NULL::TEXT AS item_text, NULL::BOOLEAN AS is_approved,
+               NULL::TEXT AS manager_name, NULL::TIMESTAMP AS created_at
+        FROM {goals} g JOIN employees e ON e.id = g.employee_id {where}
+        UNION ALL
+        SELECT 'task', e.id, e.name, g.id, g.description, g.due_date, g.status,
+               t.id, t.description, t.is_approved, NULL, NULL
+        FROM {tasks} t JOIN {goals} g ON g.id = t.goal_id JOIN employees e ON e.id = g.employee_id {where}
+        UNION ALL
+        SELECT 'feedback', e.id, e.name, g.id, g.description, g.due_date, g.status,
+               f.id, f.feedback_text, NULL, m.name, f.created_at
+        FROM {feedback} f JOIN {goals} g ON g.id = f.goal_id JOIN employees e ON e.id = g.employee_id
+        LEFT JOIN employees m ON m.id = f.manager_id {where}
+    ) history
+    -- Each goal row first, then its tasks, then its feedback.
+    ORDER BY employee_id, goal_id, CASE record_type WHEN 'goal' THEN 0 WHEN 'task' THEN 1 ELSE 2 END, item_id
+"""
+
+# Archived goals keep their ids, so the archive can simply be appended to the live tables.
+HISTORY_SOURCES = {
+    False: {"goals": "goals", "tasks": "tasks", "feedback": "feedback"},
+    True: {
+        "goals": """(SELECT id, employee_id, description, due_date, status FROM goals
+                     UNION ALL SELECT id, employee_id, description, due_date, status FROM goals_archive)""",
+        "tasks": """(SELECT id, goal_id, description, is_approved FROM tasks
+                     UNION ALL SELECT id, goal_id, description, is_approved FROM tasks_archive)""",
+        "feedback": """(SELECT id, goal_id, manager_id, feedback_text, created_at FROM feedback
+                        UNION ALL SELECT id, goal_id, manager_id, feedback_text, created_at FROM feedback_archive)""",
+    },
+}
+
+class BulkImportError(Exception):
+    """Raised when a batch fails validation; errors is a list of (entity, row number, message)."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f"{len(errors)} validation error(s) in bulk import")
+
+class _DryRun(Exception):
+    pass
+
+# --- Readers ---
+def read_rows(path):
+    """Yields dict rows from a .csv file (with a header) or an .ndjson/.jsonl file."""
+    if path.endswith((".ndjson", ".jsonl")):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+
+class CopyStream:
+    """File-like object that CSV-encodes an iterable of value sequences lazily, for COPY FROM STDIN.
+
+    None becomes an unquoted empty field, which COPY reads as NULL.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self.rows_read = 0
+
+    def read(self, size=-1):
+        try:
+            while size < 0 or self._buffer.tell() < size:
+                row = next(self._rows)
+                self._writer.writerow(["" if value is None else value for value in row])
+                self.rows_read += 1
+        except StopIteration:
+            pass
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+# --- Import ---
+def _stage(cur, entity, rows):
+    """Creates the staging table for entity and COPYs rows into it; returns the row count."""
+    columns = COLUMNS[entity]
+    definitions = ", ".join(f"{column} TEXT" for column in columns)
+    cur.execute(f"CREATE TEMP TABLE stage_{entity} (n INTEGER, {definitions}, new_id INTEGER) ON COMMIT DROP")
+    if rows is None:
+        return 0
+    # Each row is prefixed with its 1-based position so validation errors can point at it.
+    stream = CopyStream(
+        [n] + [row.get(column) if row.get(column) != "" else None for column in columns]
+        for n, row in enumerate(rows, 1)
+    )
+    cur.copy_expert(
+        f"COPY stage_{entity} (n, {', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+        stream
+    )
+    if "ref" in columns:
+        cur.execute(f"CREATE INDEX ON stage_{entity} (ref)")
+    cur.execute(f"ANALYZE stage_{entity}")
+    return stream.rows_read
+
+def _create_cast_check(cur):
+    """Creates pg_temp.pms_input_is_valid(value, type_name), which the VALIDATIONS use."""
+    cur.execute(_CAST_CHECK_PG16 if cur.connection.server_version >= 160000 else _CAST_CHECK_FALLBACK)
+
+def import_batch(employees=None, goals=None, tasks=None, feedback=None, dry_run=False):
+    """Imports one batch atomically and returns the row count per entity.
+
+    Each argument is an iterable of dict rows (see read_rows). With dry_run the batch
+    is staged and validated but nothing is written. Raises BulkImportError listing
+    every problem found; nothing is imported in that case.
+    """
+    batches = {"employees": employees, "goals": goals, "tasks": tasks, "feedback": feedback}
+    counts = {}
+    try:
+        with be.transaction() as conn:
+            with conn.cursor() as cur:
+                for entity, rows in batches.items():
+                    counts[entity] = _stage(cur, entity, rows)
+                _create_cast_check(cur)
+                errors = []
+                for entity, checks in VALIDATIONS.items():
+                    for check in checks:
+                        cur.execute(check + " ORDER BY 1 LIMIT 100")
+                        errors.extend((entity, n, message) for n, message in cur.fetchall())
+                if errors:
+                    raise BulkImportError(errors)
+                if dry_run:
+                    raise _DryRun()
+                for entity, statements in INSERTS.items():
+                    if counts[entity]:
+                        for statement in statements:
+                            cur.execute(statement)
+    except _DryRun:
+        pass
+    if not dry_run:
+        be.clear_cache()
+        if counts.get("feedback"):
+            # Imported feedback may be backdated to before the trend watermark.
+            be.rebuild_trends()
+    return counts
+
+# --- Export ---
+def export_history(out, fmt="csv", employee_ids=None, include_archived=False):
+    """Streams the full performance history (goals, tasks and feedback) to the file object out.
+
+    Rows flow straight from COPY TO STDOUT into out, so memory use stays flat no
+    matter how large the history is. fmt is "csv" (with a header) or "ndjson".
+    include_archived adds the goals moved out by Backend_pms.archive_closed_goals().
+    """
+    with be.transaction() as conn:
+        with conn.cursor() as cur:
+            where = "WHERE e.id = ANY(%s)" if employee_ids else ""
+            query = HISTORY_QUERY.format(where=where, **HISTORY_SOURCES[include_archived])
+            if employee_ids:
+                query = cur.mogrify(query, (list(employee_ids),) * 3).decode()
+            if fmt == "ndjson":
+                # One JSON document per line; the control-character quote and delimiter
+                # stop COPY from quoting or escaping the JSON text.
+                cur.copy_expert(
+                    f"COPY (SELECT row_to_json(h) FROM ({query}) h) TO STDOUT WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')",
+                    out
+                )
+            else:
+                cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", out)
+
+# --- Command Line ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import and export for the Performance Management System.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importer = commands.add_parser("import", help="load employees, goals, tasks and feedback with COPY")
+    for entity in COLUMNS:
+        importer.add_argument(f"--{entity}", metavar="FILE", help=f"{entity} as .csv or .ndjson")
+    importer.add_argument("--dry-run", action="store_true", help="validate the batch without writing it")
+
+    exporter = commands.add_parser("export", help="stream the performance history with COPY")
+    exporter.add_argument("--output", default="-", help="output file, or - for stdout")
+    exporter.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    exporter.add_argument("--employee-id", type=int, action="append", help="limit to these employees")
+    exporter.add_argument("--include-archived", action="store_true", help="also export archived review cycles")
+    args = parser.parse_args(argv)
+
+    be.setup_database()
+    if args.command == "import":
+        files = {entity: getattr(args, entity) for entity in COLUMNS}
+        try:
+            counts = import_batch(dry_run=args.dry_run, **{
+                entity: read_rows(path) if path else None for entity, path in files.items()
+            })
+        except BulkImportError as e:
+            for entity, n, message in e.errors:
+                print(f"{files[entity]}: row {n}: {message}", file=sys.stderr)
+            print(e, file=sys.stderr)
+            return 1
+        verb = "Validated" if args.dry_run else "Imported"
+        print(f"{verb} " + ", ".join(f"{count} {entity}" for entity, count in counts.items()))
+        return 0
+
+    if args.output == "-":
+        export_history(sys.stdout, args.format, args.employee_id, args.include_archived)
+    else:
+        with open(args.output, "w", newline="", encoding="utf-8") as out:
+            export_history(out, args.format, args.employee_id, args.include_archived)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
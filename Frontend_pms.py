@@ -1,27 +1,376 @@
 import streamlit as st
 import Backend_pms as be
+import Metrics_pms as metrics
+import os
+import threading
+import time
+import uuid
+import weakref
 from datetime import date
 
 st.set_page_config(page_title="Performance Management System", layout="wide")
 
+PAGE_SIZE = 10
+STATUSES = ['Draft', 'In Progress', 'Completed', 'Cancelled']
+# Seconds a read stays in the per-session cache before it is fetched again.
+SESSION_CACHE_TTL = float(os.environ.get("PMS_SESSION_CACHE_TTL", 30))
+# Seconds between checks for changes made by other sessions; 0 only checks on interaction.
+LIVE_UPDATE_SECONDS = float(os.environ.get("PMS_LIVE_UPDATE_SECONDS", 2))
+
+# --- Session Read Cache ---
+# Reads are kept in st.session_state under keys like ("tasks", goal_id), so reruns
+# reuse them, and the button that writes drops exactly the keys it changed.
+def _session_reads():
+    return st.session_state.setdefault("_session_reads", {})
+
+def session_read(key, loader):
+    """Returns loader(), cached in this session under key until it expires or is invalidated."""
+    reads = _session_reads()
+    entry = reads.get(key)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+    value = loader()
+    reads[key] = (time.monotonic() + SESSION_CACHE_TTL, value)
+    return value
+
+def session_read_many(entity, goal_ids, loader):
+    """Per-goal rows for goal_ids, fetching every missing goal with one call to loader(missing_ids)."""
+    reads = _session_reads()
+    now = time.monotonic()
+    missing = [goal_id for goal_id in goal_ids if reads.get((entity, goal_id), (0,))[0] <= now]
+    if missing:
+        for goal_id, rows in loader(missing).items():
+            reads[(entity, goal_id)] = (now + SESSION_CACHE_TTL, rows)
+    return {goal_id: reads.get((entity, goal_id), (0, []))[1] for goal_id in goal_ids}
+
+def session_store_many(entity, rows_by_goal):
+    """Seeds per-goal reads that are not cached yet, e.g. from a page query that already returned them."""
+    reads = _session_reads()
+    now = time.monotonic()
+    for goal_id, rows in rows_by_goal.items():
+        if reads.get((entity, goal_id), (0,))[0] <= now:
+            reads[(entity, goal_id)] = (now + SESSION_CACHE_TTL, rows)
+
+def session_invalidate(*keys):
+    """Drops cached reads; a shorter key such as ("tasks",) or ("history_page", 7) drops every read it prefixes."""
+    reads = _session_reads()
+    for key in keys:
+        for stale in [k for k in reads if k[:len(key)] == key]:
+            del reads[stale]
+
+def backend_session():
+    """Tells the backend which session this run belongs to, so reads see the session's own writes.
+
+    Called at the start of every run, including fragment reruns.
+    """
+    be.set_session(st.session_state.setdefault("_backend_session", uuid.uuid4().hex))
+
+# Everything listing or counting goals changes when a goal is created or changes status.
+GOAL_LISTINGS = [("goals",), ("goal_summary_page",), ("history_page",), ("archived_history",), ("team_rollups",)]
+# Team rollups are keyed by manager and count the goals of their whole reporting
+# line, so goal and org changes drop them all, as they do the reporting lines.
+ORG_READS = [("employees",), ("is_manager",), ("subtree",), ("team_rollups",)]
+
+# --- Live Updates ---
+# The backend's change listener reports writes to goals, tasks, feedback and
+# employees from every process. Each session collects the read keys those writes
+# make stale and drops them on its next run, so only the affected goals are
+# fetched again. The live_updates fragment checks the session's inbox in memory,
+# not the database.
+# Events name the session that wrote them; a session skips its own, since its
+# buttons already dropped the reads they change.
+def session_keys_for(change):
+    """Session read keys a backend change event makes stale; () stands for everything."""
+    table, goal_ids, employee_ids = change["table"], change["goals"], change["employees"]
+    if table is None:
+        return [()]
+    if table == "employees":
+        return ORG_READS
+    keys = [("team_rollups",)] if table == "goals" else []
+    goal_entities = ["summary"] if table == "goals" else [table, "summary"]
+    if goal_ids is None:
+        keys += [(entity,) for entity in goal_entities]
+    else:
+        keys += [(entity, goal_id) for goal_id in goal_ids for entity in goal_entities]
+    listings = [key[0] for key in GOAL_LISTINGS if key[0] != "team_rollups"] if table == "goals" else ["history_page"]
+    if employee_ids is None:
+        keys += [(entity,) for entity in listings]
+    else:
+        keys += [(entity, employee_id) for employee_id in employee_ids for entity in listings]
+    return keys
+
+class ChangeInbox:
+    """Read keys other writers have made stale since the session last looked."""
+
+    def __init__(self, session):
+        self.session = session
+        self.keys = set()
+        self.lock = threading.Lock()
+
+    def add(self, keys):
+        with self.lock:
+            self.keys.update(keys)
+            if len(self.keys) > 1000:
+                # A session that has been idle a long time just drops whole entities.
+                self.keys = {key[:1] for key in self.keys}
+
+    def take(self):
+        with self.lock:
+            keys, self.keys = self.keys, set()
+        return keys
+
+@st.cache_resource
+def change_feed():
+    """Starts the backend change listener once per process and fans its events out to session inboxes."""
+    inboxes = weakref.WeakSet()
+    lock = threading.Lock()
+
+    def deliver(change):
+        keys = session_keys_for(change)
+        with lock:
+            targets = list(inboxes)
+        for inbox in targets:
+            if inbox.session != change["session"]:
+                inbox.add(keys)
+
+    be.subscribe_changes(deliver)
+    be.start_change_listener()
+    return inboxes, lock
+
+@st.cache_resource
+def trend_refresher():
+    """Keeps the trend rollups current from one background thread per process, so pages only read them."""
+    return be.start_trend_refresher()
+
+def apply_changes():
+    """Drops this session's reads that other writers have changed; returns True if any were cached."""
+    inbox = st.session_state.get("_change_inbox")
+    if inbox is None:
+        inboxes, lock = change_feed()
+        inbox = st.session_state["_change_inbox"] = ChangeInbox(st.session_state["_backend_session"])
+        with lock:
+            inboxes.add(inbox)
+    reads = _session_reads()
+    stale = [key for key in inbox.take() if any(read[:len(key)] == key for read in reads)]
+    session_invalidate(*stale)
+    return bool(stale)
+
+@st.fragment(run_every=LIVE_UPDATE_SECONDS or None)
+def live_updates():
+    """Reruns the page once something it shows has been changed elsewhere."""
+    if apply_changes():
+        st.rerun()
+
+def goal_summary_page(employee_id, cursor):
+    """One page of goals with their task/feedback counts, seeding each goal's ("summary", id) read."""
+    goals, next_cursor = session_read(
+        ("goal_summary_page", employee_id, cursor),
+        lambda: be.get_goal_summaries_page(employee_id, PAGE_SIZE, cursor),
+    )
+    session_store_many("summary", {goal[0]: goal[4:] for goal in goals})
+    return goals, next_cursor
+
+def goal_summary(goal_id):
+    """(task_count, approved_task_count, feedback_count) for one goal."""
+    return session_read_many("summary", [goal_id], be.get_goal_summaries)[goal_id]
+
+def current_page_cursor(key):
+    """Returns the keyset cursor of the page currently shown for a paginated listing."""
+    return st.session_state.setdefault(key, [None])[-1]
+
+def page_controls(key, next_cursor):
+    """Renders Previous/Next buttons for a keyset-paginated listing."""
+    pages = st.session_state.setdefault(key, [None])
+    col1, col2, col3 = st.columns([1, 1, 6])
+    with col1:
+        if st.button("Previous", key=f"{key}_prev", disabled=len(pages) == 1):
+            pages.pop()
+            st.rerun()
+    with col2:
+        if st.button("Next", key=f"{key}_next", disabled=next_cursor is None):
+            pages.append(next_cursor)
+            st.rerun()
+    with col3:
+        st.caption(f"Page {len(pages)}")
+
+def show_history(history):
+    """Renders (goal, tasks, feedback) entries from the performance history."""
+    for (goal_id, desc, due, status), tasks, feedback in history:
+        st.markdown(f"### Goal: {desc}")
+        st.write(f"**Status:** {status} | **Due:** {due}")
+
+        st.markdown("**Associated Tasks:**")
+        if tasks:
+            for _, task_desc, is_approved in tasks:
+                st.write(f"- {task_desc} `{'Approved' if is_approved else 'Pending'}`")
+        else:
+            st.write("_No tasks logged for this goal._")
+
+        st.markdown("**Associated Feedback:**")
+        if feedback:
+            for fb_text, manager_name, ts in feedback:
+                st.text(f"[{ts.strftime('%Y-%m-%d')}] from {manager_name}: {fb_text}")
+        else:
+            st.write("_No feedback recorded for this goal._")
+        st.markdown("---")
+
+def call_cost_panel(calls):
+    """Sidebar summary of what the backend calls made during this rerun cost."""
+    top_level = [call for call in calls if call.depth == 0]
+    total_ms = sum(call.wall_ms for call in top_level)
+    with st.sidebar.expander(f"Backend: {len(top_level)} calls, {total_ms:.0f} ms"):
+        st.table([
+            {
+                "Function": call.name,
+                "ms": f"{call.wall_ms:.1f}",
+                "SQL": call.statements,
+                "Rows": call.rows,
+                "Wait ms": f"{call.acquire_ms:.1f}",
+            }
+            for call in sorted(top_level, key=lambda call: call.wall_ms, reverse=True)
+        ])
+
+# --- Goal Cards ---
+# Each card is a fragment: its buttons rerun only the card, and a write refetches
+# only that goal's rows. Headers show counts from the page's summary query; a
+# goal's tasks or feedback are only loaded once the user asks to see them.
+@st.fragment
+def goal_task_card(goal_id, desc, due, status, is_manager):
+    """Expander with a goal's tasks, approval buttons and the form to log a task."""
+    backend_session()
+    apply_changes()
+    task_count, approved_count, _ = goal_summary(goal_id)
+    # The header changes with the counts, so reopen the card if its tasks are being shown.
+    with st.expander(
+        f"Goal: {desc} (Status: {status}) · {approved_count}/{task_count} tasks approved",
+        expanded=st.session_state.get(f"show_tasks_{goal_id}", False),
+    ):
+        st.write(f"**Due Date:** {due}")
+        if task_count:
+            st.progress(approved_count / task_count)
+
+        # --- Task Management ---
+        st.markdown("---")
+        st.markdown("**Tasks to achieve this goal:**")
+
+        if not task_count:
+            st.text("No tasks yet.")
+        elif st.toggle(f"Show {task_count} tasks", key=f"show_tasks_{goal_id}"):
+            tasks = session_read_many("tasks", [goal_id], be.get_tasks_for_goals)[goal_id]
+            for task_id, task_desc, is_approved in tasks:
+                approval_status = "Approved" if is_approved else "Pending Approval"
+                col1, col2, col3 = st.columns([3, 1, 1])
+                with col1:
+                    st.write(f"- {task_desc}")
+                with col2:
+                    st.write(f"_{approval_status}_")
+                with col3:
+                     if is_manager and not is_approved:
+                        if st.button("Approve", key=f"approve_{task_id}"):
+                            be.approve_task(task_id)
+                            session_invalidate(("tasks", goal_id), ("summary", goal_id), ("history_page",))
+                            st.rerun(scope="fragment")
+            pending_task_ids = [task_id for task_id, _, is_approved in tasks if not is_approved]
+            if is_manager and len(pending_task_ids) > 1:
+                if st.button(f"Approve all {len(pending_task_ids)} pending tasks", key=f"approve_all_{goal_id}"):
+                    be.approve_tasks(pending_task_ids)
+                    session_invalidate(("tasks", goal_id), ("summary", goal_id), ("history_page",))
+                    st.rerun(scope="fragment")
+
+        if not is_manager:
+            st.markdown("**Log a new task:**")
+            new_task_desc = st.text_input("Task Description", key=f"task_{goal_id}")
+            if st.button("Add Task", key=f"add_task_{goal_id}"):
+                if new_task_desc:
+                    be.create_task(goal_id, new_task_desc)
+                    session_invalidate(("tasks", goal_id), ("summary", goal_id), ("history_page",))
+                    st.success("Task added and awaiting manager approval.")
+                    st.rerun(scope="fragment")
+                else:
+                    st.warning("Task description cannot be empty.")
+
+@st.fragment
+def goal_progress_card(goal_id, desc, due, status, is_manager):
+    """A goal's status control and task completion bar."""
+    backend_session()
+    apply_changes()
+    st.subheader(f"Goal: {desc}")
+    st.write(f"**Status:** {status} | **Due Date:** {due}")
+
+    if is_manager:
+        new_status = st.selectbox(
+            "Update Goal Status",
+            options=STATUSES,
+            index=STATUSES.index(status),
+            key=f"status_{goal_id}"
+        )
+        if st.button("Save Status", key=f"save_{goal_id}"):
+            be.update_goal_status(goal_id, new_status)
+            session_invalidate(*GOAL_LISTINGS, ("feedback", goal_id), ("summary", goal_id))
+            st.success("Status updated!")
+            # The status also shows outside this card (bulk update list), so rerun the page.
+            st.rerun()
+
+    # Progress visualization
+    total_tasks, approved_tasks, _ = goal_summary(goal_id)
+    progress = (approved_tasks / total_tasks) * 100 if total_tasks > 0 else 0
+
+    st.progress(int(progress))
+    st.write(f"Task Completion: {approved_tasks} of {total_tasks} approved tasks.")
+    st.markdown("---")
+
+@st.fragment
+def goal_feedback_card(goal_id, desc, status, is_manager, manager_id):
+    """Expander with a goal's feedback and, for managers, the form to add more."""
+    backend_session()
+    apply_changes()
+    _, _, feedback_count = goal_summary(goal_id)
+    with st.expander(
+        f"Goal: {desc} (Status: {status}) · {feedback_count} feedback",
+        expanded=st.session_state.get(f"show_feedback_{goal_id}", False),
+    ):
+        st.subheader("Existing Feedback")
+        if not feedback_count:
+            st.text("No feedback has been given for this goal yet.")
+        elif st.toggle(f"Show {feedback_count} feedback entries", key=f"show_feedback_{goal_id}"):
+            feedback_list = session_read_many("feedback", [goal_id], be.get_feedback_for_goals)[goal_id]
+            for fb_text, manager_name, created_at in feedback_list:
+                st.info(f"**From {manager_name} on {created_at.strftime('%Y-%m-%d %H:%M')}:**\n\n{fb_text}")
+
+        if is_manager:
+            st.subheader("Provide New Feedback")
+            feedback_text = st.text_area("Your Feedback", key=f"feedback_{goal_id}")
+            if st.button("Submit Feedback", key=f"submit_fb_{goal_id}"):
+                if feedback_text:
+                    be.create_feedback(goal_id, manager_id, feedback_text)
+                    session_invalidate(("feedback", goal_id), ("summary", goal_id), ("history_page",))
+                    st.success("Feedback submitted.")
+                    st.rerun(scope="fragment")
+                else:
+                    st.warning("Feedback cannot be empty.")
+
 def main():
     """Main function to run the Streamlit app."""
+    backend_session()
+    apply_changes()
     # --- Initialize Database ---
     be.setup_database()
     be.seed_data()
+    trend_refresher()
+    live_updates()
 
     st.title("Performance Management System")
 
     # --- User Selection ---
     st.sidebar.header("Select User")
-    employees = be.get_employees()
+    employees = session_read(("employees",), be.get_employees)
     employee_dict = {name: eid for eid, name in employees}
     
     # Simple user switching for demo purposes
     if employee_dict:
         selected_user_name = st.sidebar.selectbox("Select your user profile", options=list(employee_dict.keys()))
         selected_user_id = employee_dict[selected_user_name]
-        is_manager = "Manager" in selected_user_name
+        is_manager = session_read(("is_manager", selected_user_id), lambda: be.is_manager(selected_user_id))
         st.sidebar.info(f"Logged in as: **{selected_user_name}**")
     else:
         st.sidebar.error("No users found in the database.")
@@ -32,7 +381,7 @@ def main():
     st.sidebar.title("Navigation")
     
     # Define navigation options based on user role
-    nav_options = ["Goal & Task Setting", "Progress Tracking", "Feedback", "Reporting"]
+    nav_options = ["Goal & Task Setting", "Progress Tracking", "Feedback", "Reporting", "Search"]
     if is_manager:
         nav_options.append("Business Insights")
         
@@ -46,7 +395,7 @@ def main():
 
         if is_manager:
             st.subheader("Set a New Goal for an Employee")
-            team_members = {name: eid for eid, name in employees if "Manager" not in name}
+            team_members = {name: eid for eid, name, _ in session_read(("subtree", selected_user_id), lambda: be.get_subtree(selected_user_id))}
             if team_members:
                 selected_employee_name = st.selectbox("Select Employee", options=list(team_members.keys()))
                 goal_desc = st.text_area("Goal Description")
@@ -56,6 +405,7 @@ def main():
                     if goal_desc:
                         employee_id = team_members[selected_employee_name]
                         be.create_goal(employee_id, goal_desc, due_date)
+                        session_invalidate(*GOAL_LISTINGS)
                         st.success(f"Goal created for {selected_employee_name}")
                         st.rerun()
                     else:
@@ -64,46 +414,17 @@ def main():
                 st.info("No employees found to assign goals to.")
 
         st.subheader("My Assigned Goals")
-        my_goals = be.get_goals_for_employee(selected_user_id)
+        page_key = f"my_goals_page_{selected_user_id}"
+        my_goals, next_cursor = goal_summary_page(selected_user_id, current_page_cursor(page_key))
 
         if not my_goals:
             st.info("You have no goals assigned.")
-        
-        for goal_id, desc, due, status in my_goals:
-            with st.expander(f"Goal: {desc} (Status: {status})"):
-                st.write(f"**Due Date:** {due}")
-                
-                # --- Task Management ---
-                st.markdown("---")
-                st.markdown("**Tasks to achieve this goal:**")
-                
-                tasks = be.get_tasks_for_goal(goal_id)
-                if tasks:
-                    for task_id, task_desc, is_approved in tasks:
-                        approval_status = "Approved" if is_approved else "Pending Approval"
-                        col1, col2, col3 = st.columns([3, 1, 1])
-                        with col1:
-                            st.write(f"- {task_desc}")
-                        with col2:
-                            st.write(f"_{approval_status}_")
-                        with col3:
-                             if is_manager and not is_approved:
-                                if st.button("Approve", key=f"approve_{task_id}"):
-                                    be.approve_task(task_id)
-                                    st.rerun()
-                else:
-                    st.text("No tasks yet.")
 
-                if not is_manager:
-                    st.markdown("**Log a new task:**")
-                    new_task_desc = st.text_input("Task Description", key=f"task_{goal_id}")
-                    if st.button("Add Task", key=f"add_task_{goal_id}"):
-                        if new_task_desc:
-                            be.create_task(goal_id, new_task_desc)
-                            st.success("Task added and awaiting manager approval.")
-                            st.rerun()
-                        else:
-                            st.warning("Task description cannot be empty.")
+        for goal_id, desc, due, status, *_ in my_goals:
+            goal_task_card(goal_id, desc, due, status, is_manager)
+
+        if my_goals:
+            page_controls(page_key, next_cursor)
 
 
     elif app_mode == "Progress Tracking":
@@ -112,7 +433,7 @@ def main():
         target_employee_id = selected_user_id
         display_name = selected_user_name
         if is_manager:
-             team_members = {name: eid for eid, name in employees if "Manager" not in name}
+             team_members = {name: eid for eid, name, _ in session_read(("subtree", selected_user_id), lambda: be.get_subtree(selected_user_id))}
              if team_members:
                  selected_employee_name = st.selectbox("View progress for:", options=[selected_user_name] + list(team_members.keys()))
                  target_employee_id = employee_dict[selected_employee_name]
@@ -121,35 +442,28 @@ def main():
                  st.info("No employees to track.")
         
         st.subheader(f"Progress for: {display_name}")
-        goals = be.get_goals_for_employee(target_employee_id)
+        goals = session_read(("goals", target_employee_id), lambda: be.get_goals_for_employee(target_employee_id))
         if not goals:
             st.info("No goals to track for this user.")
 
-        for goal_id, desc, due, status in goals:
-            st.subheader(f"Goal: {desc}")
-            st.write(f"**Status:** {status} | **Due Date:** {due}")
+        if is_manager and goals:
+            with st.expander("Bulk Status Update"):
+                goal_options = {f"{desc} (Due: {due}, Status: {status})": goal_id for goal_id, desc, due, status in goals}
+                selected_goals = st.multiselect("Goals to update", options=list(goal_options.keys()))
+                bulk_status = st.selectbox("New Status", options=STATUSES, key="bulk_status")
+                if st.button("Apply to Selected Goals"):
+                    if selected_goals:
+                        updated = be.update_goals_status([goal_options[label] for label in selected_goals], bulk_status)
+                        session_invalidate(*GOAL_LISTINGS, *[("feedback", goal_options[label]) for label in selected_goals])
+                        st.success(f"Updated {updated} goal(s).")
+                        st.rerun()
+                    else:
+                        st.warning("Select at least one goal.")
 
-            if is_manager:
-                new_status = st.selectbox(
-                    "Update Goal Status",
-                    options=['Draft', 'In Progress', 'Completed', 'Cancelled'],
-                    index=['Draft', 'In Progress', 'Completed', 'Cancelled'].index(status),
-                    key=f"status_{goal_id}"
-                )
-                if st.button("Save Status", key=f"save_{goal_id}"):
-                    be.update_goal_status(goal_id, new_status)
-                    st.success("Status updated!")
-                    st.rerun()
-            
-            # Progress visualization
-            tasks = be.get_tasks_for_goal(goal_id)
-            total_tasks = len(tasks)
-            approved_tasks = sum(1 for _, _, is_approved in tasks if is_approved)
-            progress = (approved_tasks / total_tasks) * 100 if total_tasks > 0 else 0
-            
-            st.progress(int(progress))
-            st.write(f"Task Completion: {approved_tasks} of {total_tasks} approved tasks.")
-            st.markdown("---")
+        # Progress bars only need counts: one summary query for every goal.
+        session_read_many("summary", [goal[0] for goal in goals], be.get_goal_summaries)
+        for goal_id, desc, due, status in goals:
+            goal_progress_card(goal_id, desc, due, status, is_manager)
 
     elif app_mode == "Feedback":
         st.header("Feedback")
@@ -157,44 +471,30 @@ def main():
         target_employee_id = selected_user_id
         display_name = selected_user_name
         if is_manager:
-            team_members = {name: eid for eid, name in employees if "Manager" not in name}
+            team_members = {name: eid for eid, name, _ in session_read(("subtree", selected_user_id), lambda: be.get_subtree(selected_user_id))}
             if team_members:
                 selected_employee_name = st.selectbox("Select Employee for Feedback", options=[selected_user_name] + list(team_members.keys()))
                 target_employee_id = employee_dict[selected_employee_name]
                 display_name = selected_employee_name
             
         st.subheader(f"Feedback for: {display_name}")
-        goals = be.get_goals_for_employee(target_employee_id)
+        page_key = f"feedback_goals_page_{target_employee_id}"
+        goals, next_cursor = goal_summary_page(target_employee_id, current_page_cursor(page_key))
         if not goals:
             st.info("This employee has no goals to provide feedback on.")
 
-        for goal_id, desc, _, status in goals:
-            with st.expander(f"Goal: {desc} (Status: {status})"):
-                st.subheader("Existing Feedback")
-                feedback_list = be.get_feedback_for_goal(goal_id)
-                if feedback_list:
-                    for fb_text, manager_name, created_at in feedback_list:
-                        st.info(f"**From {manager_name} on {created_at.strftime('%Y-%m-%d %H:%M')}:**\n\n{fb_text}")
-                else:
-                    st.text("No feedback has been given for this goal yet.")
-
-                if is_manager:
-                    st.subheader("Provide New Feedback")
-                    feedback_text = st.text_area("Your Feedback", key=f"feedback_{goal_id}")
-                    if st.button("Submit Feedback", key=f"submit_fb_{goal_id}"):
-                        if feedback_text:
-                            be.create_feedback(goal_id, selected_user_id, feedback_text)
-                            st.success("Feedback submitted.")
-                            st.rerun()
-                        else:
-                            st.warning("Feedback cannot be empty.")
+        for goal_id, desc, _, status, *_ in goals:
+            goal_feedback_card(goal_id, desc, status, is_manager, selected_user_id)
+
+        if goals:
+            page_controls(page_key, next_cursor)
 
     elif app_mode == "Reporting":
         st.header("Performance History Report")
         
         target_employee_id = selected_user_id
         if is_manager:
-             team_members = {name: eid for eid, name in employees if "Manager" not in name}
+             team_members = {name: eid for eid, name, _ in session_read(("subtree", selected_user_id), lambda: be.get_subtree(selected_user_id))}
              if team_members:
                 selected_employee_name = st.selectbox("Generate report for:", options=list(team_members.keys()))
                 target_employee_id = team_members[selected_employee_name]
@@ -205,30 +505,52 @@ def main():
         else:
             st.subheader(f"Showing your performance history")
 
-        goals = be.get_goals_for_employee(target_employee_id)
-        if not goals:
+        page_key = f"report_page_{target_employee_id}"
+        cursor = current_page_cursor(page_key)
+        history, next_cursor = session_read(
+            ("history_page", target_employee_id, cursor),
+            lambda: be.get_performance_history_page(target_employee_id, PAGE_SIZE, cursor),
+        )
+        if not history:
             st.warning("No performance data available for this user.")
         
-        for goal_id, desc, due, status in goals:
-            st.markdown(f"### Goal: {desc}")
-            st.write(f"**Status:** {status} | **Due:** {due}")
-            
-            st.markdown("**Associated Tasks:**")
-            tasks = be.get_tasks_for_goal(goal_id)
-            if tasks:
-                for _, task_desc, is_approved in tasks:
-                    st.write(f"- {task_desc} `{'Approved' if is_approved else 'Pending'}`")
-            else:
-                st.write("_No tasks logged for this goal._")
+        show_history(history)
 
-            st.markdown("**Associated Feedback:**")
-            feedback = be.get_feedback_for_goal(goal_id)
-            if feedback:
-                for fb_text, manager_name, ts in feedback:
-                    st.text(f"[{ts.strftime('%Y-%m-%d')}] from {manager_name}: {fb_text}")
+        if history:
+            page_controls(page_key, next_cursor)
+
+        # Closed review cycles live in the archive and are only read when asked for.
+        if st.checkbox("Include archived review cycles", key=f"archived_{target_employee_id}"):
+            st.subheader("Archived review cycles")
+            archived = session_read(
+                ("archived_history", target_employee_id),
+                lambda: be.get_archived_history(target_employee_id),
+            )
+            if not archived:
+                st.info("No archived goals for this user.")
+            show_history(archived)
+
+    elif app_mode == "Search":
+        st.header("Search")
+        query = st.text_input("Search goals, tasks and feedback", placeholder='e.g. onboarding "release process" -draft')
+        if is_manager:
+            st.caption("Searching your goals and those of everyone in your reporting line.")
+        if query.strip():
+            page_key = f"search_page_{selected_user_id}_{query}"
+            cursor = current_page_cursor(page_key)
+            if is_manager:
+                results, next_cursor = be.search(query, manager_id=selected_user_id, page_size=PAGE_SIZE, after=cursor)
             else:
-                st.write("_No feedback recorded for this goal._")
-            st.markdown("---")
+                results, next_cursor = be.search(query, employee_id=selected_user_id, page_size=PAGE_SIZE, after=cursor)
+
+            if not results:
+                st.info("No matches.")
+            for kind, _, goal_id, _, employee_name, snippet, _ in results:
+                st.markdown(f"**{kind.title()}** on goal #{goal_id} · {employee_name}\n\n{snippet}")
+                st.markdown("---")
+
+            if results:
+                page_controls(page_key, next_cursor)
 
     elif app_mode == "Business Insights":
         st.header("Business Insights Dashboard")
@@ -251,9 +573,57 @@ def main():
             with col2:
                 st.warning(f"**Lowest Performer (least goals completed):**\n\n## {insights.get('lowest_performer', 'N/A')}")
 
+            st.subheader("Completed Goal Rankings")
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("**Top performers**")
+                st.table([{"Employee ID": eid, "Name": name, "Completed Goals": count} for eid, name, count in insights.get("top_performers", [])])
+            with col2:
+                st.markdown("**Lowest performers**")
+                st.table([{"Employee ID": eid, "Name": name, "Completed Goals": count} for eid, name, count in insights.get("lowest_performers", [])])
+
+            percentiles = insights.get("completed_goal_percentiles", {})
+            if percentiles:
+                st.subheader("Completed Goals per Employee (Percentiles)")
+                for col, (pct, value) in zip(st.columns(len(percentiles)), percentiles.items()):
+                    with col:
+                        st.metric(label=f"P{pct}", value=f"{value:.1f}" if value is not None else "N/A")
+
+            st.subheader("My Organization")
+            rollups = session_read(("team_rollups", selected_user_id), lambda: be.get_team_rollups(selected_user_id))
+            if rollups:
+                st.table([
+                    {"Manager": name, "Team Size": size, "Goals": total, "Completed": completed, "Completion Rate": f"{rate:.0%}"}
+                    for _, name, size, total, completed, rate in rollups
+                ])
+
+            st.subheader("Trends")
+            period = st.radio("Period", ["week", "month"], format_func=str.title, horizontal=True, key="trend_period")
+            goal_trends = be.get_goal_trends(period)
+            if goal_trends:
+                st.markdown(f"**Goals per {period}**")
+                st.line_chart({
+                    "Created": {start: created for start, created, _, _ in goal_trends},
+                    "Completed": {start: completed for start, _, completed, _ in goal_trends},
+                    "Overdue": {start: overdue for start, _, _, overdue in goal_trends},
+                })
+            feedback_trends = be.get_feedback_trends(selected_user_id, period)
+            if feedback_trends:
+                st.markdown(f"**Feedback given per {period}, by manager**")
+                by_manager = {}
+                for start, _, manager_name, count in feedback_trends:
+                    by_manager.setdefault(manager_name, {})[start] = count
+                st.bar_chart(by_manager)
+
         else:
             st.warning("Could not retrieve business insights.")
 
 if __name__ == "__main__":
-    main()
+    metrics.start_trace()
+    try:
+        main()
+    finally:
+        calls = metrics.stop_trace()
+    if st.sidebar.checkbox("Show backend call costs"):
+        call_cost_panel(calls)
 
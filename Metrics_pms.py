@@ -0,0 +1,409 @@
+"""Per-call instrumentation for Backend_pms.
+
+Each public backend call is timed together with the SQL statements it sends, the
+rows it fetches and the time it waits for a pooled connection. Finished calls
+are passed to every registered sink:
+
+- MemorySink aggregates them into per-function histograms (snapshot() and
+  prometheus_text() read the default one);
+- SlowQueryLog writes calls over a threshold, with their SQL, to a stream.
+
+Environment variables:
+
+    PMS_METRICS=0            turn instrumentation off
+    PMS_SLOW_QUERY_MS=500    slow-query log threshold; 0 disables it (default 500)
+    PMS_SLOW_QUERY_LOG=path  append the slow-query log to a file instead of stderr
+    PMS_METRICS_PORT=9108    serve prometheus_text() over HTTP on this port
+"""
+import bisect
+import inspect
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import psycopg2.extensions
+
+ENABLED = os.environ.get("PMS_METRICS", "1") != "0"
+# Histogram bucket upper bounds, in milliseconds.
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# Statements kept per call for the slow-query log.
+MAX_SQL_PER_CALL = 20
+
+_local = threading.local()
+_sinks = []
+
+def _state():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+        _local.statements = 0
+        _local.rows = 0
+        _local.acquire_ms = 0.0
+        _local.sql = []
+        _local.trace = None
+    return _local
+
+# --- Counting ---
+def _statement(query):
+    state = _state()
+    if not state.stack:
+        return
+    state.statements += 1
+    if len(state.sql) < MAX_SQL_PER_CALL:
+        state.sql.append(query)
+
+def _rows(count):
+    state = _state()
+    if state.stack:
+        state.rows += count
+
+def record_acquire(ms):
+    """Records time spent waiting for a pooled connection."""
+    state = _state()
+    if state.stack:
+        state.acquire_ms += ms
+    for sink in list(_sinks):
+        observe = getattr(sink, "observe_acquire", None)
+        if observe is not None:
+            observe(ms)
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    """Cursor that counts statements and fetched rows for the backend calls running on its thread."""
+
+    def execute(self, query, vars=None):
+        _statement(query)
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        _statement(query)
+        return super().executemany(query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        _statement(sql)
+        return super().copy_expert(sql, file, size)
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            _rows(1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        _rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        _rows(len(rows))
+        return rows
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany(self.itersize)
+            if not rows:
+                return
+            yield from rows
+
+# --- Calls ---
+class Call:
+    """Cost of one backend call. Nested calls are included in their caller's figures."""
+
+    __slots__ = ("name", "depth", "wall_ms", "statements", "rows", "acquire_ms", "sql", "error", "_marks")
+
+    def __init__(self, name):
+        self.name = name
+        self.depth = None
+        self.wall_ms = 0.0
+        self.statements = 0
+        self.rows = 0
+        self.acquire_ms = 0.0
+        self.sql = []
+        self.error = False
+
+    def as_dict(self):
+        return {
+            "function": self.name,
+            "depth": self.depth,
+            "wall_ms": self.wall_ms,
+            "statements": self.statements,
+            "rows": self.rows,
+            "acquire_ms": self.acquire_ms,
+            "error": self.error,
+        }
+
+def _enter(state, call):
+    if call.depth is None:
+        call.depth = len(state.stack)
+    state.stack.append(call)
+    call._marks = (time.perf_counter(), state.statements, state.rows, state.acquire_ms, len(state.sql))
+
+def _exit(state, call):
+    started, statements, rows, acquire_ms, sql = call._marks
+    call.wall_ms += (time.perf_counter() - started) * 1000
+    call.statements += state.statements - statements
+    call.rows += state.rows - rows
+    call.acquire_ms += state.acquire_ms - acquire_ms
+    call.sql.extend(state.sql[sql:])
+    state.stack.pop()
+    if not state.stack:
+        state.sql = []
+
+def _finish(state, call):
+    if state.trace is not None:
+        state.trace.append(call)
+    for sink in list(_sinks):
+        sink(call)
+
+def _resume(state, call, gen):
+    """Times a generator's work one step at a time, so time spent in its consumer is not counted."""
+    try:
+        while True:
+            _enter(state, call)
+            try:
+                item = next(gen)
+            except StopIteration:
+                return
+            except BaseException:
+                call.error = True
+                raise
+            finally:
+                _exit(state, call)
+            yield item
+    finally:
+        gen.close()
+        _finish(state, call)
+
+def instrument(func):
+    """Wraps a backend function so every call is measured and handed to the sinks."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        state = _state()
+        call = Call(func.__name__)
+        _enter(state, call)
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            call.error = True
+            _exit(state, call)
+            _finish(state, call)
+            raise
+        _exit(state, call)
+        if inspect.isgenerator(result):
+            return _resume(state, call, result)
+        _finish(state, call)
+        return result
+    return wrapper
+
+def start_trace():
+    """Starts collecting the calls made on this thread, e.g. for one Streamlit rerun."""
+    _state().trace = []
+
+def stop_trace():
+    """Stops collecting and returns the Call objects recorded since start_trace()."""
+    state = _state()
+    calls, state.trace = state.trace or [], None
+    return calls
+
+# --- Sinks ---
+def add_sink(sink):
+    """Registers a callable that receives every finished Call."""
+    _sinks.append(sink)
+
+def remove_sink(sink):
+    if sink in _sinks:
+        _sinks.remove(sink)
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS_MS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (None past the last bucket)."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return None
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(BUCKETS_MS + ("+Inf",), self.counts):
+            total += count
+            yield bound, total
+
+class MemorySink:
+    """Aggregates calls into per-function latency histograms and counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._functions = {}
+            self._acquire = _Histogram()
+
+    def __call__(self, call):
+        with self._lock:
+            entry = self._functions.get(call.name)
+            if entry is None:
+                entry = self._functions[call.name] = {
+                    "calls": 0, "errors": 0, "statements": 0, "rows": 0,
+                    "acquire_ms": 0.0, "latency": _Histogram(),
+                }
+            entry["calls"] += 1
+            entry["errors"] += call.error
+            entry["statements"] += call.statements
+            entry["rows"] += call.rows
+            entry["acquire_ms"] += call.acquire_ms
+            entry["latency"].observe(call.wall_ms)
+
+    def observe_acquire(self, ms):
+        with self._lock:
+            self._acquire.observe(ms)
+
+    def snapshot(self):
+        """Per-function totals plus mean and bucketed p50/p95/p99 latency (ms)."""
+        with self._lock:
+            functions = {}
+            for name, entry in self._functions.items():
+                latency = entry["latency"]
+                functions[name] = {
+                    "calls": entry["calls"],
+                    "errors": entry["errors"],
+                    "statements": entry["statements"],
+                    "rows": entry["rows"],
+                    "acquire_ms": entry["acquire_ms"],
+                    "total_ms": latency.sum,
+                    "mean_ms": latency.sum / latency.count,
+                    "p50_ms": latency.quantile(0.5),
+                    "p95_ms": latency.quantile(0.95),
+                    "p99_ms": latency.quantile(0.99),
+                    "buckets": list(latency.cumulative()),
+                }
+            return {
+                "functions": functions,
+                "connection_acquire": {
+                    "count": self._acquire.count,
+                    "total_ms": self._acquire.sum,
+                    "p95_ms": self._acquire.quantile(0.95),
+                    "buckets": list(self._acquire.cumulative()),
+                },
+            }
+
+    def prometheus_text(self):
+        """The aggregates in the Prometheus text exposition format (times in seconds)."""
+        def bucket_lines(metric, histogram, labels):
+            prefix = labels + "," if labels else ""
+            for bound, total in histogram.cumulative():
+                le = bound if bound == "+Inf" else repr(bound / 1000)
+                yield f'{metric}_bucket{{{prefix}le="{le}"}} {total}'
+            suffix = "{" + labels + "}" if labels else ""
+            yield f"{metric}_sum{suffix} {histogram.sum / 1000}"
+            yield f"{metric}_count{suffix} {histogram.count}"
+
+        with self._lock:
+            lines = [
+                "# HELP pms_call_duration_seconds Wall time of Backend_pms calls.",
+                "# TYPE pms_call_duration_seconds histogram",
+            ]
+            for name, entry in sorted(self._functions.items()):
+                lines.extend(bucket_lines("pms_call_duration_seconds", entry["latency"], f'function="{name}"'))
+            for metric, key, help_text in (
+                ("pms_call_errors_total", "errors", "Backend_pms calls that raised."),
+                ("pms_call_statements_total", "statements", "SQL statements sent by Backend_pms calls."),
+                ("pms_call_rows_total", "rows", "Rows fetched by Backend_pms calls."),
+            ):
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} counter")
+                for name, entry in sorted(self._functions.items()):
+                    lines.append(f'{metric}{{function="{name}"}} {entry[key]}')
+            lines.append("# HELP pms_connection_acquire_seconds Time spent waiting for a pooled connection.")
+            lines.append("# TYPE pms_connection_acquire_seconds histogram")
+            lines.extend(bucket_lines("pms_connection_acquire_seconds", self._acquire, ""))
+        return "\n".join(lines) + "\n"
+
+class SlowQueryLog:
+    """Writes one line per call slower than threshold_ms, followed by the SQL it sent."""
+
+    def __init__(self, threshold_ms, stream=None):
+        self.threshold_ms = threshold_ms
+        self.stream = stream or sys.stderr
+        self._lock = threading.Lock()
+
+    def __call__(self, call):
+        if call.wall_ms < self.threshold_ms:
+            return
+        lines = [
+            f"{datetime.now().isoformat(timespec='seconds')} slow call {call.name}: {call.wall_ms:.1f} ms, "
+            f"{call.statements} statements, {call.rows} rows, {call.acquire_ms:.1f} ms waiting for a connection"
+        ]
+        for query in call.sql:
+            if isinstance(query, bytes):
+                query = query.decode(errors="replace")
+            lines.append("    " + " ".join(str(query).split()))
+        with self._lock:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+
+default_sink = MemorySink()
+add_sink(default_sink)
+
+def snapshot():
+    """Aggregated metrics from the default in-memory sink."""
+    return default_sink.snapshot()
+
+def prometheus_text():
+    """Aggregated metrics from the default in-memory sink, in Prometheus text format."""
+    return default_sink.prometheus_text()
+
+def reset():
+    default_sink.reset()
+
+_slow_ms = float(os.environ.get("PMS_SLOW_QUERY_MS", 500))
+if ENABLED and _slow_ms > 0:
+    _slow_path = os.environ.get("PMS_SLOW_QUERY_LOG")
+    add_sink(SlowQueryLog(_slow_ms, open(_slow_path, "a", encoding="utf-8") if _slow_path else None))
+
+# --- Prometheus Endpoint ---
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_http_server(port, addr=""):
+    """Serves prometheus_text() on a background thread; later calls are no-ops."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server
+
+if ENABLED and os.environ.get("PMS_METRICS_PORT"):
+    start_http_server(int(os.environ["PMS_METRICS_PORT"]))
@@ -0,0 +1,684 @@
+# --- Versioned Schema Migrations ---
+# Each migration is a (version, description, sql) tuple. Pending migrations are
+# applied in version order and recorded in the schema_version table, so a
+# database only ever runs each step once. Never edit a migration after it has
+# shipped; add a new one instead.
+
+MIGRATIONS = [
+    (1, "Core tables", """
+        CREATE TABLE IF NOT EXISTS employees (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            manager_id INTEGER REFERENCES employees(id)
+        );
+        CREATE TABLE IF NOT EXISTS goals (
+            id SERIAL PRIMARY KEY,
+            employee_id INTEGER REFERENCES employees(id) ON DELETE CASCADE,
+            description TEXT NOT NULL,
+            due_date DATE NOT NULL,
+            status VARCHAR(50) NOT NULL CHECK (status IN ('Draft', 'In Progress', 'Completed', 'Cancelled'))
+        );
+        CREATE TABLE IF NOT EXISTS tasks (
+            id SERIAL PRIMARY KEY,
+            goal_id INTEGER REFERENCES goals(id) ON DELETE CASCADE,
+            description TEXT NOT NULL,
+            is_approved BOOLEAN DEFAULT FALSE
+        );
+        CREATE TABLE IF NOT EXISTS feedback (
+            id SERIAL PRIMARY KEY,
+            goal_id INTEGER REFERENCES goals(id) ON DELETE CASCADE,
+            manager_id INTEGER REFERENCES employees(id),
+            feedback_text TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """),
+    (2, "Automated completion feedback trigger", """
+        CREATE OR REPLACE FUNCTION goal_completed_feedback()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF NEW.status = 'Completed' AND OLD.status != 'Completed' THEN
+                INSERT INTO feedback (goal_id, manager_id, feedback_text, created_at)
+                VALUES (NEW.id, (SELECT manager_id FROM employees WHERE id = NEW.employee_id), 'Great job on completing this goal!', NOW());
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS goal_completed_trigger ON goals;
+        CREATE TRIGGER goal_completed_trigger
+        AFTER UPDATE ON goals
+        FOR EACH ROW
+        EXECUTE FUNCTION goal_completed_feedback();
+    """),
+    (3, "Incrementally maintained per-employee goal statistics", """
+        CREATE TABLE IF NOT EXISTS employee_goal_stats (
+            employee_id INTEGER PRIMARY KEY REFERENCES employees(id) ON DELETE CASCADE,
+            total_goals INTEGER NOT NULL DEFAULT 0,
+            draft_goals INTEGER NOT NULL DEFAULT 0,
+            in_progress_goals INTEGER NOT NULL DEFAULT 0,
+            completed_goals INTEGER NOT NULL DEFAULT 0,
+            cancelled_goals INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS employee_goal_stats_top_idx ON employee_goal_stats (completed_goals DESC, employee_id);
+        CREATE INDEX IF NOT EXISTS employee_goal_stats_lowest_idx ON employee_goal_stats (completed_goals, employee_id);
+
+        -- Adds signed per-goal changes to the statistics. Employees that no longer
+        -- exist (e.g. during a cascading delete) are skipped.
+        CREATE OR REPLACE FUNCTION apply_goal_stat_changes(employee_ids INTEGER[], statuses TEXT[], deltas INTEGER[])
+        RETURNS VOID AS $$
+            INSERT INTO employee_goal_stats AS s (employee_id, total_goals, draft_goals, in_progress_goals, completed_goals, cancelled_goals)
+            SELECT c.employee_id,
+                   SUM(c.delta),
+                   COALESCE(SUM(c.delta) FILTER (WHERE c.status = 'Draft'), 0),
+                   COALESCE(SUM(c.delta) FILTER (WHERE c.status = 'In Progress'), 0),
+                   COALESCE(SUM(c.delta) FILTER (WHERE c.status = 'Completed'), 0),
+                   COALESCE(SUM(c.delta) FILTER (WHERE c.status = 'Cancelled'), 0)
+            FROM unnest(employee_ids, statuses, deltas) AS c(employee_id, status, delta)
+            JOIN employees e ON e.id = c.employee_id
+            GROUP BY c.employee_id
+            ON CONFLICT (employee_id) DO UPDATE SET
+                total_goals = s.total_goals + EXCLUDED.total_goals,
+                draft_goals = s.draft_goals + EXCLUDED.draft_goals,
+                in_progress_goals = s.in_progress_goals + EXCLUDED.in_progress_goals,
+                completed_goals = s.completed_goals + EXCLUDED.completed_goals,
+                cancelled_goals = s.cancelled_goals + EXCLUDED.cancelled_goals;
+        $$ LANGUAGE sql;
+
+        CREATE OR REPLACE FUNCTION employee_goal_stats_refresh()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM apply_goal_stat_changes(array_agg(employee_id), array_agg(status::TEXT), array_agg(1))
+                FROM new_goals;
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM apply_goal_stat_changes(array_agg(employee_id), array_agg(status::TEXT), array_agg(-1))
+                FROM old_goals;
+            ELSE
+                PERFORM apply_goal_stat_changes(array_agg(c.employee_id), array_agg(c.status::TEXT), array_agg(c.delta))
+                FROM (
+                    SELECT n.employee_id, n.status, 1 AS delta
+                    FROM new_goals n JOIN old_goals o ON o.id = n.id
+                    WHERE (n.employee_id, n.status) IS DISTINCT FROM (o.employee_id, o.status)
+                    UNION ALL
+                    SELECT o.employee_id, o.status, -1
+                    FROM new_goals n JOIN old_goals o ON o.id = n.id
+                    WHERE (n.employee_id, n.status) IS DISTINCT FROM (o.employee_id, o.status)
+                ) c;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION employee_goal_stats_add_employees()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            INSERT INTO employee_goal_stats (employee_id)
+            SELECT id FROM new_employees
+            ON CONFLICT (employee_id) DO NOTHING;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS employee_goal_stats_insert_trigger ON goals;
+        CREATE TRIGGER employee_goal_stats_insert_trigger
+        AFTER INSERT ON goals
+        REFERENCING NEW TABLE AS new_goals
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION employee_goal_stats_refresh();
+
+        DROP TRIGGER IF EXISTS employee_goal_stats_update_trigger ON goals;
+        CREATE TRIGGER employee_goal_stats_update_trigger
+        AFTER UPDATE ON goals
+        REFERENCING NEW TABLE AS new_goals OLD TABLE AS old_goals
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION employee_goal_stats_refresh();
+
+        DROP TRIGGER IF EXISTS employee_goal_stats_delete_trigger ON goals;
+        CREATE TRIGGER employee_goal_stats_delete_trigger
+        AFTER DELETE ON goals
+        REFERENCING OLD TABLE AS old_goals
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION employee_goal_stats_refresh();
+
+        DROP TRIGGER IF EXISTS employee_goal_stats_employee_trigger ON employees;
+        CREATE TRIGGER employee_goal_stats_employee_trigger
+        AFTER INSERT ON employees
+        REFERENCING NEW TABLE AS new_employees
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION employee_goal_stats_add_employees();
+
+        -- Backfill existing rows while writers are held off, so no change is counted twice or missed.
+        LOCK TABLE employees, goals IN SHARE MODE;
+        TRUNCATE employee_goal_stats;
+        INSERT INTO employee_goal_stats (employee_id, total_goals, draft_goals, in_progress_goals, completed_goals, cancelled_goals)
+        SELECT e.id,
+               COUNT(g.id),
+               COUNT(g.id) FILTER (WHERE g.status = 'Draft'),
+               COUNT(g.id) FILTER (WHERE g.status = 'In Progress'),
+               COUNT(g.id) FILTER (WHERE g.status = 'Completed'),
+               COUNT(g.id) FILTER (WHERE g.status = 'Cancelled')
+        FROM employees e
+        LEFT JOIN goals g ON g.employee_id = e.id
+        GROUP BY e.id;
+    """),
+    (4, "Indexes for the hot lookups", """
+        -- Plain CREATE INDEX because migrations run inside a transaction; on a large
+        -- live database, build these with CREATE INDEX CONCURRENTLY beforehand and
+        -- this step becomes a no-op.
+        CREATE INDEX IF NOT EXISTS goals_employee_due_idx ON goals (employee_id, due_date DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS goals_status_idx ON goals (status);
+        CREATE INDEX IF NOT EXISTS tasks_goal_idx ON tasks (goal_id, id);
+        CREATE INDEX IF NOT EXISTS feedback_goal_created_idx ON feedback (goal_id, created_at DESC);
+        CREATE INDEX IF NOT EXISTS feedback_manager_idx ON feedback (manager_id);
+        CREATE INDEX IF NOT EXISTS employees_manager_idx ON employees (manager_id);
+    """),
+    (5, "Keyset pagination index for feedback", """
+        CREATE INDEX IF NOT EXISTS feedback_goal_created_id_idx ON feedback (goal_id, created_at DESC, id DESC);
+        DROP INDEX IF EXISTS feedback_goal_created_idx;
+    """),
+    (6, "Closure table for the reporting hierarchy", """
+        -- One row per (ancestor, descendant) pair, including each employee paired
+        -- with themself at depth 0, so a whole subtree is one index range scan.
+        CREATE TABLE IF NOT EXISTS employee_hierarchy (
+            ancestor_id INTEGER NOT NULL REFERENCES employees(id) ON DELETE CASCADE,
+            descendant_id INTEGER NOT NULL REFERENCES employees(id) ON DELETE CASCADE,
+            depth INTEGER NOT NULL,
+            PRIMARY KEY (ancestor_id, descendant_id)
+        );
+        CREATE INDEX IF NOT EXISTS employee_hierarchy_descendant_idx ON employee_hierarchy (descendant_id, depth);
+
+        -- New employees may report to each other within one INSERT (bulk imports),
+        -- so the walk up the chain first follows managers inside the batch and then
+        -- borrows the stored paths of the first existing ancestor. A manager cycle
+        -- inside the batch revisits a pair and fails on the primary key.
+        CREATE OR REPLACE FUNCTION employee_hierarchy_add()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            WITH RECURSIVE chain(ancestor_id, descendant_id, depth) AS (
+                SELECT id, id, 0 FROM new_employees
+                UNION ALL
+                SELECT n.manager_id, c.descendant_id, c.depth + 1
+                FROM chain c JOIN new_employees n ON n.id = c.ancestor_id
+                WHERE n.manager_id IS NOT NULL AND c.depth <= (SELECT COUNT(*) FROM new_employees)
+            )
+            INSERT INTO employee_hierarchy (ancestor_id, descendant_id, depth)
+            SELECT ancestor_id, descendant_id, depth FROM chain
+            UNION ALL
+            SELECT h.ancestor_id, c.descendant_id, c.depth + h.depth
+            FROM chain c JOIN employee_hierarchy h ON h.descendant_id = c.ancestor_id AND h.depth > 0
+            WHERE NOT EXISTS (SELECT 1 FROM new_employees n WHERE n.id = c.ancestor_id);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        -- Moving an employee moves their whole subtree: paths from the old
+        -- ancestors are cut and paths from the new manager's ancestors added.
+        CREATE OR REPLACE FUNCTION employee_hierarchy_move()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF NEW.manager_id IS NOT NULL AND EXISTS (
+                SELECT 1 FROM employee_hierarchy WHERE ancestor_id = NEW.id AND descendant_id = NEW.manager_id
+            ) THEN
+                RAISE EXCEPTION 'Employee % cannot report to % who is in their own reporting line', NEW.id, NEW.manager_id;
+            END IF;
+
+            DELETE FROM employee_hierarchy h
+            USING employee_hierarchy up, employee_hierarchy down
+            WHERE up.descendant_id = NEW.id AND up.depth > 0
+              AND down.ancestor_id = NEW.id
+              AND h.ancestor_id = up.ancestor_id AND h.descendant_id = down.descendant_id;
+
+            INSERT INTO employee_hierarchy (ancestor_id, descendant_id, depth)
+            SELECT up.ancestor_id, down.descendant_id, up.depth + down.depth + 1
+            FROM employee_hierarchy up, employee_hierarchy down
+            WHERE up.descendant_id = NEW.manager_id AND down.ancestor_id = NEW.id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS employee_hierarchy_insert_trigger ON employees;
+        CREATE TRIGGER employee_hierarchy_insert_trigger
+        AFTER INSERT ON employees
+        REFERENCING NEW TABLE AS new_employees
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION employee_hierarchy_add();
+
+        DROP TRIGGER IF EXISTS employee_hierarchy_move_trigger ON employees;
+        CREATE TRIGGER employee_hierarchy_move_trigger
+        AFTER UPDATE OF manager_id ON employees
+        FOR EACH ROW
+        WHEN (OLD.manager_id IS DISTINCT FROM NEW.manager_id)
+        EXECUTE FUNCTION employee_hierarchy_move();
+
+        LOCK TABLE employees IN SHARE MODE;
+        TRUNCATE employee_hierarchy;
+        INSERT INTO employee_hierarchy (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE tree(ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM employees
+            UNION ALL
+            SELECT t.ancestor_id, e.id, t.depth + 1
+            FROM tree t JOIN employees e ON e.manager_id = t.descendant_id
+        )
+        SELECT ancestor_id, descendant_id, depth FROM tree;
+    """),
+    (7, "Statement-level completion feedback trigger", """
+        -- Same "Great job" feedback as before, but one set-based INSERT per UPDATE
+        -- statement instead of one INSERT and manager lookup per completed row.
+        CREATE OR REPLACE FUNCTION goal_completed_feedback()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            INSERT INTO feedback (goal_id, manager_id, feedback_text, created_at)
+            SELECT n.id, e.manager_id, 'Great job on completing this goal!', NOW()
+            FROM new_goals n
+            JOIN old_goals o ON o.id = n.id
+            LEFT JOIN employees e ON e.id = n.employee_id
+            WHERE n.status = 'Completed' AND o.status != 'Completed'
+            ORDER BY n.id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS goal_completed_trigger ON goals;
+        CREATE TRIGGER goal_completed_trigger
+        AFTER UPDATE ON goals
+        REFERENCING NEW TABLE AS new_goals OLD TABLE AS old_goals
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION goal_completed_feedback();
+    """),
+    (8, "Full-text search vectors and GIN indexes", """
+        -- Generated columns, so every INSERT, UPDATE and COPY keeps them current.
+        ALTER TABLE goals ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (to_tsvector('english', description)) STORED;
+        ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (to_tsvector('english', description)) STORED;
+        ALTER TABLE feedback ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (to_tsvector('english', feedback_text)) STORED;
+
+        CREATE INDEX IF NOT EXISTS goals_search_idx ON goals USING GIN (search_vector);
+        CREATE INDEX IF NOT EXISTS tasks_search_idx ON tasks USING GIN (search_vector);
+        CREATE INDEX IF NOT EXISTS feedback_search_idx ON feedback USING GIN (search_vector);
+    """),
+    (9, "Goal timestamps and weekly/monthly trend rollups", """
+        ALTER TABLE goals ADD COLUMN IF NOT EXISTS created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+        ALTER TABLE goals ADD COLUMN IF NOT EXISTS completed_at TIMESTAMP;
+
+        -- Goals completed before this migration are dated by their automated
+        -- "Great job" feedback where there is one.
+        UPDATE goals g SET completed_at = COALESCE(
+            (SELECT MAX(f.created_at) FROM feedback f
+             WHERE f.goal_id = g.id AND f.feedback_text = 'Great job on completing this goal!'),
+            CURRENT_TIMESTAMP
+        )
+        WHERE g.status = 'Completed';
+
+        -- completed_at follows status; an explicit value (e.g. from an import) is kept.
+        CREATE OR REPLACE FUNCTION goal_completed_at()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF NEW.status <> 'Completed' THEN
+                NEW.completed_at := NULL;
+            ELSIF NEW.completed_at IS NULL THEN
+                NEW.completed_at := NOW();
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS goal_completed_at_trigger ON goals;
+        CREATE TRIGGER goal_completed_at_trigger
+        BEFORE INSERT OR UPDATE OF status ON goals
+        FOR EACH ROW EXECUTE FUNCTION goal_completed_at();
+
+        -- Rollups per period, filled by Backend_pms.refresh_trends() from the rows
+        -- recorded since trend_watermark.processed_until.
+        CREATE TABLE IF NOT EXISTS goal_trends (
+            period TEXT NOT NULL CHECK (period IN ('week', 'month')),
+            period_start DATE NOT NULL,
+            created_goals INTEGER NOT NULL DEFAULT 0,
+            completed_goals INTEGER NOT NULL DEFAULT 0,
+            overdue_goals INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (period, period_start)
+        );
+        CREATE TABLE IF NOT EXISTS feedback_trends (
+            period TEXT NOT NULL CHECK (period IN ('week', 'month')),
+            manager_id INTEGER NOT NULL REFERENCES employees(id) ON DELETE CASCADE,
+            period_start DATE NOT NULL,
+            feedback_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (period, manager_id, period_start)
+        );
+        CREATE TABLE IF NOT EXISTS trend_watermark (
+            id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+            processed_until TIMESTAMP NOT NULL
+        );
+        INSERT INTO trend_watermark (processed_until) VALUES ('-infinity') ON CONFLICT DO NOTHING;
+
+        -- Each refresh reads only the new slice of these columns.
+        CREATE INDEX IF NOT EXISTS goals_created_at_idx ON goals (created_at);
+        CREATE INDEX IF NOT EXISTS goals_completed_at_idx ON goals (completed_at) WHERE completed_at IS NOT NULL;
+        CREATE INDEX IF NOT EXISTS goals_due_date_idx ON goals (due_date);
+        CREATE INDEX IF NOT EXISTS feedback_created_at_idx ON feedback (created_at);
+    """),
+    (10, "Change feed: NOTIFY on goal, task and feedback writes", """
+        -- One notification on the pms_changes channel per statement, delivered at
+        -- commit, naming the goals and employees whose rows changed. Automated
+        -- feedback from goal_completed_feedback() is an INSERT on feedback, so it
+        -- is reported like any other. Statements touching more than 100 rows on a
+        -- side send NULL lists instead (listeners then drop the whole entity),
+        -- which keeps payloads under the 8000-byte limit and bulk loads cheap.
+        CREATE OR REPLACE FUNCTION notify_pms_change()
+        RETURNS TRIGGER AS $$
+        DECLARE
+            goal_ids INTEGER[] := '{}';
+            employee_ids INTEGER[] := '{}';
+            ids INTEGER[];
+            owners INTEGER[];
+            touched INTEGER := 0;
+            listed BOOLEAN := TRUE;
+            n INTEGER;
+        BEGIN
+            IF TG_OP <> 'DELETE' THEN
+                IF TG_TABLE_NAME = 'goals' THEN
+                    SELECT COUNT(*), array_agg(r.id), array_agg(r.employee_id) INTO n, ids, owners
+                    FROM (SELECT id, employee_id FROM new_rows LIMIT 101) r;
+                ELSE
+                    SELECT COUNT(*), array_agg(r.goal_id), array_agg(g.employee_id) INTO n, ids, owners
+                    FROM (SELECT goal_id FROM new_rows LIMIT 101) r LEFT JOIN goals g ON g.id = r.goal_id;
+                END IF;
+                touched := touched + n;
+                listed := listed AND n <= 100;
+                goal_ids := goal_ids || ids;
+                employee_ids := employee_ids || owners;
+            END IF;
+            IF TG_OP <> 'INSERT' THEN
+                IF TG_TABLE_NAME = 'goals' THEN
+                    SELECT COUNT(*), array_agg(r.id), array_agg(r.employee_id) INTO n, ids, owners
+                    FROM (SELECT id, employee_id FROM old_rows LIMIT 101) r;
+                ELSE
+                    SELECT COUNT(*), array_agg(r.goal_id), array_agg(g.employee_id) INTO n, ids, owners
+                    FROM (SELECT goal_id FROM old_rows LIMIT 101) r LEFT JOIN goals g ON g.id = r.goal_id;
+                END IF;
+                touched := touched + n;
+                listed := listed AND n <= 100;
+                goal_ids := goal_ids || ids;
+                employee_ids := employee_ids || owners;
+            END IF;
+            IF touched = 0 THEN
+                RETURN NULL;
+            END IF;
+            PERFORM pg_notify('pms_changes', json_build_object(
+                'table', TG_TABLE_NAME,
+                'goals', CASE WHEN listed THEN ARRAY(SELECT DISTINCT id FROM unnest(goal_ids) AS id WHERE id IS NOT NULL) END,
+                'employees', CASE WHEN listed THEN ARRAY(SELECT DISTINCT id FROM unnest(employee_ids) AS id WHERE id IS NOT NULL) END
+            )::TEXT);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS goals_notify_insert ON goals;
+        CREATE TRIGGER goals_notify_insert AFTER INSERT ON goals
+        REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION notify_pms_change();
+        DROP TRIGGER IF EXISTS goals_notify_update ON goals;
+        CREATE TRIGGER goals_notify_update AFTER UPDATE ON goals
+        REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION notify_pms_change();
+        DROP TRIGGER IF EXISTS goals_notify_delete ON goals;
+        CREATE TRIGGER goals_notify_delete AFTER DELETE ON goals
+        REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION notify_pms_change();
+
+        DROP TRIGGER IF EXISTS tasks_notify_insert ON tasks;
+        CREATE TRIGGER tasks_notify_insert AFTER INSERT ON tasks
+        REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION notify_pms_change();
+        DROP TRIGGER IF EXISTS tasks_notify_update ON tasks;
+        CREATE TRIGGER tasks_notify_update AFTER UPDATE ON tasks
+        REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION notify_pms_change();
+        DROP TRIGGER IF EXISTS tasks_notify_delete ON tasks;
+        CREATE TRIGGER tasks_notify_delete AFTER DELETE ON tasks
+        REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION notify_pms_change();
+
+        DROP TRIGGER IF EXISTS feedback_notify_insert ON feedback;
+        CREATE TRIGGER feedback_notify_insert AFTER INSERT ON feedback
+        REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION notify_pms_change();
+        DROP TRIGGER IF EXISTS feedback_notify_update ON feedback;
+        CREATE TRIGGER feedback_notify_update AFTER UPDATE ON feedback
+        REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION notify_pms_change();
+        DROP TRIGGER IF EXISTS feedback_notify_delete ON feedback;
+        CREATE TRIGGER feedback_notify_delete AFTER DELETE ON feedback
+        REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION notify_pms_change();
+    """),
+    (11, "Partitioned archive tables for closed review cycles", """
+        -- Cold storage for goals moved out by Backend_pms.archive_closed_goals(), with
+        -- their tasks and feedback. All three are range-partitioned by the goal's due
+        -- date, one partition per year created as rows arrive, so a goal and its
+        -- history always share a year and an old year can be detached or dropped
+        -- whole. The live tables keep their foreign keys, triggers and search
+        -- vectors and only hold open goals and recent cycles.
+        CREATE TABLE IF NOT EXISTS goals_archive (
+            id INTEGER NOT NULL,
+            employee_id INTEGER REFERENCES employees(id) ON DELETE CASCADE,
+            description TEXT NOT NULL,
+            due_date DATE NOT NULL,
+            status VARCHAR(50) NOT NULL CHECK (status IN ('Completed', 'Cancelled')),
+            created_at TIMESTAMP NOT NULL,
+            completed_at TIMESTAMP,
+            archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, due_date)
+        ) PARTITION BY RANGE (due_date);
+        CREATE TABLE IF NOT EXISTS tasks_archive (
+            id INTEGER NOT NULL,
+            goal_id INTEGER NOT NULL,
+            goal_due_date DATE NOT NULL,
+            description TEXT NOT NULL,
+            is_approved BOOLEAN,
+            PRIMARY KEY (id, goal_due_date),
+            FOREIGN KEY (goal_id, goal_due_date) REFERENCES goals_archive (id, due_date) ON DELETE CASCADE
+        ) PARTITION BY RANGE (goal_due_date);
+        CREATE TABLE IF NOT EXISTS feedback_archive (
+            id INTEGER NOT NULL,
+            goal_id INTEGER NOT NULL,
+            goal_due_date DATE NOT NULL,
+            manager_id INTEGER REFERENCES employees(id),
+            feedback_text TEXT NOT NULL,
+            created_at TIMESTAMP,
+            PRIMARY KEY (id, goal_due_date),
+            FOREIGN KEY (goal_id, goal_due_date) REFERENCES goals_archive (id, due_date) ON DELETE CASCADE
+        ) PARTITION BY RANGE (goal_due_date);
+
+        CREATE INDEX IF NOT EXISTS goals_archive_employee_due_idx ON goals_archive (employee_id, due_date DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS tasks_archive_goal_idx ON tasks_archive (goal_id, id);
+        CREATE INDEX IF NOT EXISTS feedback_archive_goal_created_idx ON feedback_archive (goal_id, created_at DESC);
+
+        -- Archiving deletes goals from the live table without changing anyone's
+        -- record, so the per-employee statistics skip those deletes and keep
+        -- counting archived goals.
+        CREATE OR REPLACE FUNCTION employee_goal_stats_refresh()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM apply_goal_stat_changes(array_agg(employee_id), array_agg(status::TEXT), array_agg(1))
+                FROM new_goals;
+            ELSIF TG_OP = 'DELETE' THEN
+                IF current_setting('pms.archiving', TRUE) = 'on' THEN
+                    RETURN NULL;
+                END IF;
+                PERFORM apply_goal_stat_changes(array_agg(employee_id), array_agg(status::TEXT), array_agg(-1))
+                FROM old_goals;
+            ELSE
+                PERFORM apply_goal_stat_changes(array_agg(c.employee_id), array_agg(c.status::TEXT), array_agg(c.delta))
+                FROM (
+                    SELECT n.employee_id, n.status, 1 AS delta
+                    FROM new_goals n JOIN old_goals o ON o.id = n.id
+                    WHERE (n.employee_id, n.status) IS DISTINCT FROM (o.employee_id, o.status)
+                    UNION ALL
+                    SELECT o.employee_id, o.status, -1
+                    FROM new_goals n JOIN old_goals o ON o.id = n.id
+                    WHERE (n.employee_id, n.status) IS DISTINCT FROM (o.employee_id, o.status)
+                ) c;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """),
+    (12, "Change feed: name the writing session in each event", """
+        -- Backend_pms sets pms.session for the length of each write transaction made
+        -- under a session key, so a session can skip the events of its own writes.
+        CREATE OR REPLACE FUNCTION notify_pms_change()
+        RETURNS TRIGGER AS $$
+        DECLARE
+            goal_ids INTEGER[] := '{}';
+            employee_ids INTEGER[] := '{}';
+            ids INTEGER[];
+            owners INTEGER[];
+            touched INTEGER := 0;
+            listed BOOLEAN := TRUE;
+            n INTEGER;
+        BEGIN
+            IF TG_OP <> 'DELETE' THEN
+                IF TG_TABLE_NAME = 'goals' THEN
+                    SELECT COUNT(*), array_agg(r.id), array_agg(r.employee_id) INTO n, ids, owners
+                    FROM (SELECT id, employee_id FROM new_rows LIMIT 101) r;
+                ELSE
+                    SELECT COUNT(*), array_agg(r.goal_id), array_agg(g.employee_id) INTO n, ids, owners
+                    FROM (SELECT goal_id FROM new_rows LIMIT 101) r LEFT JOIN goals g ON g.id = r.goal_id;
+                END IF;
+                touched := touched + n;
+                listed := listed AND n <= 100;
+                goal_ids := goal_ids || ids;
+                employee_ids := employee_ids || owners;
+            END IF;
+            IF TG_OP <> 'INSERT' THEN
+                IF TG_TABLE_NAME = 'goals' THEN
+                    SELECT COUNT(*), array_agg(r.id), array_agg(r.employee_id) INTO n, ids, owners
+                    FROM (SELECT id, employee_id FROM old_rows LIMIT 101) r;
+                ELSE
+                    SELECT COUNT(*), array_agg(r.goal_id), array_agg(g.employee_id) INTO n, ids, owners
+                    FROM (SELECT goal_id FROM old_rows LIMIT 101) r LEFT JOIN goals g ON g.id = r.goal_id;
+                END IF;
+                touched := touched + n;
+                listed := listed AND n <= 100;
+                goal_ids := goal_ids || ids;
+                employee_ids := employee_ids || owners;
+            END IF;
+            IF touched = 0 THEN
+                RETURN NULL;
+            END IF;
+            PERFORM pg_notify('pms_changes', json_build_object(
+                'table', TG_TABLE_NAME,
+                'goals', CASE WHEN listed THEN ARRAY(SELECT DISTINCT id FROM unnest(goal_ids) AS id WHERE id IS NOT NULL) END,
+                'employees', CASE WHEN listed THEN ARRAY(SELECT DISTINCT id FROM unnest(employee_ids) AS id WHERE id IS NOT NULL) END,
+                'session', NULLIF(current_setting('pms.session', TRUE), '')
+            )::TEXT);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """),
+    (13, "Change feed: NOTIFY on employee writes", """
+        -- Employee inserts, manager changes and deletes send events for table
+        -- 'employees' with the employees' ids and no goals, so other processes
+        -- drop their cached employee lists, reporting lines and team rollups.
+        CREATE OR REPLACE FUNCTION notify_pms_change()
+        RETURNS TRIGGER AS $$
+        DECLARE
+            goal_ids INTEGER[] := '{}';
+            employee_ids INTEGER[] := '{}';
+            ids INTEGER[];
+            owners INTEGER[];
+            touched INTEGER := 0;
+            listed BOOLEAN := TRUE;
+            n INTEGER;
+        BEGIN
+            IF TG_OP <> 'DELETE' THEN
+                IF TG_TABLE_NAME = 'employees' THEN
+                    SELECT COUNT(*), NULL, array_agg(r.id) INTO n, ids, owners
+                    FROM (SELECT id FROM new_rows LIMIT 101) r;
+                ELSIF TG_TABLE_NAME = 'goals' THEN
+                    SELECT COUNT(*), array_agg(r.id), array_agg(r.employee_id) INTO n, ids, owners
+                    FROM (SELECT id, employee_id FROM new_rows LIMIT 101) r;
+                ELSE
+                    SELECT COUNT(*), array_agg(r.goal_id), array_agg(g.employee_id) INTO n, ids, owners
+                    FROM (SELECT goal_id FROM new_rows LIMIT 101) r LEFT JOIN goals g ON g.id = r.goal_id;
+                END IF;
+                touched := touched + n;
+                listed := listed AND n <= 100;
+                goal_ids := goal_ids || ids;
+                employee_ids := employee_ids || owners;
+            END IF;
+            IF TG_OP <> 'INSERT' THEN
+                IF TG_TABLE_NAME = 'employees' THEN
+                    SELECT COUNT(*), NULL, array_agg(r.id) INTO n, ids, owners
+                    FROM (SELECT id FROM old_rows LIMIT 101) r;
+                ELSIF TG_TABLE_NAME = 'goals' THEN
+                    SELECT COUNT(*), array_agg(r.id), array_agg(r.employee_id) INTO n, ids, owners
+                    FROM (SELECT id, employee_id FROM old_rows LIMIT 101) r;
+                ELSE
+                    SELECT COUNT(*), array_agg(r.goal_id), array_agg(g.employee_id) INTO n, ids, owners
+                    FROM (SELECT goal_id FROM old_rows LIMIT 101) r LEFT JOIN goals g ON g.id = r.goal_id;
+                END IF;
+                touched := touched + n;
+                listed := listed AND n <= 100;
+                goal_ids := goal_ids || ids;
+                employee_ids := employee_ids || owners;
+            END IF;
+            IF touched = 0 THEN
+                RETURN NULL;
+            END IF;
+            PERFORM pg_notify('pms_changes', json_build_object(
+                'table', TG_TABLE_NAME,
+                'goals', CASE WHEN listed THEN ARRAY(SELECT DISTINCT id FROM unnest(goal_ids) AS id WHERE id IS NOT NULL) END,
+                'employees', CASE WHEN listed THEN ARRAY(SELECT DISTINCT id FROM unnest(employee_ids) AS id WHERE id IS NOT NULL) END,
+                'session', NULLIF(current_setting('pms.session', TRUE), '')
+            )::TEXT);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS employees_notify_insert ON employees;
+        CREATE TRIGGER employees_notify_insert AFTER INSERT ON employees
+        REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION notify_pms_change();
+        DROP TRIGGER IF EXISTS employees_notify_update ON employees;
+        CREATE TRIGGER employees_notify_update AFTER UPDATE ON employees
+        REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION notify_pms_change();
+        DROP TRIGGER IF EXISTS employees_notify_delete ON employees;
+        CREATE TRIGGER employees_notify_delete AFTER DELETE ON employees
+        REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION notify_pms_change();
+    """),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def current_version(cur):
+    """Returns the highest applied migration version, or 0 for an unversioned database."""
+    cur.execute("SELECT to_regclass('schema_version') IS NOT NULL")
+    if not cur.fetchone()[0]:
+        return 0
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cur.fetchone()[0]
+
+def migrate(conn):
+    """Applies any pending migrations on conn and returns the versions applied.
+
+    Up-to-date databases cost two catalog lookups and take no locks. Otherwise an
+    advisory lock serialises concurrent processes, so only one of them runs the DDL.
+    The caller commits.
+    """
+    applied = []
+    with conn.cursor() as cur:
+        if current_version(cur) >= LATEST_VERSION:
+            return applied
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('pms_schema_migrations'))")
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        version = current_version(cur)
+        for step, description, sql in MIGRATIONS:
+            if step <= version:
+                continue
+            cur.execute(sql)
+            cur.execute(
+                "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                (step, description)
+            )
+            applied.append(step)
+    return applied
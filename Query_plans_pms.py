@@ -0,0 +1,231 @@
+"""Query-plan regression harness for Backend_pms.
+
+Runs every public backend function against a large synthetic dataset, captures the
+SQL it sends, and checks each statement with EXPLAIN (ANALYZE, BUFFERS). The run
+fails if a hot query falls back to a sequential scan on a large table or goes over
+its latency budget.
+
+Point the DB_* environment variables at a scratch database, then:
+
+    python Query_plans_pms.py --load --scale 20
+    python Query_plans_pms.py --budget-ms 25
+"""
+import argparse
+import inspect
+import json
+import sys
+
+import Backend_pms as be
+import Metrics_pms as metrics
+import Synthetic_pms
+
+# Tables whose sequential scans count as regressions in hot queries.
+HOT_TABLES = {"employees", "goals", "tasks", "feedback"}
+
+# Backend functions that are not query paths (schema, maintenance, pool plumbing).
+EXEMPT = {
+    "init_connection_pool", "close_connection_pool", "get_db_connection", "release_db_connection",
+    "transaction", "setup_database", "seed_data", "get_schema_version", "rebuild_insights",
+    "get_cache_stats", "clear_cache", "configure_cache", "refresh_trends", "rebuild_trends",
+    "set_session", "get_replica_status", "subscribe_changes", "unsubscribe_changes",
+    "start_change_listener", "stop_change_listener", "archive_cutoff", "archive_closed_goals",
+    "start_trend_refresher", "stop_trend_refresher",
+}
+
+_captured = []
+
+class _CapturingCursor(metrics.InstrumentedCursor):
+    """Cursor that records every statement it runs, with parameters inlined."""
+
+    def execute(self, query, vars=None):
+        _captured.append(self.mogrify(query, vars).decode())
+        return super().execute(query, vars)
+
+class _Rollback(Exception):
+    pass
+
+# --- Synthetic Data ---
+def load_synthetic_data(conn, scale=20.0, seed=25176):
+    """Appends a deterministic synthetic org (see Synthetic_pms) and refreshes planner statistics."""
+    counts = Synthetic_pms.load_org(conn, scale, seed)
+    conn.commit()
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("VACUUM ANALYZE")
+    finally:
+        conn.autocommit = False
+    be.rebuild_trends()
+    return counts
+
+# --- Scenario ---
+def sample_ids(conn):
+    """Picks the busiest employee, their manager, and one of their goals and tasks to query with."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT employee_id FROM employee_goal_stats ORDER BY total_goals DESC, employee_id LIMIT 1")
+        employee_id = cur.fetchone()[0]
+        cur.execute("SELECT COALESCE(manager_id, id) FROM employees WHERE id = %s", (employee_id,))
+        manager_id = cur.fetchone()[0]
+        cur.execute("""
+            SELECT g.id, t.id FROM goals g JOIN tasks t ON t.goal_id = g.id
+            WHERE g.employee_id = %s ORDER BY g.id LIMIT 1
+        """, (employee_id,))
+        goal_id, task_id = cur.fetchone()
+        cur.execute("SELECT id FROM goals WHERE employee_id = %s ORDER BY id LIMIT 50", (employee_id,))
+        goal_ids = [row[0] for row in cur.fetchall()]
+    return employee_id, manager_id, goal_id, task_id, goal_ids
+
+def hot_calls(employee_id, manager_id, goal_id, task_id, goal_ids):
+    """(function name, args, writes, seq scans forbidden) for every query path in Backend_pms."""
+    return [
+        ("get_employees", (), False, False),
+        ("get_goals_for_employee", (employee_id,), False, True),
+        ("get_tasks_for_goal", (goal_id,), False, True),
+        ("get_feedback_for_goal", (goal_id,), False, True),
+        ("get_tasks_for_goals", (goal_ids,), False, True),
+        ("get_feedback_for_goals", (goal_ids,), False, True),
+        ("get_performance_history", (employee_id,), False, True),
+        ("get_performance_history", (employee_id, True), False, True),
+        ("get_archived_history", (employee_id,), False, True),
+        ("get_performance_insights", (), False, False),
+        ("get_employee_percentile", (employee_id,), False, False),
+        ("get_goals_for_employee_page", (employee_id, 20), False, True),
+        ("get_goals_for_employee_page", (employee_id, 20, ("2025-01-01", 2147483647)), False, True),
+        ("get_goal_summaries_page", (employee_id, 20), False, True),
+        ("get_goal_summaries_page", (employee_id, 20, ("2025-01-01", 2147483647)), False, True),
+        ("get_goal_summaries", (goal_ids,), False, True),
+        ("get_feedback_for_goal_page", (goal_id, 20), False, True),
+        ("get_feedback_for_goal_page", (goal_id, 20, ("2025-01-01", 2147483647)), False, True),
+        ("get_performance_history_page", (employee_id, 20), False, True),
+        ("iter_goals_for_employee", (employee_id,), False, True),
+        ("iter_feedback_for_goal", (goal_id,), False, True),
+        ("create_employee", ("Plan Check", employee_id), True, True),
+        ("create_goal", (employee_id, "Plan check goal", "2030-01-01"), True, True),
+        ("update_goal_status", (goal_id, "Completed"), True, True),
+        ("update_goals_status", (goal_ids, "Completed"), True, True),
+        ("delete_goal", (goal_id,), True, True),
+        ("create_task", (goal_id, "Plan check task"), True, True),
+        ("approve_task", (task_id,), True, True),
+        ("approve_tasks", ([task_id],), True, True),
+        ("delete_task", (task_id,), True, True),
+        ("create_feedback", (goal_id, employee_id, "Plan check feedback"), True, True),
+        ("search", ("security training", employee_id), False, True),
+        ("search", ("milestones", None, manager_id), False, True),
+        ("search", ("milestones", None, manager_id, 20, (0.05, "feedback", 2147483647)), False, True),
+        # An unscoped common word matches a large share of the rows, so a scan is fair game.
+        ("search", ("progress",), False, False),
+        ("get_goal_trends", ("week", 12), False, False),
+        ("get_goal_trends", ("month", 12), False, False),
+        ("get_feedback_trends", (manager_id, "week", 12), False, True),
+        ("get_direct_reports", (manager_id,), False, True),
+        ("get_subtree", (manager_id,), False, True),
+        ("get_chain_of_command", (employee_id,), False, True),
+        ("is_manager", (manager_id,), False, True),
+        ("get_team_rollups", (manager_id,), False, True),
+        ("update_employee_manager", (employee_id, manager_id), True, True),
+    ]
+
+def _capture(name, args, writes):
+    """Runs one backend function and returns the statements it sent."""
+    del _captured[:]
+    be.clear_cache()
+    func = getattr(be, name)
+    if writes:
+        try:
+            with be.transaction():
+                func(*args)
+                raise _Rollback()
+        except _Rollback:
+            pass
+    else:
+        result = func(*args)
+        if inspect.isgenerator(result):
+            for _ in result:
+                pass
+    return list(_captured)
+
+def _seq_scans(node):
+    """Yields the relations read by sequential scans anywhere in a plan tree."""
+    if node.get("Node Type") == "Seq Scan":
+        yield node.get("Relation Name")
+    for child in node.get("Plans", []):
+        yield from _seq_scans(child)
+
+def explain(conn, statement):
+    """Returns (execution ms, shared buffers hit+read, seq-scanned relations) for a statement.
+
+    The statement runs for real, so it is always rolled back.
+    """
+    with conn.cursor() as cur:
+        try:
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement)
+            result = cur.fetchone()[0]
+        finally:
+            conn.rollback()
+    if isinstance(result, str):
+        result = json.loads(result)
+    plan = result[0]["Plan"]
+    buffers = plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0)
+    return result[0]["Execution Time"], buffers, sorted(set(_seq_scans(plan)))
+
+def run_checks(budget_ms):
+    """Checks every captured statement; returns a list of failure messages."""
+    failures = []
+    be.init_connection_pool(1, 2, cursor_factory=_CapturingCursor)
+    conn = be.get_db_connection()
+    if conn is None:
+        return ["could not connect to the database"]
+    try:
+        calls = hot_calls(*sample_ids(conn))
+        public = {name for name, obj in inspect.getmembers(be, inspect.isfunction)
+                  if not name.startswith("_") and obj.__module__ == be.__name__}
+        uncovered = sorted(public - EXEMPT - {call[0] for call in calls})
+        for name in uncovered:
+            failures.append(f"{name}: not covered by the plan harness")
+
+        print(f"{'function':<28} {'ms':>8} {'buffers':>8}  seq scans")
+        for name, args, writes, forbid_seq in calls:
+            for statement in _capture(name, args, writes):
+                if statement.lstrip().upper().startswith(("BEGIN", "COMMIT", "ROLLBACK")):
+                    continue
+                ms, buffers, seq = explain(conn, statement)
+                print(f"{name:<28} {ms:>8.2f} {buffers:>8}  {', '.join(seq) or '-'}")
+                hot_seq = [rel for rel in seq if rel in HOT_TABLES]
+                if forbid_seq and hot_seq:
+                    failures.append(f"{name}: sequential scan on {', '.join(hot_seq)}")
+                if ms > budget_ms:
+                    failures.append(f"{name}: {ms:.2f} ms exceeds the {budget_ms} ms budget")
+    finally:
+        be.release_db_connection(conn)
+        be.close_connection_pool()
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check Backend_pms query plans against a large dataset.")
+    parser.add_argument("--load", action="store_true", help="load a synthetic org first")
+    parser.add_argument("--scale", type=float, default=20.0, help="synthetic org size, 1 = about 1,000 employees")
+    parser.add_argument("--seed", type=int, default=25176)
+    parser.add_argument("--budget-ms", type=float, default=50.0, help="latency budget per statement")
+    args = parser.parse_args(argv)
+
+    be.setup_database()
+    if args.load:
+        conn = be.get_db_connection()
+        if conn is None:
+            return 1
+        try:
+            load_synthetic_data(conn, args.scale, args.seed)
+        finally:
+            be.release_db_connection(conn)
+
+    failures = run_checks(args.budget_ms)
+    if failures:
+        print("\nFAILED")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("\nAll query plans within budget.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""Batch performance reports for a whole review cycle.
+
+Writes one report per employee (the Reporting page's goals, tasks and feedback)
+as CSV and/or HTML, for the whole org or one manager's reporting line:
+
+    python Reports_pms.py --out reports/2025-H2 --format csv,html --workers 4
+    python Reports_pms.py --out reports/eng --manager-id 12
+    python Reports_pms.py --out reports/all-time --include-archived
+
+Data is streamed from one set-based query through a server-side cursor, employees
+are rendered in a process pool, and only a bounded number of employees is in
+flight at once, so memory stays flat however large the org is. Each file is
+written under a temporary name and renamed when complete; rerunning the same
+command skips employees whose reports already exist, so an interrupted run
+resumes where it stopped (use --force to regenerate). Goals of archived review
+cycles are left out unless --include-archived is given.
+"""
+import argparse
+import csv
+import html
+import itertools
+import multiprocessing
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import Backend_pms as be
+
+FORMATS = ("csv", "html")
+
+# One row per goal (or one goal-less row per employee), with the goal's tasks and
+# feedback folded into JSON arrays, ordered so each employee's rows are adjacent.
+REPORT_QUERY = """
+    SELECT e.id, e.name, g.id, g.description, g.due_date, g.status, t.tasks, f.feedback
+    FROM employees e
+    LEFT JOIN {goals} g ON g.employee_id = e.id
+    LEFT JOIN LATERAL (
+        SELECT json_agg(json_build_array(description, is_approved) ORDER BY id) AS tasks
+        FROM {tasks} tasks WHERE goal_id = g.id
+    ) t ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT json_agg(json_build_array(fb.feedback_text, m.name, fb.created_at) ORDER BY fb.created_at DESC) AS feedback
+        FROM {feedback} fb JOIN employees m ON m.id = fb.manager_id
+        WHERE fb.goal_id = g.id
+    ) f ON TRUE
+    WHERE {scope} AND NOT (e.id = ANY(%(done)s))
+    ORDER BY e.id, g.due_date DESC, g.id DESC
+"""
+
+SCOPES = {
+    "all": "TRUE",
+    "manager": "e.id IN (SELECT descendant_id FROM employee_hierarchy WHERE ancestor_id = %(manager_id)s)",
+}
+
+# Live tables only, or live and archived goals (see Backend_pms.archive_closed_goals()).
+SOURCES = {
+    False: {"goals": "goals", "tasks": "tasks", "feedback": "feedback"},
+    True: {
+        "goals": """(SELECT id, employee_id, description, due_date, status FROM goals
+                     UNION ALL SELECT id, employee_id, description, due_date, status FROM goals_archive)""",
+        "tasks": """(SELECT id, goal_id, description, is_approved FROM tasks
+                     UNION ALL SELECT id, goal_id, description, is_approved FROM tasks_archive)""",
+        "feedback": """(SELECT goal_id, manager_id, feedback_text, created_at FROM feedback
+                        UNION ALL SELECT goal_id, manager_id, feedback_text, created_at FROM feedback_archive)""",
+    },
+}
+
+# --- Rendering (runs in worker processes) ---
+def report_path(out_dir, employee_id, fmt):
+    return os.path.join(out_dir, f"employee_{employee_id}.{fmt}")
+
+def _write_atomically(path, render):
+    """Writes via a temporary file so a report either exists complete or not at all."""
+    partial = path + ".part"
+    with open(partial, "w", newline="", encoding="utf-8") as out:
+        render(out)
+    os.replace(partial, path)
+
+def _render_csv(out, name, goals):
+    writer = csv.writer(out)
+    writer.writerow(["employee", "goal_id", "goal", "due_date", "status", "record", "text", "detail", "date"])
+    for goal_id, description, due_date, status, tasks, feedback in goals:
+        writer.writerow([name, goal_id, description, due_date, status, "goal", "", "", ""])
+        for task_text, is_approved in tasks:
+            writer.writerow([name, goal_id, description, due_date, status, "task", task_text, "Approved" if is_approved else "Pending", ""])
+        for feedback_text, manager_name, created_at in feedback:
+            writer.writerow([name, goal_id, description, due_date, status, "feedback", feedback_text, manager_name, created_at])
+
+def _render_html(out, name, goals):
+    e = html.escape
+    out.write(f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Performance report: {e(name)}</title></head><body>\n")
+    out.write(f"<h1>Performance History: {e(name)}</h1>\n")
+    if not goals:
+        out.write("<p>No performance data available.</p>\n")
+    for _, description, due_date, status, tasks, feedback in goals:
+        out.write(f"<h2>Goal: {e(description)}</h2>\n<p><b>Status:</b> {e(status)} | <b>Due:</b> {e(str(due_date))}</p>\n")
+        out.write("<h3>Tasks</h3>\n")
+        if tasks:
+            out.write("<ul>\n")
+            for task_text, is_approved in tasks:
+                out.write(f"<li>{e(task_text)} <i>{'Approved' if is_approved else 'Pending'}</i></li>\n")
+            out.write("</ul>\n")
+        else:
+            out.write("<p><i>No tasks logged for this goal.</i></p>\n")
+        out.write("<h3>Feedback</h3>\n")
+        if feedback:
+            out.write("<ul>\n")
+            for feedback_text, manager_name, created_at in feedback:
+                out.write(f"<li>[{e(str(created_at)[:10])}] from {e(str(manager_name))}: {e(feedback_text)}</li>\n")
+            out.write("</ul>\n")
+        else:
+            out.write("<p><i>No feedback recorded for this goal.</i></p>\n")
+    out.write("</body></html>\n")
+
+_RENDERERS = {"csv": _render_csv, "html": _render_html}
+
+def render_employee(out_dir, formats, employee_id, name, goals):
+    """Writes one employee's reports and returns employee_id."""
+    for fmt in formats:
+        _write_atomically(report_path(out_dir, employee_id, fmt), lambda out: _RENDERERS[fmt](out, name, goals))
+    return employee_id
+
+# --- Streaming ---
+def completed_employee_ids(out_dir, formats):
+    """Employees whose reports exist in every requested format."""
+    done = None
+    for fmt in formats:
+        ids = set()
+        for filename in os.listdir(out_dir):
+            employee_id = filename[len("employee_"):-len(fmt) - 1]
+            if filename.startswith("employee_") and filename.endswith("." + fmt) and employee_id.isdigit():
+                ids.add(int(employee_id))
+        done = ids if done is None else done & ids
+    return done or set()
+
+def iter_employees(cur, manager_id=None, done=(), batch_size=2000, include_archived=False):
+    """Yields (employee_id, name, goals) per employee from one server-side cursor.
+
+    goals is a list of (goal_id, description, due_date, status, tasks, feedback).
+    """
+    scope = "all" if manager_id is None else "manager"
+    cur.itersize = batch_size
+    query = REPORT_QUERY.format(scope=SCOPES[scope], **SOURCES[include_archived])
+    cur.execute(query, {"manager_id": manager_id, "done": list(done)})
+    for (employee_id, name), rows in itertools.groupby(cur, key=lambda row: (row[0], row[1])):
+        goals = [
+            (goal_id, description, due_date, status, tasks or [], feedback or [])
+            for _, _, goal_id, description, due_date, status, tasks, feedback in rows
+            if goal_id is not None
+        ]
+        yield employee_id, name, goals
+
+def _count_employees(cur, manager_id, done):
+    if manager_id is None:
+        cur.execute("SELECT COUNT(*) FROM employees WHERE NOT (id = ANY(%s))", (list(done),))
+    else:
+        cur.execute(
+            "SELECT COUNT(*) FROM employee_hierarchy WHERE ancestor_id = %s AND NOT (descendant_id = ANY(%s))",
+            (manager_id, list(done))
+        )
+    return cur.fetchone()[0]
+
+def _progress(finished, total):
+    percent = 100 * finished // total if total else 100
+    sys.stderr.write(f"\r{finished}/{total} employees ({percent}%)")
+    sys.stderr.flush()
+
+def generate_reports(out_dir, formats=("csv",), manager_id=None, workers=None, batch_size=2000, force=False,
+                     include_archived=False):
+    """Writes reports for every employee in scope; returns how many were written this run."""
+    os.makedirs(out_dir, exist_ok=True)
+    done = set() if force else completed_employee_ids(out_dir, formats)
+    workers = workers or os.cpu_count() or 1
+    # Employees queued or rendering at once; bounds memory to a few batches.
+    max_in_flight = workers * 4
+    written = 0
+    # The pool starts workers lazily, after the connection below is open. Spawned
+    # workers start from a fresh interpreter, so unlike forked ones they never
+    # hold a copy of that socket or of any other pooled connection.
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        with be.transaction() as conn:
+            with conn.cursor() as cur:
+                total = _count_employees(cur, manager_id, done)
+            if done:
+                print(f"Skipping {len(done)} employees with existing reports.", file=sys.stderr)
+            _progress(0, total)
+            pending = set()
+            with conn.cursor(name="pms_reports") as cur:
+                try:
+                    for employee_id, name, goals in iter_employees(cur, manager_id, done, batch_size, include_archived):
+                        pending.add(pool.submit(render_employee, out_dir, formats, employee_id, name, goals))
+                        if len(pending) >= max_in_flight:
+                            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                            for future in finished:
+                                future.result()
+                            written += len(finished)
+                            _progress(written, total)
+                    for future in pending:
+                        future.result()
+                    written += len(pending)
+                    _progress(written, total)
+                except BaseException:
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    raise
+    sys.stderr.write("\n")
+    return written
+
+# --- Command Line ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write per-employee performance reports for a review cycle.")
+    parser.add_argument("--out", required=True, help="output directory; rerun with the same one to resume")
+    parser.add_argument("--format", default="csv", help="comma-separated: csv, html")
+    parser.add_argument("--manager-id", type=int, help="only this manager and their reporting line")
+    parser.add_argument("--workers", type=int, help="render processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=2000, help="rows fetched per round trip")
+    parser.add_argument("--force", action="store_true", help="regenerate reports that already exist")
+    parser.add_argument("--include-archived", action="store_true", help="also report goals of archived review cycles")
+    args = parser.parse_args(argv)
+
+    formats = tuple(fmt.strip() for fmt in args.format.split(",") if fmt.strip())
+    unknown = sorted(set(formats) - set(FORMATS))
+    if unknown or not formats:
+        parser.error(f"unknown format(s): {', '.join(unknown) or '(none)'}; choose from {', '.join(FORMATS)}")
+
+    be.setup_database()
+    try:
+        written = generate_reports(
+            args.out, formats, args.manager_id, args.workers, args.batch_size, args.force, args.include_archived
+        )
+    except KeyboardInterrupt:
+        print("\nInterrupted; rerun the same command to resume.", file=sys.stderr)
+        return 130
+    print(f"Wrote reports for {written} employees to {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,916 @@
+"""In-process SQLite storage engine for the PMS backend.
+
+Selected with PMS_STORAGE=sqlite; Backend_pms then serves every function in
+Backend_pms.STORAGE_INTERFACE from here instead of PostgreSQL. Signatures, row
+shapes and constraints are the same: the status CHECK, cascading deletes, the
+"Great job" feedback when a goal is completed, goal completion timestamps and
+the reporting-line cycle check. There is no server, so each call costs a
+function call rather than a network round trip, which suits tests, benchmarks
+and small single-node installs. Closed review cycles can be archived as with
+PostgreSQL, into plain (unpartitioned) archive tables.
+
+PMS_SQLITE_PATH names the database file (default pms.sqlite3); ":memory:" keeps
+one shared in-memory database for the life of the process.
+
+Differences from PostgreSQL: hierarchy, insight and trend queries are computed
+from the base and archive tables on each call instead of from the precomputed
+tables, and search matches every word of the query as a case-insensitive
+substring rather than through English stemming and web-search syntax.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import Backend_pms as be
+import Metrics_pms as metrics
+
+SCHEMA_VERSION = 2
+_NOW = "(strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))"
+
+SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS employees (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        manager_id INTEGER REFERENCES employees(id)
+    );
+    CREATE TABLE IF NOT EXISTS goals (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        employee_id INTEGER REFERENCES employees(id) ON DELETE CASCADE,
+        description TEXT NOT NULL,
+        due_date DATE NOT NULL,
+        status TEXT NOT NULL CHECK (status IN ('Draft', 'In Progress', 'Completed', 'Cancelled')),
+        created_at TIMESTAMP NOT NULL DEFAULT {_NOW},
+        completed_at TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        goal_id INTEGER REFERENCES goals(id) ON DELETE CASCADE,
+        description TEXT NOT NULL,
+        is_approved BOOLEAN DEFAULT FALSE
+    );
+    CREATE TABLE IF NOT EXISTS feedback (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        goal_id INTEGER REFERENCES goals(id) ON DELETE CASCADE,
+        manager_id INTEGER REFERENCES employees(id),
+        feedback_text TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT {_NOW}
+    );
+
+    -- Archived goals of closed review cycles, with their tasks and feedback. Ids
+    -- are kept, and AUTOINCREMENT above stops the live tables from reusing them.
+    CREATE TABLE IF NOT EXISTS goals_archive (
+        id INTEGER PRIMARY KEY,
+        employee_id INTEGER REFERENCES employees(id) ON DELETE CASCADE,
+        description TEXT NOT NULL,
+        due_date DATE NOT NULL,
+        status TEXT NOT NULL CHECK (status IN ('Completed', 'Cancelled')),
+        created_at TIMESTAMP NOT NULL,
+        completed_at TIMESTAMP,
+        archived_at TIMESTAMP NOT NULL DEFAULT {_NOW}
+    );
+    CREATE TABLE IF NOT EXISTS tasks_archive (
+        id INTEGER PRIMARY KEY,
+        goal_id INTEGER NOT NULL REFERENCES goals_archive(id) ON DELETE CASCADE,
+        description TEXT NOT NULL,
+        is_approved BOOLEAN
+    );
+    CREATE TABLE IF NOT EXISTS feedback_archive (
+        id INTEGER PRIMARY KEY,
+        goal_id INTEGER NOT NULL REFERENCES goals_archive(id) ON DELETE CASCADE,
+        manager_id INTEGER REFERENCES employees(id),
+        feedback_text TEXT NOT NULL,
+        created_at TIMESTAMP
+    );
+
+    CREATE INDEX IF NOT EXISTS employees_manager_idx ON employees (manager_id, name);
+    CREATE INDEX IF NOT EXISTS goals_employee_due_idx ON goals (employee_id, due_date DESC, id DESC);
+    CREATE INDEX IF NOT EXISTS goals_created_at_idx ON goals (created_at);
+    CREATE INDEX IF NOT EXISTS goals_completed_at_idx ON goals (completed_at) WHERE completed_at IS NOT NULL;
+    CREATE INDEX IF NOT EXISTS tasks_goal_idx ON tasks (goal_id, id);
+    CREATE INDEX IF NOT EXISTS feedback_goal_created_idx ON feedback (goal_id, created_at DESC, id DESC);
+    CREATE INDEX IF NOT EXISTS feedback_created_at_idx ON feedback (created_at);
+    CREATE INDEX IF NOT EXISTS goals_archive_employee_due_idx ON goals_archive (employee_id, due_date DESC, id DESC);
+    CREATE INDEX IF NOT EXISTS tasks_archive_goal_idx ON tasks_archive (goal_id, id);
+    CREATE INDEX IF NOT EXISTS feedback_archive_goal_created_idx ON feedback_archive (goal_id, created_at DESC);
+
+    -- Automated feedback when a goal is marked 'Completed'.
+    CREATE TRIGGER IF NOT EXISTS goal_completed_trigger
+    AFTER UPDATE OF status ON goals
+    FOR EACH ROW WHEN NEW.status = 'Completed' AND OLD.status <> 'Completed'
+    BEGIN
+        INSERT INTO feedback (goal_id, manager_id, feedback_text, created_at)
+        VALUES (NEW.id, (SELECT manager_id FROM employees WHERE id = NEW.employee_id), 'Great job on completing this goal!', {_NOW});
+    END;
+
+    -- completed_at follows status; an explicit value (e.g. from an import) is kept.
+    CREATE TRIGGER IF NOT EXISTS goal_completed_at_insert_trigger
+    AFTER INSERT ON goals
+    FOR EACH ROW WHEN NEW.status = 'Completed' AND NEW.completed_at IS NULL
+    BEGIN
+        UPDATE goals SET completed_at = {_NOW} WHERE id = NEW.id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS goal_completed_at_update_trigger
+    AFTER UPDATE OF status ON goals
+    FOR EACH ROW WHEN NEW.status IS NOT OLD.status
+    BEGIN
+        UPDATE goals SET completed_at = CASE WHEN NEW.status = 'Completed' THEN COALESCE(NEW.completed_at, {_NOW}) END
+        WHERE id = NEW.id;
+    END;
+"""
+
+# Dates and timestamps are stored as ISO text, with timestamps at millisecond
+# precision like the column defaults, so keyset cursors compare exactly.
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" ", timespec="milliseconds"))
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter("BOOLEAN", lambda value: value not in (b"0", b""))
+
+# --- Database Connection ---
+# One connection per thread. Every call runs in its own transaction unless it is
+# inside transaction(); write transactions take the write lock up front.
+_local = threading.local()
+_keeper = None
+_keeper_lock = threading.Lock()
+
+class _InstrumentedCursor(sqlite3.Cursor):
+    """Counts fetched rows towards the current Metrics_pms call."""
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            metrics._rows(1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        metrics._rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        metrics._rows(len(rows))
+        return rows
+
+class _InstrumentedConnection(sqlite3.Connection):
+    """Counts statements like Metrics_pms.InstrumentedCursor does for PostgreSQL."""
+
+    def cursor(self, factory=_InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        metrics._statement(sql)
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        metrics._statement(sql)
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def _control(conn, sql):
+    """Runs BEGIN/COMMIT/ROLLBACK without counting it as a statement, as psycopg2 does."""
+    sqlite3.Connection.execute(conn, sql)
+
+def _database():
+    """Returns (database, uri) for sqlite3.connect() from PMS_SQLITE_PATH."""
+    path = os.environ.get("PMS_SQLITE_PATH", "pms.sqlite3")
+    if path == ":memory:":
+        return "file:pms_memory?mode=memory&cache=shared", True
+    return path, False
+
+def _connect():
+    global _keeper
+    conn = getattr(_local, "db", None)
+    if conn is not None:
+        return conn
+    database, uri = _database()
+    if uri:
+        with _keeper_lock:
+            if _keeper is None:
+                # The shared in-memory database lives as long as one connection to it is open.
+                _keeper = sqlite3.connect(database, uri=True, check_same_thread=False)
+    conn = sqlite3.connect(
+        database, uri=uri, timeout=30, isolation_level=None, detect_types=sqlite3.PARSE_DECLTYPES,
+        factory=_InstrumentedConnection if metrics.ENABLED else sqlite3.Connection
+    )
+    conn.execute("PRAGMA foreign_keys = ON")
+    if not uri:
+        conn.execute("PRAGMA journal_mode = WAL")
+    _local.db = conn
+    return conn
+
+@contextmanager
+def _connection(write=False):
+    """Yields this thread's connection inside a transaction that commits on exit.
+
+    Nested blocks join the outer transaction. Change events recorded with
+    _changed() are handed to Backend_pms's change feed after the commit.
+    """
+    conn = _connect()
+    if getattr(_local, "changes", None) is not None:
+        yield conn
+        return
+    _control(conn, "BEGIN IMMEDIATE" if write else "BEGIN")
+    _local.changes = []
+    try:
+        yield conn
+        _control(conn, "COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            _control(conn, "ROLLBACK")
+        raise
+    finally:
+        changes, _local.changes = _local.changes, None
+    for change in changes:
+        be._dispatch_change(change)
+
+def transaction():
+    """Unit of work: calls made inside the block share one transaction and one commit.
+
+    Yields the sqlite3 connection. The transaction is rolled back if the block raises.
+    """
+    return _connection(write=True)
+
+def _changed(table, goal_ids, employee_ids=()):
+    """Records a change event for the change feed, sent once the transaction commits."""
+    _local.changes.append({
+        "table": table,
+        "goals": sorted(set(goal_ids)),
+        "employees": sorted({employee_id for employee_id in employee_ids if employee_id is not None}),
+        "session": getattr(be._local, "session", None),
+    })
+
+def _ids(values):
+    """Binds a list of ids as one parameter, for use with json_each()."""
+    return json.dumps(list(values))
+
+def start_change_listener():
+    """Nothing to listen to: every writer is in this process and reports its changes on commit."""
+    return None
+
+def stop_change_listener(timeout=5):
+    return None
+
+# --- Schema Setup ---
+_schema_ready = False
+_seeded = False
+_setup_lock = threading.Lock()
+
+def setup_database():
+    """Creates the tables, indexes and triggers once per process."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _setup_lock:
+        if _schema_ready:
+            return
+        conn = _connect()
+        if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            conn.executescript(SCHEMA)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        _schema_ready = True
+
+def get_schema_version():
+    """Returns the schema version recorded in the database file."""
+    return _connect().execute("PRAGMA user_version").fetchone()[0]
+
+# --- CRUD Operations for Employees ---
+def create_employee(name, manager_id=None):
+    """Creates a new employee."""
+    with _connection(write=True) as conn:
+        cur = conn.execute("INSERT INTO employees (name, manager_id) VALUES (?, ?)", (name, manager_id))
+        _changed("employees", [], [cur.lastrowid])
+
+def get_employees():
+    """Retrieves all employees."""
+    with _connection() as conn:
+        return conn.execute("SELECT id, name FROM employees ORDER BY name").fetchall()
+
+# Live and archived goals, for the figures that cover the whole history.
+_ALL_GOALS = """(
+    SELECT employee_id, due_date, status, created_at, completed_at FROM goals
+    UNION ALL
+    SELECT employee_id, due_date, status, created_at, completed_at FROM goals_archive
+)"""
+
+# --- Reporting Hierarchy ---
+# Walked with recursive queries over manager_id rather than a closure table.
+_SUBTREE = """
+    WITH RECURSIVE tree(id, depth) AS (
+        SELECT ?, 0
+        UNION ALL
+        SELECT e.id, t.depth + 1 FROM employees e JOIN tree t ON e.manager_id = t.id
+    )
+"""
+
+def update_employee_manager(employee_id, manager_id):
+    """Moves an employee (and everyone reporting to them) under a new manager."""
+    with _connection(write=True) as conn:
+        if manager_id is not None and conn.execute(
+            _SUBTREE + "SELECT 1 FROM tree WHERE id = ?", (employee_id, manager_id)
+        ).fetchone():
+            raise sqlite3.IntegrityError(
+                f"Employee {employee_id} cannot report to {manager_id} who is in their own reporting line"
+            )
+        if conn.execute("UPDATE employees SET manager_id = ? WHERE id = ?", (manager_id, employee_id)).rowcount:
+            _changed("employees", [], [employee_id])
+
+def get_direct_reports(manager_id):
+    """Retrieves the employees who report directly to a manager."""
+    with _connection() as conn:
+        return conn.execute("SELECT id, name FROM employees WHERE manager_id = ? ORDER BY name", (manager_id,)).fetchall()
+
+def get_subtree(manager_id, include_self=False):
+    """Retrieves everyone in a manager's reporting line as (id, name, depth), nearest levels first."""
+    with _connection() as conn:
+        return conn.execute(
+            _SUBTREE + "SELECT e.id, e.name, t.depth FROM tree t JOIN employees e ON e.id = t.id WHERE t.depth >= ? ORDER BY t.depth, e.name",
+            (manager_id, 0 if include_self else 1)
+        ).fetchall()
+
+def get_chain_of_command(employee_id):
+    """Retrieves an employee's managers as (id, name, depth), from their direct manager upwards."""
+    with _connection() as conn:
+        return conn.execute(
+            """WITH RECURSIVE chain(id, depth) AS (
+                   SELECT manager_id, 1 FROM employees WHERE id = ?
+                   UNION ALL
+                   SELECT e.manager_id, c.depth + 1 FROM employees e JOIN chain c ON e.id = c.id
+               )
+               SELECT e.id, e.name, c.depth FROM chain c JOIN employees e ON e.id = c.id ORDER BY c.depth""",
+            (employee_id,)
+        ).fetchall()
+
+def get_team_rollups(manager_id):
+    """Rolls up goal counts for the manager and every manager below them.
+
+    Returns (manager id, name, team size, total goals, completed goals, completion rate)
+    per manager, where the team is that manager's whole subtree.
+    """
+    with _connection() as conn:
+        rows = conn.execute(
+            f"""WITH RECURSIVE scope(id, depth) AS (
+                   SELECT ?, 0
+                   UNION ALL
+                   SELECT e.id, s.depth + 1 FROM employees e JOIN scope s ON e.manager_id = s.id
+               ),
+               team(manager_id, id) AS (
+                   SELECT e.manager_id, e.id FROM employees e WHERE e.manager_id IN (SELECT id FROM scope)
+                   UNION ALL
+                   SELECT t.manager_id, e.id FROM employees e JOIN team t ON e.manager_id = t.id
+               ),
+               stats(employee_id, total, completed) AS (
+                   SELECT employee_id, COUNT(*), SUM(status = 'Completed') FROM {_ALL_GOALS} GROUP BY employee_id
+               )
+               SELECT m.id, m.name, COUNT(*), SUM(COALESCE(st.total, 0)), SUM(COALESCE(st.completed, 0))
+               FROM scope s
+               JOIN employees m ON m.id = s.id
+               JOIN team t ON t.manager_id = m.id
+               LEFT JOIN stats st ON st.employee_id = t.id
+               GROUP BY m.id, m.name, s.depth
+               ORDER BY s.depth, m.name""",
+            (manager_id,)
+        ).fetchall()
+    return [
+        (mid, name, size, total, completed, completed / total if total else 0.0)
+        for mid, name, size, total, completed in rows
+    ]
+
+# --- CRUD Operations for Goals ---
+def create_goal(employee_id, description, due_date):
+    """Allows a manager to create a new goal for an employee."""
+    with _connection(write=True) as conn:
+        goal_id = conn.execute(
+            "INSERT INTO goals (employee_id, description, due_date, status) VALUES (?, ?, ?, 'Draft')",
+            (employee_id, description, due_date)
+        ).lastrowid
+        _changed("goals", [goal_id], [employee_id])
+
+def get_goals_for_employee(employee_id):
+    """Retrieves all goals for a specific employee."""
+    with _connection() as conn:
+        return conn.execute(
+            "SELECT id, description, due_date, status FROM goals WHERE employee_id = ? ORDER BY due_date DESC",
+            (employee_id,)
+        ).fetchall()
+
+def update_goal_status(goal_id, status):
+    """Allows a manager to update the status of a goal."""
+    update_goals_status([goal_id], status)
+
+def update_goals_status(goal_ids, status):
+    """Moves a set of goals to a new status; returns how many changed.
+
+    Goals already in that status are left alone, so they get no second automated feedback.
+    """
+    goal_ids = list(goal_ids)
+    if not goal_ids:
+        return 0
+    with _connection(write=True) as conn:
+        changed = conn.execute(
+            "SELECT id, employee_id, status FROM goals WHERE id IN (SELECT value FROM json_each(?))",
+            (_ids(goal_ids),)
+        ).fetchall()
+        conn.execute(
+            "UPDATE goals SET status = ? WHERE id IN (SELECT value FROM json_each(?)) AND status <> ?",
+            (status, _ids(goal_ids), status)
+        )
+        changed = [(goal_id, employee_id) for goal_id, employee_id, old_status in changed if old_status != status]
+        if changed:
+            _changed("goals", [goal_id for goal_id, _ in changed], [employee_id for _, employee_id in changed])
+            if status == "Completed":
+                _changed("feedback", [goal_id for goal_id, _ in changed], [employee_id for _, employee_id in changed])
+        return len(changed)
+
+def delete_goal(goal_id):
+    """Allows a manager to delete a goal."""
+    with _connection(write=True) as conn:
+        row = conn.execute("SELECT employee_id FROM goals WHERE id = ?", (goal_id,)).fetchone()
+        if row:
+            conn.execute("DELETE FROM goals WHERE id = ?", (goal_id,))
+            for table in ("goals", "tasks", "feedback"):
+                _changed(table, [goal_id], [row[0]])
+
+# --- CRUD Operations for Tasks ---
+def _goal_owner(conn, goal_id):
+    row = conn.execute("SELECT employee_id FROM goals WHERE id = ?", (goal_id,)).fetchone()
+    return [row[0]] if row else []
+
+def create_task(goal_id, description):
+    """Allows an employee to log a task for a goal."""
+    with _connection(write=True) as conn:
+        conn.execute("INSERT INTO tasks (goal_id, description) VALUES (?, ?)", (goal_id, description))
+        _changed("tasks", [goal_id], _goal_owner(conn, goal_id))
+
+def get_tasks_for_goal(goal_id):
+    """Retrieves all tasks for a specific goal."""
+    with _connection() as conn:
+        return conn.execute("SELECT id, description, is_approved FROM tasks WHERE goal_id = ? ORDER BY id", (goal_id,)).fetchall()
+
+def approve_task(task_id):
+    """Allows a manager to approve a task."""
+    approve_tasks([task_id])
+
+def approve_tasks(task_ids):
+    """Approves several tasks in one statement; returns how many were newly approved."""
+    task_ids = list(task_ids)
+    if not task_ids:
+        return 0
+    with _connection(write=True) as conn:
+        changed = conn.execute(
+            """SELECT t.goal_id, g.employee_id FROM tasks t LEFT JOIN goals g ON g.id = t.goal_id
+               WHERE t.id IN (SELECT value FROM json_each(?)) AND NOT t.is_approved""",
+            (_ids(task_ids),)
+        ).fetchall()
+        conn.execute(
+            "UPDATE tasks SET is_approved = TRUE WHERE id IN (SELECT value FROM json_each(?)) AND NOT is_approved",
+            (_ids(task_ids),)
+        )
+        if changed:
+            _changed("tasks", [goal_id for goal_id, _ in changed], [employee_id for _, employee_id in changed])
+        return len(changed)
+
+def delete_task(task_id):
+    """Allows a manager or employee to delete a task."""
+    with _connection(write=True) as conn:
+        row = conn.execute("SELECT goal_id FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        if row:
+            conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+            _changed("tasks", [row[0]], _goal_owner(conn, row[0]))
+
+# --- CRUD Operations for Feedback ---
+def create_feedback(goal_id, manager_id, feedback_text):
+    """Allows a manager to provide written feedback on a goal."""
+    with _connection(write=True) as conn:
+        conn.execute(
+            "INSERT INTO feedback (goal_id, manager_id, feedback_text) VALUES (?, ?, ?)",
+            (goal_id, manager_id, feedback_text)
+        )
+        _changed("feedback", [goal_id], _goal_owner(conn, goal_id))
+
+def get_feedback_for_goal(goal_id):
+    """Retrieves all feedback for a specific goal."""
+    with _connection() as conn:
+        return conn.execute(
+            "SELECT f.feedback_text, e.name, f.created_at FROM feedback f JOIN employees e ON f.manager_id = e.id WHERE f.goal_id = ? ORDER BY f.created_at DESC",
+            (goal_id,)
+        ).fetchall()
+
+# --- Batched Loaders ---
+# These share Backend_pms's per-goal cache, so a warm reload only queries the
+# goals it misses. Writes from this process invalidate it on commit; writes from
+# another process sharing the file show up once the entries expire (PMS_CACHE_TTL).
+def _load_many(entity, goal_ids, query):
+    def load(missing):
+        with _connection() as conn:
+            return be._group_by_goal(missing, conn.execute(query, (_ids(missing),)).fetchall())
+    return be._load_many(entity, goal_ids, load, getattr(_local, "changes", None) is not None)
+
+def get_tasks_for_goals(goal_ids):
+    """Retrieves the tasks for a list of goals, as a dict of goal id to get_tasks_for_goal() rows."""
+    return _load_many(
+        "tasks", goal_ids,
+        "SELECT goal_id, id, description, is_approved FROM tasks WHERE goal_id IN (SELECT value FROM json_each(?)) ORDER BY goal_id, id"
+    )
+
+def get_feedback_for_goals(goal_ids):
+    """Retrieves the feedback for a list of goals, as a dict of goal id to get_feedback_for_goal() rows."""
+    return _load_many(
+        "feedback", goal_ids,
+        """SELECT f.goal_id, f.feedback_text, e.name, f.created_at FROM feedback f JOIN employees e ON f.manager_id = e.id
+           WHERE f.goal_id IN (SELECT value FROM json_each(?)) ORDER BY f.goal_id, f.created_at DESC"""
+    )
+
+# --- Paginated Listings ---
+_GOAL_COUNTS = """
+    (SELECT COUNT(*) FROM tasks t WHERE t.goal_id = g.id),
+    (SELECT COUNT(*) FROM tasks t WHERE t.goal_id = g.id AND t.is_approved),
+    (SELECT COUNT(*) FROM feedback f WHERE f.goal_id = g.id)
+"""
+
+def _goal_page(columns, employee_id, page_size, after):
+    with _connection() as conn:
+        if after is None:
+            rows = conn.execute(
+                f"SELECT {columns} FROM goals g WHERE g.employee_id = ? ORDER BY g.due_date DESC, g.id DESC LIMIT ?",
+                (employee_id, page_size + 1)
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                f"SELECT {columns} FROM goals g WHERE g.employee_id = ? AND (g.due_date, g.id) < (?, ?) ORDER BY g.due_date DESC, g.id DESC LIMIT ?",
+                (employee_id, after[0], after[1], page_size + 1)
+            ).fetchall()
+    return be._split_page(rows, page_size, lambda goal: (goal[2], goal[0]))
+
+def get_goals_for_employee_page(employee_id, page_size=20, after=None):
+    """Retrieves one page of an employee's goals, newest due date first, as (goals, next_cursor)."""
+    return _goal_page("g.id, g.description, g.due_date, g.status", employee_id, page_size, after)
+
+def get_goal_summaries_page(employee_id, page_size=20, after=None):
+    """Like get_goals_for_employee_page(), with task and feedback counts, in one query."""
+    return _goal_page("g.id, g.description, g.due_date, g.status, " + _GOAL_COUNTS, employee_id, page_size, after)
+
+def get_goal_summaries(goal_ids):
+    """Task and feedback counts for several goals, as a dict of goal id to (tasks, approved, feedback)."""
+    summaries = {goal_id: (0, 0, 0) for goal_id in goal_ids}
+    if not summaries:
+        return summaries
+    with _connection() as conn:
+        rows = conn.execute(
+            "SELECT g.id, " + _GOAL_COUNTS + " FROM (SELECT value AS id FROM json_each(?)) g",
+            (_ids(summaries),)
+        ).fetchall()
+    for goal_id, task_count, approved_count, feedback_count in rows:
+        summaries[goal_id] = (task_count, approved_count, feedback_count)
+    return summaries
+
+def get_feedback_for_goal_page(goal_id, page_size=20, after=None):
+    """Retrieves one page of a goal's feedback, newest first, as (feedback, next_cursor)."""
+    with _connection() as conn:
+        if after is None:
+            rows = conn.execute(
+                "SELECT f.feedback_text, e.name, f.created_at, f.id FROM feedback f JOIN employees e ON f.manager_id = e.id WHERE f.goal_id = ? ORDER BY f.created_at DESC, f.id DESC LIMIT ?",
+                (goal_id, page_size + 1)
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT f.feedback_text, e.name, f.created_at, f.id FROM feedback f JOIN employees e ON f.manager_id = e.id WHERE f.goal_id = ? AND (f.created_at, f.id) < (?, ?) ORDER BY f.created_at DESC, f.id DESC LIMIT ?",
+                (goal_id, after[0], after[1], page_size + 1)
+            ).fetchall()
+    rows, next_cursor = be._split_page(rows, page_size, lambda fb: (fb[2], fb[3]))
+    return [fb[:3] for fb in rows], next_cursor
+
+# Like Backend_pms, the generators read keyset pages so no transaction stays open across a yield.
+def iter_goals_for_employee(employee_id, batch_size=1000):
+    """Streams an employee's goals, batch_size rows at a time."""
+    after = None
+    while True:
+        goals, after = get_goals_for_employee_page(employee_id, batch_size, after)
+        yield from goals
+        if after is None:
+            return
+
+def iter_feedback_for_goal(goal_id, batch_size=1000):
+    """Streams a goal's feedback, batch_size rows at a time."""
+    after = None
+    while True:
+        feedback, after = get_feedback_for_goal_page(goal_id, batch_size, after)
+        yield from feedback
+        if after is None:
+            return
+
+# --- Search ---
+_SEARCH_SCOPES = {
+    "all": "1",
+    "employee": "g.employee_id = :scope",
+    "manager": "g.employee_id IN (SELECT id FROM scope_tree)",
+}
+
+def _snippet(body, terms, width=160):
+    """Up to width characters around the first match, with matches wrapped in **."""
+    start = min((body.lower().find(term) for term in terms if term in body.lower()), default=0)
+    start = max(0, start - width // 4)
+    text = ("..." if start else "") + body[start:start + width] + ("..." if len(body) > start + width else "")
+    return re.sub("(" + "|".join(re.escape(term) for term in terms) + ")", r"**\1**", text, flags=re.IGNORECASE)
+
+def search(query, employee_id=None, manager_id=None, page_size=20, after=None):
+    """Ranked search over goal descriptions, tasks and feedback; see Backend_pms.search().
+
+    Every word of the query must appear; rank grows with the number of matches
+    and falls with the length of the text.
+    """
+    terms = list(dict.fromkeys(word.lower() for word in re.findall(r"\w+", query or "")))
+    if not terms:
+        return [], None
+    if employee_id is not None:
+        scope, scope_id = "employee", employee_id
+    elif manager_id is not None:
+        scope, scope_id = "manager", manager_id
+    else:
+        scope, scope_id = "all", None
+    params = {"scope": scope_id, "limit": page_size + 1}
+    params.update({f"t{n}": term for n, term in enumerate(terms)})
+
+    def matches(column):
+        return " AND ".join(f"instr(lower({column}), :t{n}) > 0" for n in range(len(terms)))
+
+    occurrences = " + ".join(
+        f"(length(lower(body)) - length(replace(lower(body), :t{n}, ''))) / length(:t{n})" for n in range(len(terms))
+    )
+    after_clause = ""
+    if after is not None:
+        after_clause = "WHERE (r.rank, r.kind, r.id) < (:rank, :kind, :id)"
+        params.update(rank=after[0], kind=after[1], id=after[2])
+    sql = f"""
+        WITH RECURSIVE scope_tree(id) AS (
+            SELECT :scope
+            UNION ALL
+            SELECT e.id FROM employees e JOIN scope_tree s ON e.manager_id = s.id
+        ),
+        hits(kind, id, goal_id, employee_id, body) AS (
+            SELECT 'goal', g.id, g.id, g.employee_id, g.description
+            FROM goals g WHERE {matches('g.description')} AND {_SEARCH_SCOPES[scope]}
+            UNION ALL
+            SELECT 'task', t.id, t.goal_id, g.employee_id, t.description
+            FROM tasks t JOIN goals g ON g.id = t.goal_id WHERE {matches('t.description')} AND {_SEARCH_SCOPES[scope]}
+            UNION ALL
+            SELECT 'feedback', f.id, f.goal_id, g.employee_id, f.feedback_text
+            FROM feedback f JOIN goals g ON g.id = f.goal_id WHERE {matches('f.feedback_text')} AND {_SEARCH_SCOPES[scope]}
+        ),
+        ranked AS (
+            SELECT *, ({occurrences}) / (1.0 + length(body) / 100.0) AS rank FROM hits
+        )
+        SELECT r.kind, r.id, r.goal_id, r.employee_id, e.name, r.body, r.rank
+        FROM ranked r JOIN employees e ON e.id = r.employee_id
+        {after_clause}
+        ORDER BY r.rank DESC, r.kind DESC, r.id DESC
+        LIMIT :limit
+    """
+    with _connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    rows = [row[:5] + (_snippet(row[5], terms), row[6]) for row in rows]
+    return be._split_page(rows, page_size, lambda hit: (hit[6], hit[0], hit[1]))
+
+# --- Business Insights ---
+# Computed from the goals table on each call; rebuild_insights() has nothing to do.
+_COMPLETED_PER_EMPLOYEE = f"""
+    SELECT e.id, e.name, COALESCE(c.completed, 0) AS completed
+    FROM employees e
+    LEFT JOIN (SELECT employee_id, SUM(status = 'Completed') AS completed FROM {_ALL_GOALS} GROUP BY employee_id) c
+      ON c.employee_id = e.id
+"""
+
+def _percentile_cont(ordered, fraction):
+    """PostgreSQL's percentile_cont over an already sorted list."""
+    position = fraction * (len(ordered) - 1)
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return float(ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower))
+
+def get_performance_insights(top_n=5):
+    """Gathers the dashboard metrics; same dict as Backend_pms.get_performance_insights()."""
+    with _connection() as conn:
+        totals = conn.execute(
+            f"""SELECT COUNT(*),
+                      COALESCE(SUM(status = 'Draft'), 0), COALESCE(SUM(status = 'In Progress'), 0),
+                      COALESCE(SUM(status = 'Completed'), 0), COALESCE(SUM(status = 'Cancelled'), 0)
+               FROM {_ALL_GOALS}"""
+        ).fetchone()
+        avg_goals = conn.execute(
+            f"SELECT AVG(total) FROM (SELECT COUNT(*) AS total FROM {_ALL_GOALS} WHERE employee_id IS NOT NULL GROUP BY employee_id)"
+        ).fetchone()[0]
+        completed = [row[0] for row in conn.execute(f"SELECT completed FROM ({_COMPLETED_PER_EMPLOYEE}) ORDER BY completed")]
+        top = conn.execute(
+            f"SELECT id, name, completed FROM ({_COMPLETED_PER_EMPLOYEE}) WHERE completed > 0 ORDER BY completed DESC, id LIMIT ?",
+            (top_n,)
+        ).fetchall()
+        lowest = conn.execute(
+            f"SELECT id, name, completed FROM ({_COMPLETED_PER_EMPLOYEE}) ORDER BY completed, id LIMIT ?",
+            (top_n,)
+        ).fetchall()
+    percentiles = [_percentile_cont(completed, p / 100) for p in be._PERCENTILES] if completed else None
+    return be._insights_from_row((*totals, avg_goals, percentiles, top, lowest))
+
+def get_employee_percentile(employee_id):
+    """Returns the percentage of employees who have completed fewer goals than this one."""
+    with _connection() as conn:
+        row = conn.execute(
+            f"""WITH c AS ({_COMPLETED_PER_EMPLOYEE})
+                SELECT 100.0 * (SELECT COUNT(*) FROM c o WHERE o.completed < s.completed) / (SELECT COUNT(*) FROM c)
+                FROM c s WHERE s.id = ?""",
+            (employee_id,)
+        ).fetchone()
+    return float(row[0]) if row else None
+
+def rebuild_insights():
+    """Nothing is precomputed for SQLite; kept for the shared interface."""
+
+# --- Trends ---
+# Counted from the base tables on each call, so they are always current and
+# refresh_trends() / rebuild_trends() have nothing to do.
+_PERIOD_START = {"week": "date({}, 'weekday 0', '-6 days')", "month": "date({}, 'start of month')"}
+
+def _period_starts(period, periods):
+    """The first day of each of the last `periods` weeks (Mondays) or months, oldest first."""
+    if period not in _PERIOD_START:
+        raise ValueError(f"period must be one of {', '.join(_PERIOD_START)}")
+    today = date.today()
+    if period == "week":
+        current = today - timedelta(days=today.weekday())
+        return [current - timedelta(weeks=n) for n in reversed(range(periods))]
+    starts = []
+    for n in reversed(range(periods)):
+        month = today.month - 1 - n
+        starts.append(date(today.year + month // 12, month % 12 + 1, 1))
+    return starts
+
+def refresh_trends():
+    """Trends are always current for SQLite; returns True like a successful refresh."""
+    return True
+
+def rebuild_trends():
+    """Nothing to rebuild for SQLite; kept for the shared interface."""
+
+def get_goal_trends(period="week", periods=12):
+    """Goals created, completed and overdue in each of the last `periods` weeks or months.
+
+    Returns (period_start, created, completed, overdue) rows, oldest first, with
+    zeros for quiet periods.
+    """
+    starts = _period_starts(period, periods)
+    start_of = _PERIOD_START[period]
+    with _connection() as conn:
+        rows = conn.execute(
+            f"""SELECT period_start, SUM(created), SUM(completed), SUM(overdue) FROM (
+                    SELECT {start_of.format('created_at')} AS period_start, 1 AS created, 0 AS completed, 0 AS overdue
+                    FROM {_ALL_GOALS} WHERE created_at >= :since
+                    UNION ALL
+                    SELECT {start_of.format('completed_at')}, 0, 1, 0
+                    FROM {_ALL_GOALS} WHERE completed_at >= :since
+                    UNION ALL
+                    SELECT {start_of.format('due_date')}, 0, 0, 1
+                    FROM {_ALL_GOALS}
+                    WHERE due_date >= :since AND due_date < date('now', 'localtime')
+                      AND status <> 'Cancelled' AND (completed_at IS NULL OR date(completed_at) > due_date)
+                ) GROUP BY period_start""",
+            {"since": starts[0]}
+        ).fetchall()
+    counts = {date.fromisoformat(start): (created, completed, overdue) for start, created, completed, overdue in rows}
+    return [(start, *counts.get(start, (0, 0, 0))) for start in starts]
+
+def get_feedback_trends(manager_id, period="week", periods=12):
+    """Feedback written per week or month by each manager in manager_id's reporting line.
+
+    Returns (period_start, manager_id, manager_name, feedback_count) rows, oldest
+    first; periods without feedback are left out.
+    """
+    starts = _period_starts(period, periods)
+    with _connection() as conn:
+        rows = conn.execute(
+            _SUBTREE + f"""SELECT {_PERIOD_START[period].format('f.created_at')} AS period_start, f.manager_id, e.name, COUNT(*)
+                FROM (SELECT manager_id, created_at FROM feedback
+                      UNION ALL SELECT manager_id, created_at FROM feedback_archive) f
+                JOIN tree t ON t.id = f.manager_id
+                JOIN employees e ON e.id = f.manager_id
+                WHERE f.created_at >= ?
+                GROUP BY period_start, f.manager_id, e.name
+                ORDER BY period_start, e.name, f.manager_id""",
+            (manager_id, starts[0])
+        ).fetchall()
+    return [(date.fromisoformat(start), mid, name, count) for start, mid, name, count in rows]
+
+# --- Archival ---
+def archive_closed_goals(before=None, batch_size=1000):
+    """Moves Completed and Cancelled goals due before `before` (default Backend_pms.archive_cutoff()) to the archive.
+
+    Tasks and feedback go with their goals. Each batch of batch_size goals is
+    committed on its own. Returns how many goals were moved.
+    """
+    before = before or be.archive_cutoff()
+    total = 0
+    while True:
+        with _connection(write=True) as conn:
+            moved = conn.execute(
+                """SELECT id, employee_id FROM goals
+                   WHERE due_date < ? AND status IN ('Completed', 'Cancelled')
+                   ORDER BY due_date, id LIMIT ?""",
+                (before, batch_size)
+            ).fetchall()
+            if moved:
+                goal_ids = _ids(goal_id for goal_id, _ in moved)
+                conn.execute(
+                    """INSERT INTO goals_archive (id, employee_id, description, due_date, status, created_at, completed_at)
+                       SELECT id, employee_id, description, due_date, status, created_at, completed_at
+                       FROM goals WHERE id IN (SELECT value FROM json_each(?))""",
+                    (goal_ids,)
+                )
+                conn.execute(
+                    """INSERT INTO tasks_archive (id, goal_id, description, is_approved)
+                       SELECT id, goal_id, description, is_approved FROM tasks WHERE goal_id IN (SELECT value FROM json_each(?))""",
+                    (goal_ids,)
+                )
+                conn.execute(
+                    """INSERT INTO feedback_archive (id, goal_id, manager_id, feedback_text, created_at)
+                       SELECT id, goal_id, manager_id, feedback_text, created_at FROM feedback WHERE goal_id IN (SELECT value FROM json_each(?))""",
+                    (goal_ids,)
+                )
+                conn.execute("DELETE FROM goals WHERE id IN (SELECT value FROM json_each(?))", (goal_ids,))
+                for table in ("goals", "tasks", "feedback"):
+                    _changed(table, [goal_id for goal_id, _ in moved], [employee_id for _, employee_id in moved])
+        total += len(moved)
+        if len(moved) < batch_size:
+            return total
+
+def get_archived_history(employee_id):
+    """Retrieves an employee's archived goals with their tasks and feedback, newest due date first."""
+    with _connection() as conn:
+        goals = conn.execute(
+            "SELECT id, description, due_date, status FROM goals_archive WHERE employee_id = ? ORDER BY due_date DESC, id DESC",
+            (employee_id,)
+        ).fetchall()
+        goal_ids = [goal[0] for goal in goals]
+        tasks = be._group_by_goal(goal_ids, conn.execute(
+            "SELECT goal_id, id, description, is_approved FROM tasks_archive WHERE goal_id IN (SELECT value FROM json_each(?)) ORDER BY goal_id, id",
+            (_ids(goal_ids),)
+        ).fetchall())
+        feedback = be._group_by_goal(goal_ids, conn.execute(
+            """SELECT f.goal_id, f.feedback_text, e.name, f.created_at FROM feedback_archive f JOIN employees e ON f.manager_id = e.id
+               WHERE f.goal_id IN (SELECT value FROM json_each(?)) ORDER BY f.goal_id, f.created_at DESC""",
+            (_ids(goal_ids),)
+        ).fetchall())
+    return [(goal, tasks[goal[0]], feedback[goal[0]]) for goal in goals]
+
+# --- Initial Data Seeding ---
+def load_org(conn, scale=1.0, seed=25176, today=None):
+    """Like Synthetic_pms.load_org(), inserting the same rows on a SQLite connection."""
+    import Synthetic_pms
+    today = today or date.today()
+    employee_count = max(1, int(Synthetic_pms.EMPLOYEES_PER_SCALE * scale))
+    last_employee_id, root_manager_id = conn.execute("SELECT COALESCE(MAX(id), 0), MIN(id) FROM employees").fetchone()
+    last_goal_id = conn.execute(
+        "SELECT MAX((SELECT COALESCE(MAX(id), 0) FROM goals), (SELECT COALESCE(MAX(id), 0) FROM goals_archive))"
+    ).fetchone()[0]
+
+    employees = list(Synthetic_pms._employees(seed, employee_count, last_employee_id + 1, root_manager_id))
+    managers = {employee_id: manager_id for employee_id, _, manager_id in employees}
+    employee_ids = [employee[0] for employee in employees]
+
+    def goals():
+        return Synthetic_pms._goals(seed, employee_ids, last_goal_id + 1, today)
+
+    loads = [
+        ("employees", "id, name, manager_id", employees),
+        ("goals", "id, employee_id, description, due_date, status, created_at, completed_at", goals()),
+        ("tasks", "goal_id, description, is_approved", Synthetic_pms._tasks(seed, goals())),
+        ("feedback", "goal_id, manager_id, feedback_text, created_at", Synthetic_pms._feedback(seed, goals(), managers, today)),
+    ]
+    counts = {}
+    for table, columns, rows in loads:
+        before = conn.total_changes
+        placeholders = ", ".join("?" * len(columns.split(",")))
+        conn.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", rows)
+        counts[table] = conn.total_changes - before
+    conn.execute("ANALYZE")
+    return counts
+
+def seed_data(scale=None):
+    """Populates an empty database with the sample team; see Backend_pms.seed_data()."""
+    global _seeded
+    if scale is None:
+        scale = float(os.environ.get("PMS_SEED_SCALE", 0))
+    if _seeded:
+        return
+    with _setup_lock:
+        if _seeded:
+            return
+        with _connection(write=True) as conn:
+            if not conn.execute("SELECT EXISTS (SELECT 1 FROM employees)").fetchone()[0]:
+                alice_id = conn.execute("INSERT INTO employees (name) VALUES ('Alice Manager')").lastrowid
+                conn.execute("INSERT INTO employees (name, manager_id) VALUES ('Bob Smith', ?)", (alice_id,))
+                conn.execute("INSERT INTO employees (name, manager_id) VALUES ('Charlie Brown', ?)", (alice_id,))
+                if scale > 0:
+                    load_org(conn, scale)
+        _seeded = True
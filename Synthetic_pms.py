@@ -0,0 +1,156 @@
+"""Deterministic synthetic org generator for the PMS database.
+
+Scale 1 is about 1,000 employees, 10,000 goals, 100,000 tasks and 20,000 feedback
+entries; everything grows linearly, so scale 100 gives roughly 100k employees,
+1M goals and 10M tasks. The same seed always produces the same data. Rows are
+streamed into the tables with COPY, appended after any existing rows.
+
+    python Synthetic_pms.py --scale 10 --seed 7
+"""
+import argparse
+import random
+import sys
+from datetime import date, datetime, time, timedelta
+
+import Backend_pms as be
+from Bulk_pms import CopyStream
+
+EMPLOYEES_PER_SCALE = 1000
+FIRST_NAMES = [
+    "Alex", "Priya", "Sam", "Maria", "Wei", "Fatima", "John", "Aisha", "Carlos", "Yuki",
+    "Olivia", "Noah", "Emma", "Liam", "Sofia", "Arjun", "Chen", "Amara", "Lucas", "Mei",
+]
+LAST_NAMES = [
+    "Smith", "Patel", "Garcia", "Kim", "Nguyen", "Brown", "Singh", "Lopez", "Chen", "Okafor",
+    "Müller", "Rossi", "Tanaka", "Johnson", "Khan", "Silva", "Cohen", "Ivanova", "Dubois", "Ali",
+]
+GOAL_TOPICS = [
+    "Improve onboarding documentation", "Reduce customer response time", "Ship the reporting module",
+    "Grow enterprise pipeline", "Cut cloud infrastructure costs", "Raise test coverage",
+    "Mentor a new team member", "Complete security training", "Launch the mobile beta",
+    "Streamline the release process",
+]
+TASK_VERBS = ["Draft", "Review", "Implement", "Test", "Present", "Document", "Plan", "Measure"]
+FEEDBACK_LINES = [
+    "Solid progress, keep the momentum going.", "Let's discuss blockers in our next 1:1.",
+    "Great collaboration with the wider team.", "Please tighten the scope before the deadline.",
+    "Excellent attention to detail.", "Consider breaking this into smaller milestones.",
+]
+
+def _rng(seed, phase):
+    """Independent, reproducible random stream per generation phase."""
+    return random.Random(f"{seed}:{phase}")
+
+def _employees(seed, count, first_id, root_manager_id):
+    """Yields (id, name, manager_id) with a fan-out of roughly 4 to 12 reports per manager."""
+    rng = _rng(seed, "employees")
+    for n in range(count):
+        employee_id = first_id + n
+        if n == 0:
+            manager_id = root_manager_id
+        else:
+            # Managers are always earlier rows, so the tree is inserted top-down.
+            parent = max(0, (n - 1) // 8 + rng.randint(-2, 2))
+            manager_id = first_id + min(parent, n - 1)
+        yield employee_id, f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", manager_id
+
+def _goals(seed, employee_ids, first_id, today):
+    """Yields (id, employee_id, description, due_date, status, created_at, completed_at).
+
+    Past goals are mostly closed; a few completed goals finish after their due date.
+    """
+    rng = _rng(seed, "goals")
+    now = datetime.combine(today, time())
+    goal_id = first_id
+    for employee_id in employee_ids:
+        for _ in range(rng.randint(5, 15)):
+            due = today + timedelta(days=rng.randint(-730, 180))
+            if due < today:
+                status = rng.choices(["Completed", "Cancelled", "In Progress"], [70, 15, 15])[0]
+            else:
+                status = rng.choices(["Draft", "In Progress", "Completed"], [40, 50, 10])[0]
+            created_at = min(now, datetime.combine(due - timedelta(days=rng.randint(30, 180)), time(9)))
+            completed_at = None
+            if status == "Completed":
+                completed_at = min(now, created_at + (datetime.combine(due, time(17)) - created_at) * rng.uniform(0.3, 1.1))
+            yield goal_id, employee_id, f"{rng.choice(GOAL_TOPICS)} ({goal_id})", due, status, created_at, completed_at
+            goal_id += 1
+
+def _tasks(seed, goals):
+    """Yields (goal_id, description, is_approved); tasks of completed goals are mostly approved."""
+    rng = _rng(seed, "tasks")
+    for goal_id, _, description, _, status, *_ in goals:
+        approval_rate = 0.9 if status == "Completed" else 0.4
+        for step in range(rng.randint(5, 15)):
+            yield goal_id, f"{rng.choice(TASK_VERBS)} step {step + 1} of {description}", rng.random() < approval_rate
+
+def _feedback(seed, goals, managers, today):
+    """Yields (goal_id, manager_id, feedback_text, created_at) from each employee's manager."""
+    rng = _rng(seed, "feedback")
+    for goal_id, employee_id, _, due, *_ in goals:
+        manager_id = managers.get(employee_id)
+        if manager_id is None:
+            continue
+        for _ in range(rng.randint(0, 4)):
+            day = min(due, today) - timedelta(days=rng.randint(0, 90))
+            created_at = datetime.combine(day, time(rng.randint(8, 18), rng.randint(0, 59)))
+            yield goal_id, manager_id, rng.choice(FEEDBACK_LINES), created_at
+
+def load_org(conn, scale=1.0, seed=25176, today=None):
+    """Appends a synthetic org of the given scale on conn and returns the row count per table.
+
+    The new org's top manager reports to the lowest existing employee id, if any.
+    The caller commits, then calls Backend_pms.rebuild_trends() because the rows
+    are backdated.
+    """
+    today = today or date.today()
+    employee_count = max(1, int(EMPLOYEES_PER_SCALE * scale))
+    counts = {}
+    with conn.cursor() as cur:
+        # Ids are assigned here, so keep other writers out until the sequences are moved on.
+        cur.execute("LOCK TABLE employees, goals, tasks, feedback IN SHARE ROW EXCLUSIVE MODE")
+        cur.execute("SELECT COALESCE(MAX(id), 0), MIN(id) FROM employees")
+        last_employee_id, root_manager_id = cur.fetchone()
+        # Archived goals keep their ids, so new ones start above both tables.
+        cur.execute("SELECT GREATEST((SELECT MAX(id) FROM goals), (SELECT MAX(id) FROM goals_archive), 0)")
+        last_goal_id = cur.fetchone()[0]
+
+        employees = list(_employees(seed, employee_count, last_employee_id + 1, root_manager_id))
+        managers = {employee_id: manager_id for employee_id, _, manager_id in employees}
+        employee_ids = [employee[0] for employee in employees]
+
+        def goals():
+            return _goals(seed, employee_ids, last_goal_id + 1, today)
+
+        loads = [
+            ("employees", "id, name, manager_id", employees),
+            ("goals", "id, employee_id, description, due_date, status, created_at, completed_at", goals()),
+            ("tasks", "goal_id, description, is_approved", _tasks(seed, goals())),
+            ("feedback", "goal_id, manager_id, feedback_text, created_at", _feedback(seed, goals(), managers, today)),
+        ]
+        for table, columns, rows in loads:
+            stream = CopyStream(rows)
+            cur.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", stream)
+            counts[table] = stream.rows_read
+        for table in ("employees", "goals"):
+            cur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))")
+        for table in ("employees", "goals", "tasks", "feedback"):
+            cur.execute(f"ANALYZE {table}")
+    return counts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load a deterministic synthetic org into the PMS database.")
+    parser.add_argument("--scale", type=float, default=1.0, help="1 = about 1,000 employees")
+    parser.add_argument("--seed", type=int, default=25176)
+    args = parser.parse_args(argv)
+
+    be.setup_database()
+    with be.transaction() as conn:
+        counts = load_org(conn, args.scale, args.seed)
+    be.clear_cache()
+    be.rebuild_trends()
+    print("Loaded " + ", ".join(f"{count} {table}" for table, count in counts.items()))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
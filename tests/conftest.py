@@ -0,0 +1,105 @@
+"""Test setup for both storage engines.
+
+By default the tests run against the in-process SQLite engine on a :memory:
+database, so no server is needed. PMS_STORAGE=postgres runs them against the
+PostgreSQL database named by the DB_* variables instead; that database must be
+a scratch one with "test" in its name, as every test empties it. Tests marked
+postgres or sqlite only run on that engine, and postgres tests are skipped when
+the server cannot be reached.
+"""
+import os
+import sys
+
+os.environ.setdefault("PMS_STORAGE", "sqlite")
+if os.environ["PMS_STORAGE"] == "sqlite":
+    os.environ.setdefault("PMS_SQLITE_PATH", ":memory:")
+os.environ.setdefault("PMS_METRICS", "1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2
+import pytest
+
+import Backend_pms as be
+import Sqlite_pms
+
+_SQLITE_TABLES = ("feedback_archive", "tasks_archive", "goals_archive", "feedback", "tasks", "goals", "employees")
+_POSTGRES_TABLES = (
+    "employees, goals, tasks, feedback, goals_archive, tasks_archive, feedback_archive, "
+    "employee_goal_stats, employee_hierarchy, goal_trends, feedback_trends"
+)
+
+def _postgres_unavailable():
+    """Why the PostgreSQL tests cannot run, or None if they can."""
+    if be.STORAGE != "postgres":
+        return "needs PMS_STORAGE=postgres"
+    if "test" not in be._connection_params()["database"]:
+        return "DB_NAME must name a scratch database with 'test' in its name"
+    try:
+        psycopg2.connect(connect_timeout=2, **be._connection_params()).close()
+    except psycopg2.OperationalError as e:
+        return f"PostgreSQL is not reachable: {e}"
+    return None
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "postgres: runs only against PostgreSQL (PMS_STORAGE=postgres)")
+    config.addinivalue_line("markers", "sqlite: runs only against the SQLite engine")
+
+def pytest_collection_modifyitems(config, items):
+    unavailable = _postgres_unavailable() if be.STORAGE == "postgres" or any("postgres" in item.keywords for item in items) else None
+    for item in items:
+        if "sqlite" in item.keywords and be.STORAGE != "sqlite":
+            item.add_marker(pytest.mark.skip(reason="needs PMS_STORAGE=sqlite"))
+        elif unavailable and ("postgres" in item.keywords or be.STORAGE == "postgres"):
+            item.add_marker(pytest.mark.skip(reason=unavailable))
+
+def query(sql, params=()):
+    """Runs one statement (with ? placeholders) on the current engine and returns its rows."""
+    with be.transaction() as conn:
+        if be.STORAGE == "sqlite":
+            return conn.execute(sql, params).fetchall()
+        with conn.cursor() as cur:
+            cur.execute(sql.replace("?", "%s"), params)
+            return cur.fetchall() if cur.description else []
+
+def latest_id(table):
+    """Id of the most recently inserted row of table."""
+    return query(f"SELECT MAX(id) FROM {table}")[0][0]
+
+def new_goal(db, employee_id, description="Goal", due_date="2030-01-01"):
+    """Creates a goal and returns its id."""
+    db.create_goal(employee_id, description, due_date)
+    return latest_id("goals")
+
+@pytest.fixture
+def db():
+    """An empty database and an empty read cache."""
+    be.setup_database()
+    if be.STORAGE == "sqlite":
+        with Sqlite_pms.transaction() as conn:
+            for table in _SQLITE_TABLES:
+                conn.execute(f"DELETE FROM {table}")
+    else:
+        with be.transaction() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"TRUNCATE {_POSTGRES_TABLES} RESTART IDENTITY CASCADE")
+                # Yearly archive partitions are created on demand; start without any. They
+                # are detached first, as dropping them directly (CASCADE) would drop the
+                # composite foreign keys into goals_archive as well.
+                for parent in ("tasks_archive", "feedback_archive", "goals_archive"):
+                    cur.execute("SELECT inhrelid::regclass FROM pg_inherits WHERE inhparent = %s::regclass", (parent,))
+                    for (partition,) in cur.fetchall():
+                        cur.execute(f"ALTER TABLE {parent} DETACH PARTITION {partition}")
+                        cur.execute(f"DROP TABLE {partition}")
+                cur.execute("UPDATE trend_watermark SET processed_until = '-infinity'")
+    be.clear_cache()
+    return be
+
+@pytest.fixture
+def org(db):
+    """A three-level reporting line: director > manager > employee, as a dict of ids."""
+    db.create_employee("Director")
+    director = latest_id("employees")
+    db.create_employee("Manager", director)
+    manager = latest_id("employees")
+    db.create_employee("Employee", manager)
+    return {"director": director, "manager": manager, "employee": latest_id("employees")}
@@ -0,0 +1,118 @@
+"""Archiving closed review cycles moves goals out of the live tables without changing any totals."""
+import csv
+import io
+import threading
+from datetime import date, timedelta
+
+import psycopg2
+import pytest
+
+import Backend_pms as be
+import Bulk_pms
+from conftest import latest_id, new_goal, query
+
+@pytest.fixture
+def old_goals(db, org, monkeypatch):
+    """Four closed goals due in the past, each with a task and feedback, plus two goals that stay live."""
+    # Let the trend rollups count rows as soon as they are written.
+    monkeypatch.setenv("PMS_TREND_SETTLE_SECONDS", "0")
+    today = date.today()
+    ids = []
+    for n in range(4):
+        goal_id = new_goal(db, org["employee"], f"Old goal {n}", (today - timedelta(days=10 + n)).isoformat())
+        db.create_task(goal_id, "Task")
+        db.create_feedback(goal_id, org["manager"], "Feedback")
+        db.update_goal_status(goal_id, "Completed" if n % 2 else "Cancelled")
+        ids.append(goal_id)
+    new_goal(db, org["employee"], "Current goal", (today + timedelta(days=30)).isoformat())
+    new_goal(db, org["manager"], "Manager goal", (today - timedelta(days=10)).isoformat())
+    return ids
+
+def test_archiving_keeps_insights_and_trends(db, org, old_goals):
+    def snapshot():
+        return (
+            db.get_performance_insights(),
+            db.get_employee_percentile(org["employee"]),
+            db.get_goal_trends("week", 4),
+            db.get_goal_trends("month", 2),
+            db.get_feedback_trends(org["director"], "week", 4),
+        )
+
+    db.refresh_trends()
+    before = snapshot()
+    today = date.today()
+    assert db.archive_closed_goals(before=today, batch_size=3) == 4
+    db.clear_cache()
+    assert snapshot() == before
+    assert [goal[1] for goal in db.get_goals_for_employee(org["employee"])] == ["Current goal"]
+    history = db.get_archived_history(org["employee"])
+    assert [goal[1] for goal, _, _ in history] == [f"Old goal {n}" for n in range(4)]
+    assert all(len(tasks) == 1 and len(feedback) == 1 + (goal[3] == "Completed") for goal, tasks, feedback in history)
+    assert db.archive_closed_goals(before=today) == 0
+
+# --- PostgreSQL partitions and locking ---
+def _partitions():
+    return sorted(row[0] for row in query("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent IN ('goals_archive'::regclass, 'tasks_archive'::regclass, 'feedback_archive'::regclass)
+    """))
+
+@pytest.mark.postgres
+def test_yearly_partitions_are_created_on_demand(db, org, monkeypatch):
+    monkeypatch.setenv("PMS_TREND_SETTLE_SECONDS", "0")
+    for due_date in ("2021-06-30", "2022-01-15", "2022-12-31"):
+        goal_id = new_goal(db, org["employee"], f"Due {due_date}", due_date)
+        db.create_task(goal_id, "Task")
+        db.update_goal_status(goal_id, "Completed")
+    assert _partitions() == []
+    assert db.archive_closed_goals(before=date(2022, 1, 1)) == 1
+    assert _partitions() == ["feedback_archive_2021", "goals_archive_2021", "tasks_archive_2021"]
+    assert db.archive_closed_goals(before=date(2023, 1, 1)) == 2
+    assert len(_partitions()) == 6
+    # Each row landed in the partition of its goal's due year, tied to its goal by the composite key.
+    assert query("SELECT COUNT(*) FROM goals_archive_2022") == [(2,)]
+    assert query("SELECT COUNT(*) FROM tasks_archive_2022 t JOIN goals_archive g ON (g.id, g.due_date) = (t.goal_id, t.goal_due_date)") == [(2,)]
+    with pytest.raises(psycopg2.IntegrityError):
+        query("INSERT INTO tasks_archive (id, goal_id, goal_due_date, description) VALUES (-1, ?, '2022-01-16', 'Orphan')",
+              (latest_id("goals_archive"),))
+
+@pytest.mark.postgres
+def test_archiving_leaves_goal_stats_alone(db, org, old_goals):
+    stats = query("SELECT * FROM employee_goal_stats ORDER BY employee_id")
+    db.archive_closed_goals(before=date.today())
+    assert query("SELECT * FROM employee_goal_stats ORDER BY employee_id") == stats
+    # Outside archiving, deleting a goal still takes it out of the stats.
+    db.delete_goal(new_goal(db, org["employee"]))
+    assert query("SELECT * FROM employee_goal_stats ORDER BY employee_id") == stats
+
+@pytest.mark.postgres
+def test_goals_locked_elsewhere_are_skipped(db, org, old_goals):
+    locked = threading.Event()
+    release = threading.Event()
+
+    def hold_lock():
+        with be.transaction() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1 FROM goals WHERE id = %s FOR UPDATE", (old_goals[0],))
+            locked.set()
+            release.wait(10)
+
+    holder = threading.Thread(target=hold_lock)
+    holder.start()
+    try:
+        assert locked.wait(10)
+        assert db.archive_closed_goals(before=date.today()) == 3
+    finally:
+        release.set()
+        holder.join()
+    assert db.archive_closed_goals(before=date.today()) == 1
+
+@pytest.mark.postgres
+@pytest.mark.parametrize("include_archived", [False, True])
+def test_export_includes_archived_goals_on_request(db, org, old_goals, include_archived):
+    db.archive_closed_goals(before=date.today())
+    out = io.StringIO()
+    Bulk_pms.export_history(out, "csv", [org["employee"]], include_archived)
+    out.seek(0)
+    goals = [row["goal_description"] for row in csv.DictReader(out) if row["record_type"] == "goal"]
+    assert goals == ["Old goal 0", "Old goal 1", "Old goal 2", "Old goal 3", "Current goal"][0 if include_archived else 4:]
@@ -0,0 +1,47 @@
+"""Async_pms returns what the blocking Backend_pms calls return, on psycopg 3."""
+import asyncio
+
+import pytest
+
+import Async_pms as abe
+from conftest import latest_id
+
+pytestmark = [
+    pytest.mark.postgres,
+    pytest.mark.skipif(abe.psycopg is None, reason='needs psycopg 3: pip install "psycopg[binary,pool]"'),
+]
+
+def _run(coro):
+    async def main():
+        try:
+            return await coro
+        finally:
+            await abe.close_pool()
+    return asyncio.run(main())
+
+def test_crud_matches_the_blocking_calls(db, org):
+    async def scenario():
+        await abe.create_goal(org["employee"], "Async goal", "2030-01-01")
+        goal_id = latest_id("goals")
+        await abe.create_task(goal_id, "Async task")
+        await abe.approve_task(latest_id("tasks"))
+        await abe.create_feedback(goal_id, org["manager"], "Async feedback")
+        await abe.update_goal_status(goal_id, "Completed")
+        return goal_id, await abe.get_employees(), await abe.get_performance_history(org["employee"])
+
+    goal_id, employees, history = _run(scenario())
+    db.clear_cache()
+    assert employees == db.get_employees()
+    assert history == db.get_performance_history(org["employee"])
+    assert len(history[0][2]) == 2
+    _run(abe.delete_goal(goal_id))
+    assert db.get_goals_for_employee(org["employee"]) == []
+
+def test_employee_insights_query_all_percentiles_at_once(db, org):
+    db.create_goal(org["employee"], "Goal", "2030-01-01")
+    db.update_goal_status(latest_id("goals"), "Completed")
+    ids = [org["director"], org["manager"], org["employee"], -1]
+    insights, percentiles = _run(abe.get_employee_insights(ids))
+    assert insights == db.get_performance_insights()
+    assert percentiles == {employee_id: db.get_employee_percentile(employee_id) for employee_id in ids}
+    assert _run(abe.get_employee_percentiles([])) == {}
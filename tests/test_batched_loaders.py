@@ -0,0 +1,112 @@
+"""The batched loaders cost a fixed number of statements, however many goals they load."""
+import pytest
+
+import Backend_pms as be
+import Metrics_pms as metrics
+from conftest import latest_id
+
+LOADERS = [be.get_tasks_for_goals, be.get_feedback_for_goals]
+
+def _traced(func, *args):
+    """Calls func and returns (result, statements, rows) for the call."""
+    metrics.start_trace()
+    try:
+        result = func(*args)
+    finally:
+        calls = [call for call in metrics.stop_trace() if call.depth == 0]
+    return result, sum(call.statements for call in calls), sum(call.rows for call in calls)
+
+@pytest.fixture
+def goal_ids(db):
+    """Twenty goals, each with two tasks and two pieces of feedback."""
+    db.create_employee("Manager")
+    manager_id = latest_id("employees")
+    db.create_employee("Employee", manager_id)
+    employee_id = latest_id("employees")
+    ids = []
+    for n in range(20):
+        db.create_goal(employee_id, f"Goal {n}", "2030-01-01")
+        goal_id = latest_id("goals")
+        for k in range(2):
+            db.create_task(goal_id, f"Task {k}")
+            db.create_feedback(goal_id, manager_id, f"Feedback {k}")
+        ids.append(goal_id)
+    db.clear_cache()
+    return ids
+
+@pytest.mark.parametrize("loader", LOADERS)
+def test_statements_do_not_grow_with_goals(goal_ids, loader):
+    one, single, _ = _traced(loader, goal_ids[:1])
+    be.clear_cache()
+    many, batched, _ = _traced(loader, goal_ids)
+    assert single == batched == 1
+    assert len(one[goal_ids[0]]) == 2
+    assert sorted(many) == sorted(goal_ids)
+    assert all(len(rows) == 2 for rows in many.values())
+
+@pytest.mark.parametrize("loader", LOADERS)
+def test_warm_reload_queries_only_misses(goal_ids, loader):
+    cold, statements, rows = _traced(loader, goal_ids[:10])
+    assert (statements, rows) == (1, 20)
+
+    warm, statements, rows = _traced(loader, goal_ids[:10])
+    assert (statements, rows) == (0, 0)
+    assert warm == cold
+
+    mixed, statements, rows = _traced(loader, goal_ids)
+    assert (statements, rows) == (1, 20)
+    assert all(len(mixed[goal_id]) == 2 for goal_id in goal_ids)
+
+@pytest.mark.parametrize("loader", LOADERS)
+def test_writes_invalidate_only_their_goal(goal_ids, loader):
+    manager_id = latest_id("employees") - 1
+    loader(goal_ids)
+    be.create_task(goal_ids[3], "Task 2")
+    be.create_feedback(goal_ids[3], manager_id, "Feedback 2")
+    reloaded, statements, rows = _traced(loader, goal_ids)
+    assert (statements, rows) == (1, 3)
+    assert len(reloaded[goal_ids[3]]) == 3
+
+def _employee_with_goals(db, manager_id, name, count):
+    db.create_employee(name, manager_id)
+    employee_id = latest_id("employees")
+    for n in range(count):
+        db.create_goal(employee_id, f"{name} goal {n}", f"2030-01-{n + 1:02d}")
+        goal_id = latest_id("goals")
+        db.create_task(goal_id, "Task")
+        db.create_feedback(goal_id, manager_id, "Feedback")
+    return employee_id
+
+@pytest.mark.parametrize("include_archived", [False, True])
+def test_history_statements_do_not_grow_with_goals(db, include_archived):
+    db.create_employee("Manager")
+    manager_id = latest_id("employees")
+    one = _employee_with_goals(db, manager_id, "One", 1)
+    many = _employee_with_goals(db, manager_id, "Many", 20)
+    db.clear_cache()
+    history, single, _ = _traced(be.get_performance_history, one, include_archived)
+    db.clear_cache()
+    histories, batched, _ = _traced(be.get_performance_history, many, include_archived)
+    assert single == batched == (6 if include_archived else 3)
+    assert len(history) == 1 and len(histories) == 20
+    assert all(len(tasks) == 1 and len(feedback) == 1 for _, tasks, feedback in histories)
+
+def test_history_page_statements_do_not_grow_with_page_size(db):
+    db.create_employee("Manager")
+    employee_id = _employee_with_goals(db, latest_id("employees"), "Employee", 20)
+    db.clear_cache()
+    (page, _), small, _ = _traced(be.get_performance_history_page, employee_id, 1)
+    db.clear_cache()
+    (pages, after), large, _ = _traced(be.get_performance_history_page, employee_id, 20)
+    assert small == large == 3
+    assert (len(page), len(pages), after) == (1, 20, None)
+
+@pytest.mark.postgres
+def test_postgres_loaders_fetch_every_goal_with_one_any_query(goal_ids):
+    for loader, sql in ((be.get_tasks_for_goals, be._TASKS_FOR_GOALS_SQL), (be.get_feedback_for_goals, be._FEEDBACK_FOR_GOALS_SQL)):
+        metrics.start_trace()
+        try:
+            loader(goal_ids)
+        finally:
+            calls = metrics.stop_trace()
+        assert [call.sql for call in calls] == [[sql]]
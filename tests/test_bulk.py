@@ -0,0 +1,91 @@
+"""Bulk import validates every value it casts, and export lists each goal before its tasks and feedback."""
+import csv
+import io
+
+import pytest
+
+import Backend_pms as be
+import Bulk_pms
+from conftest import query
+
+pytestmark = pytest.mark.postgres
+
+EMPLOYEES = [{"ref": "m", "name": "Manager"}, {"ref": "e", "name": "Employee", "manager_ref": "m"}]
+
+def _errors(**batch):
+    with pytest.raises(Bulk_pms.BulkImportError) as raised:
+        Bulk_pms.import_batch(**batch)
+    return raised.value.errors
+
+def test_batch_with_references_is_imported(db):
+    counts = Bulk_pms.import_batch(
+        employees=EMPLOYEES,
+        goals=[{"ref": "g", "employee_ref": "e", "description": "Goal", "due_date": "2030-01-31", "status": "In Progress"}],
+        tasks=[{"goal_ref": "g", "description": "Task", "is_approved": "yes"}],
+        feedback=[{"goal_ref": "g", "manager_ref": "m", "feedback_text": "Feedback", "created_at": "2029-12-01 09:30"}],
+    )
+    assert counts == {"employees": 2, "goals": 1, "tasks": 1, "feedback": 1}
+    assert query("SELECT e.name, m.name FROM employees e JOIN employees m ON m.id = e.manager_id") == [("Employee", "Manager")]
+    assert query("SELECT description, due_date::TEXT, status FROM goals") == [("Goal", "2030-01-31", "In Progress")]
+    assert query("SELECT is_approved FROM tasks") == [(True,)]
+    assert query("SELECT created_at::TEXT FROM feedback") == [("2029-12-01 09:30:00",)]
+
+@pytest.mark.parametrize("due_date", ["2024-13-45", "2024-02-30", "2024-1-5", "tomorrow"])
+def test_invalid_due_dates_are_reported_not_cast(db, due_date):
+    goals = [
+        {"employee_ref": "e", "description": "Valid", "due_date": "2030-01-01"},
+        {"employee_ref": "e", "description": "Invalid", "due_date": due_date},
+    ]
+    assert _errors(employees=EMPLOYEES, goals=goals) == [("goals", 2, "due_date must be a valid YYYY-MM-DD date")]
+    assert query("SELECT COUNT(*) FROM employees") == [(0,)]
+
+def test_invalid_timestamps_and_ids_are_reported_with_row_numbers(db):
+    Bulk_pms.import_batch(employees=EMPLOYEES)
+    employee_id = query("SELECT id FROM employees WHERE name = 'Employee'")[0][0]
+    goals = [
+        {"employee_id": str(employee_id), "description": "Valid", "due_date": "2030-01-01"},
+        {"employee_id": "99999999999", "description": "Overflowing id", "due_date": "2030-01-01"},
+        {"employee_id": "12abc", "description": "Not a number", "due_date": "2030-01-01"},
+    ]
+    feedback = [
+        {"goal_id": "1", "feedback_text": "Bad time", "created_at": "2024-01-01 25:00"},
+        {"goal_id": "2147483648", "feedback_text": "Overflowing goal id"},
+    ]
+    assert _errors(goals=goals, feedback=feedback) == [
+        ("goals", 2, "employee_id 99999999999 is not an existing employee"),
+        ("goals", 3, "employee_id 12abc is not an existing employee"),
+        ("feedback", 1, "created_at 2024-01-01 25:00 is not a valid timestamp"),
+        ("feedback", 1, "goal_id 1 is not an existing goal"),
+        ("feedback", 2, "goal_id 2147483648 is not an existing goal"),
+    ]
+
+def test_dry_run_validates_without_writing(db):
+    assert Bulk_pms.import_batch(employees=EMPLOYEES, dry_run=True) == {"employees": 2, "goals": 0, "tasks": 0, "feedback": 0}
+    assert query("SELECT COUNT(*) FROM employees") == [(0,)]
+
+def test_export_lists_each_goal_before_its_tasks_and_feedback(db):
+    Bulk_pms.import_batch(
+        employees=EMPLOYEES,
+        goals=[{"ref": f"g{n}", "employee_ref": "e", "description": f"Goal {n}", "due_date": "2030-01-01"} for n in range(2)],
+        tasks=[{"goal_ref": f"g{n}", "description": f"Task {n}"} for n in range(2)],
+        feedback=[{"goal_ref": f"g{n}", "manager_ref": "m", "feedback_text": f"Feedback {n}"} for n in range(2)],
+    )
+    out = io.StringIO()
+    Bulk_pms.export_history(out)
+    out.seek(0)
+    rows = [(row["goal_description"], row["record_type"]) for row in csv.DictReader(out)]
+    assert rows == [(f"Goal {n}", kind) for n in range(2) for kind in ("goal", "task", "feedback")]
+
+@pytest.mark.parametrize("value, type_name", [
+    ("2024-02-29", "date"), ("2023-02-29", "date"), ("2024-01-01 23:59", "timestamp"), ("2024-01-01 24:01", "timestamp"),
+    ("2147483647", "integer"), ("2147483648", "integer"), (None, "integer"),
+])
+def test_fallback_cast_check_agrees_with_pg_input_is_valid(db, value, type_name):
+    # Servers before PostgreSQL 16 get the subtransaction-based version.
+    with be.transaction() as conn:
+        with conn.cursor() as cur:
+            cur.execute(Bulk_pms._CAST_CHECK_FALLBACK)
+            cur.execute("SELECT pg_temp.pms_input_is_valid(%s, %s), COALESCE(pg_input_is_valid(%s, %s), TRUE)",
+                        (value, type_name, value, type_name))
+            fallback, builtin = cur.fetchone()
+    assert fallback == builtin
@@ -0,0 +1,52 @@
+"""The PostgreSQL change feed triggers (migrations 10, 12 and 13)."""
+import json
+import select
+import time
+
+import psycopg2
+import pytest
+
+import Backend_pms as be
+from conftest import latest_id, new_goal
+
+pytestmark = pytest.mark.postgres
+
+@pytest.fixture
+def notifications():
+    """A LISTEN connection on the change channel; call it with n to wait for n events."""
+    conn = psycopg2.connect(**be._connection_params())
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"LISTEN {be.CHANGE_CHANNEL}")
+
+    def received(n):
+        deadline = time.monotonic() + 5
+        while len(conn.notifies) < n and time.monotonic() < deadline:
+            select.select([conn], [], [], 0.1)
+            conn.poll()
+        events = [json.loads(notify.payload) for notify in conn.notifies]
+        conn.notifies.clear()
+        return events
+
+    yield received
+    conn.close()
+
+def test_goal_and_employee_writes_send_events(db, org, notifications):
+    be.set_session("session-a")
+    try:
+        goal_id = new_goal(db, org["employee"])
+        db.create_employee("New hire", org["manager"])
+        new_id = latest_id("employees")
+        db.update_employee_manager(new_id, org["director"])
+    finally:
+        be.set_session(None)
+    assert notifications(3) == [
+        {"table": "goals", "goals": [goal_id], "employees": [org["employee"]], "session": "session-a"},
+        {"table": "employees", "goals": [], "employees": [new_id], "session": "session-a"},
+        {"table": "employees", "goals": [], "employees": [new_id], "session": "session-a"},
+    ]
+
+def test_employee_events_drop_the_cached_org(db, org, notifications):
+    db.create_employee("New hire", org["manager"])
+    (change,) = notifications(1)
+    assert be._change_invalidations(change) == [("employees",), *be._HIERARCHY_ENTITIES]
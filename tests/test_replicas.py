@@ -0,0 +1,102 @@
+"""Read replica routing (DB_REPLICA_DSNS) against a real streaming standby.
+
+Runs only when DB_REPLICA_DSNS names a hot standby of the test database, e.g.
+PMS_STORAGE=postgres DB_NAME=pms_test DB_REPLICA_DSNS="port=5433".
+"""
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+import psycopg2
+import pytest
+
+import Backend_pms as be
+
+pytestmark = [
+    pytest.mark.postgres,
+    pytest.mark.skipif(not os.environ.get("DB_REPLICA_DSNS"), reason="needs DB_REPLICA_DSNS naming a hot standby"),
+]
+
+@be._replica_fallback
+def _served_by_replica(errcode=None):
+    """True if a read-only block ran on a standby; errcode makes it fail there with that error."""
+    with be._connection(read_only=True) as conn:
+        with conn.cursor() as cur:
+            if errcode:
+                cur.execute(f"""
+                    DO $$ BEGIN
+                        IF pg_is_in_recovery() THEN RAISE EXCEPTION 'failed on the replica' USING ERRCODE = '{errcode}'; END IF;
+                    END $$
+                """)
+            cur.execute("SELECT pg_is_in_recovery()")
+            return cur.fetchone()[0]
+
+def _wait_for_replica(timeout=10):
+    """Waits until the replica has replayed this session's writes and serves its reads."""
+    deadline = time.monotonic() + timeout
+    while not _served_by_replica():
+        if time.monotonic() > deadline:
+            pytest.fail(f"replica did not catch up: {be.get_replica_status()}")
+        time.sleep(0.1)
+
+@contextmanager
+def _on_standby(replica):
+    """A superuser connection to the standby itself, outside the replica pool."""
+    conn = psycopg2.connect(**{**replica.params, "cursor_factory": None})
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            yield cur
+    finally:
+        conn.close()
+
+@pytest.fixture
+def replica(db, monkeypatch):
+    """The configured replica, health-checked on every read and caught up with the db fixture."""
+    monkeypatch.setenv("DB_REPLICA_CHECK_INTERVAL", "0")
+    _wait_for_replica()
+    return be._replicas[0]
+
+def test_reads_go_to_the_replica(replica):
+    assert _served_by_replica()
+    assert replica.healthy and replica.error is None
+
+def test_session_reads_its_own_writes(replica):
+    with _on_standby(replica) as standby:
+        standby.execute("SELECT pg_wal_replay_pause()")
+        try:
+            be.create_employee("Written while replay is paused")
+            # The standby has not replayed the insert, so this session reads from the primary...
+            assert not _served_by_replica()
+            assert "Written while replay is paused" in [row[1] for row in be.get_employees()]
+            # ...while a session without writes keeps using the standby.
+            be.set_session(f"reader-{uuid.uuid4()}")
+            try:
+                assert _served_by_replica()
+            finally:
+                be.set_session(None)
+        finally:
+            standby.execute("SELECT pg_wal_replay_resume()")
+
+def test_broken_replica_connection_is_rerun_on_the_primary(replica, monkeypatch, capsys):
+    be.create_employee("Alice")
+    _wait_for_replica()
+    # Skip the health check so the read itself hits the dead connections.
+    monkeypatch.setenv("DB_REPLICA_CHECK_INTERVAL", "3600")
+    with _on_standby(replica) as standby:
+        standby.execute("""
+            SELECT pg_terminate_backend(pid) FROM pg_stat_activity
+            WHERE datname = current_database() AND pid <> pg_backend_pid() AND backend_type = 'client backend'
+        """)
+    be.clear_cache()
+    assert [row[1] for row in be.get_employees()] == ["Alice"]
+    assert "retrying on the primary" in capsys.readouterr().out
+    assert not replica.healthy and replica.pool is None
+
+@pytest.mark.parametrize("errcode", ["query_canceled", "serialization_failure"])
+def test_cancelled_replica_query_does_not_mark_it_down(replica, errcode):
+    pool = replica.pool
+    assert not _served_by_replica(errcode)
+    assert replica.pool is pool and replica.healthy and replica.error is None
+    assert _served_by_replica()
@@ -0,0 +1,47 @@
+"""Report files are written atomically, and a rerun skips only employees with complete reports."""
+import os
+
+import pytest
+
+import Reports_pms
+
+GOALS = [(1, "Ship it", "2030-01-01", "Completed", [("Write code", True)], [("Well done", "Manager", "2030-01-02")])]
+
+def test_rendered_reports_count_as_completed(tmp_path):
+    out_dir = str(tmp_path)
+    assert Reports_pms.render_employee(out_dir, ("csv", "html"), 7, "Employee", GOALS) == 7
+    assert sorted(os.listdir(out_dir)) == ["employee_7.csv", "employee_7.html"]
+    assert Reports_pms.completed_employee_ids(out_dir, ("csv", "html")) == {7}
+
+def test_only_employees_with_every_format_are_completed(tmp_path):
+    out_dir = str(tmp_path)
+    Reports_pms.render_employee(out_dir, ("csv", "html"), 7, "Both", GOALS)
+    Reports_pms.render_employee(out_dir, ("csv",), 8, "CSV only", GOALS)
+    for stray in ("employee_x.csv", "employee_.csv", "notes.csv", "employee_9.csvx"):
+        (tmp_path / stray).write_text("")
+    assert Reports_pms.completed_employee_ids(out_dir, ("csv",)) == {7, 8}
+    assert Reports_pms.completed_employee_ids(out_dir, ("csv", "html")) == {7}
+    assert Reports_pms.completed_employee_ids(out_dir, ("html",)) == {7}
+
+def test_interrupted_write_leaves_no_report(tmp_path):
+    path = Reports_pms.report_path(str(tmp_path), 7, "csv")
+
+    def render(out):
+        out.write("employee,goal_id\n")
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        Reports_pms._write_atomically(path, render)
+    assert not os.path.exists(path)
+    assert os.path.exists(path + ".part")
+    assert Reports_pms.completed_employee_ids(str(tmp_path), ("csv",)) == set()
+
+    # The rerun overwrites the partial file and then renames it into place.
+    Reports_pms.render_employee(str(tmp_path), ("csv",), 7, "Employee", GOALS)
+    assert os.listdir(tmp_path) == ["employee_7.csv"]
+    with open(path, encoding="utf-8") as report:
+        assert report.read().splitlines()[1:] == [
+            "Employee,1,Ship it,2030-01-01,Completed,goal,,,",
+            "Employee,1,Ship it,2030-01-01,Completed,task,Write code,Approved,",
+            "Employee,1,Ship it,2030-01-01,Completed,feedback,Well done,Manager,2030-01-02",
+        ]
@@ -0,0 +1,31 @@
+"""The hand-run "SQL Schema" script and Migrations_pms.migrate() build the same database."""
+import os
+
+import psycopg2
+import pytest
+
+import Backend_pms as be
+import Migrations_pms
+
+pytestmark = pytest.mark.postgres
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "SQL Schema")
+
+def _tables(cur, schema):
+    cur.execute("SELECT tablename FROM pg_tables WHERE schemaname = %s ORDER BY 1", (schema,))
+    return [row[0] for row in cur.fetchall()]
+
+def test_script_records_its_migrations(db):
+    conn = psycopg2.connect(**be._connection_params())
+    try:
+        with conn.cursor() as cur:
+            # A scratch schema in a transaction that is rolled back.
+            cur.execute("CREATE SCHEMA pms_schema_script; SET LOCAL search_path = pms_schema_script")
+            with open(SCHEMA_FILE, encoding="utf-8") as script:
+                cur.execute(script.read())
+            assert Migrations_pms.current_version(cur) == 2
+            assert Migrations_pms.migrate(conn) == [step for step, _, _ in Migrations_pms.MIGRATIONS if step > 2]
+            assert _tables(cur, "pms_schema_script") == _tables(cur, "public")
+    finally:
+        conn.rollback()
+        conn.close()
@@ -0,0 +1,180 @@
+"""The SQLite engine keeps the PostgreSQL schema's rules and the shared function contracts."""
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+import Sqlite_pms
+from conftest import latest_id, new_goal
+
+pytestmark = pytest.mark.sqlite
+
+GREAT_JOB = "Great job on completing this goal!"
+
+def _scalar(sql, params=()):
+    with Sqlite_pms.transaction() as conn:
+        return conn.execute(sql, params).fetchone()[0]
+
+def _great_jobs(goal_id):
+    return _scalar("SELECT COUNT(*) FROM feedback WHERE goal_id = ? AND feedback_text = ?", (goal_id, GREAT_JOB))
+
+# --- Constraints ---
+def test_status_check_rejects_unknown_status(db, org):
+    goal_id = new_goal(db, org["employee"])
+    with pytest.raises(sqlite3.IntegrityError):
+        db.update_goal_status(goal_id, "Done")
+    assert db.get_goals_for_employee(org["employee"])[0][3] == "Draft"
+
+def test_deleting_a_goal_cascades_to_tasks_and_feedback(db, org):
+    goal_id = new_goal(db, org["employee"])
+    kept_id = new_goal(db, org["employee"])
+    for target in (goal_id, kept_id):
+        db.create_task(target, "Task")
+        db.create_feedback(target, org["manager"], "Feedback")
+    db.get_tasks_for_goals([goal_id, kept_id])
+    db.delete_goal(goal_id)
+    assert _scalar("SELECT COUNT(*) FROM tasks WHERE goal_id = ?", (goal_id,)) == 0
+    assert _scalar("SELECT COUNT(*) FROM feedback WHERE goal_id = ?", (goal_id,)) == 0
+    assert db.get_tasks_for_goals([goal_id, kept_id]) == {goal_id: [], kept_id: [db.get_tasks_for_goal(kept_id)[0]]}
+
+def test_reporting_line_cycles_are_rejected(db, org):
+    for employee_id, manager_id in ((org["director"], org["employee"]), (org["director"], org["director"])):
+        with pytest.raises(sqlite3.IntegrityError):
+            db.update_employee_manager(employee_id, manager_id)
+    assert db.get_chain_of_command(org["employee"])[-1][0] == org["director"]
+    db.update_employee_manager(org["employee"], org["director"])
+    assert [row[0] for row in db.get_direct_reports(org["director"])] == [org["employee"], org["manager"]]
+
+# --- Goal completion ---
+def test_completing_a_goal_adds_one_great_job_feedback(db, org):
+    goal_id = new_goal(db, org["employee"])
+    db.update_goal_status(goal_id, "In Progress")
+    assert _great_jobs(goal_id) == 0
+    db.update_goal_status(goal_id, "Completed")
+    db.update_goal_status(goal_id, "Completed")
+    feedback = db.get_feedback_for_goal(goal_id)
+    assert [(text, name) for text, name, _ in feedback] == [(GREAT_JOB, "Manager")]
+
+def test_bulk_completion_adds_great_job_only_to_goals_that_changed(db, org):
+    goal_ids = [new_goal(db, org["employee"], f"Goal {n}") for n in range(3)]
+    db.update_goal_status(goal_ids[0], "Completed")
+    cached = db.get_feedback_for_goals(goal_ids)
+    assert db.update_goals_status(goal_ids, "Completed") == 2
+    assert [_great_jobs(goal_id) for goal_id in goal_ids] == [1, 1, 1]
+    reloaded = db.get_feedback_for_goals(goal_ids)
+    assert reloaded[goal_ids[0]] == cached[goal_ids[0]]
+    assert all(rows[0][0] == GREAT_JOB for rows in reloaded.values())
+
+def test_completed_at_follows_status(db, org):
+    goal_id = new_goal(db, org["employee"])
+    completed_at = "SELECT completed_at FROM goals WHERE id = ?"
+    assert _scalar(completed_at, (goal_id,)) is None
+    db.update_goals_status([goal_id], "Completed")
+    assert _scalar(completed_at, (goal_id,)) is not None
+    db.update_goals_status([goal_id], "In Progress")
+    assert _scalar(completed_at, (goal_id,)) is None
+
+def test_completed_at_is_set_on_insert_unless_given(db, org):
+    with Sqlite_pms.transaction() as conn:
+        conn.execute(
+            "INSERT INTO goals (employee_id, description, due_date, status) VALUES (?, 'Imported', '2024-01-01', 'Completed')",
+            (org["employee"],)
+        )
+        conn.execute(
+            """INSERT INTO goals (employee_id, description, due_date, status, completed_at)
+               VALUES (?, 'Imported with date', '2024-01-01', 'Completed', '2024-01-02 09:00:00.000')""",
+            (org["employee"],)
+        )
+    rows = dict(Sqlite_pms._connect().execute("SELECT description, completed_at FROM goals").fetchall())
+    assert rows["Imported"] is not None
+    assert str(rows["Imported with date"]) == "2024-01-02 09:00:00"
+
+# --- Keyset pagination ---
+def _all_pages(fetch, page_size):
+    rows, after, pages = [], None, 0
+    while True:
+        page, after = fetch(page_size=page_size, after=after)
+        rows.extend(page)
+        pages += 1
+        assert len(page) <= page_size
+        if after is None:
+            return rows, pages
+
+@pytest.mark.parametrize("count, page_size, pages", [(0, 2, 1), (4, 2, 2), (5, 2, 3), (5, 5, 1), (5, 1, 5)])
+def test_goal_pages_cover_every_goal_once(db, org, count, page_size, pages):
+    # Pairs of goals share a due date, so the id tie-breaker decides the order within a pair.
+    for n in range(count):
+        new_goal(db, org["employee"], f"Goal {n}", (date(2030, 1, 1) + timedelta(days=n // 2)).isoformat())
+    rows, page_count = _all_pages(lambda **page: db.get_goals_for_employee_page(org["employee"], **page), page_size)
+    expected = sorted(db.get_goals_for_employee(org["employee"]), key=lambda goal: (goal[2], goal[0]), reverse=True)
+    assert rows == expected
+    assert page_count == pages
+    summaries, _ = _all_pages(lambda **page: db.get_goal_summaries_page(org["employee"], **page), page_size)
+    assert [summary[:4] for summary in summaries] == expected
+
+def test_feedback_pages_cover_every_feedback_once(db, org):
+    goal_id = new_goal(db, org["employee"])
+    for n in range(7):
+        db.create_feedback(goal_id, org["manager"], f"Feedback {n}")
+    rows, pages = _all_pages(lambda **page: db.get_feedback_for_goal_page(goal_id, **page), 3)
+    assert pages == 3
+    assert rows == db.get_feedback_for_goal(goal_id)
+    assert len({text for text, _, _ in rows}) == 7
+
+# --- Search ---
+def test_search_ranks_dense_short_matches_first(db, org):
+    goal_id = new_goal(db, org["employee"], "Budget review: budget")
+    db.create_task(goal_id, "Budget " + "and a long list of unrelated details " * 10)
+    db.create_feedback(goal_id, org["manager"], "Nothing relevant here")
+    other_id = new_goal(db, org["director"], "Quarterly budget")
+    results, after = db.search("budget")
+    assert after is None
+    assert [(kind, result_id) for kind, result_id, *_ in results] == [("goal", goal_id), ("goal", other_id), ("task", latest_id("tasks"))]
+    ranks = [result[6] for result in results]
+    assert ranks == sorted(ranks, reverse=True)
+    assert results[0][3:5] == (org["employee"], "Employee")
+
+def test_search_requires_every_word_and_respects_scope(db, org):
+    review_id = new_goal(db, org["employee"], "Budget review")
+    new_goal(db, org["director"], "Budget planning")
+    results, _ = db.search("budget review")
+    assert [result[1] for result in results] == [review_id]
+    assert results[0][5] == "**Budget** **review**"
+    assert [result[4] for result in db.search("budget", manager_id=org["manager"])[0]] == ["Employee"]
+    assert [result[4] for result in db.search("budget", employee_id=org["director"])[0]] == ["Director"]
+    assert db.search("   ") == ([], None)
+
+def test_search_pages_follow_rank_order(db, org):
+    for n in range(5):
+        new_goal(db, org["employee"], "Budget " * (n + 1))
+    everything, _ = db.search("budget", page_size=20)
+    paged, pages = _all_pages(lambda **page: db.search("budget", **page), 2)
+    assert paged == everything
+    assert pages == 3
+
+# --- Change feed ---
+def test_change_events_name_the_writing_session(db, org):
+    events = []
+    db.subscribe_changes(events.append)
+    try:
+        db.set_session("session-a")
+        goal_id = new_goal(db, org["employee"])
+        db.set_session(None)
+        db.create_task(goal_id, "Task")
+    finally:
+        db.unsubscribe_changes(events.append)
+    assert events == [
+        {"table": "goals", "goals": [goal_id], "employees": [org["employee"]], "session": "session-a"},
+        {"table": "tasks", "goals": [goal_id], "employees": [org["employee"]], "session": None},
+    ]
+
+def test_employee_writes_send_change_events(db, org):
+    events = []
+    db.subscribe_changes(events.append)
+    try:
+        db.create_employee("New hire", org["manager"])
+        new_id = latest_id("employees")
+        db.update_employee_manager(new_id, org["director"])
+    finally:
+        db.unsubscribe_changes(events.append)
+    assert events == [{"table": "employees", "goals": [], "employees": [new_id], "session": None}] * 2
@@ -0,0 +1,40 @@
+"""The streaming generators hold no connection or transaction between rows."""
+from datetime import date, timedelta
+
+import Backend_pms as be
+import Sqlite_pms
+from conftest import new_goal
+
+def _holding_connection():
+    """True while this thread has an SQLite transaction or a pooled PostgreSQL connection open."""
+    if be.STORAGE == "sqlite":
+        return Sqlite_pms._connect().in_transaction
+    return bool(be._pool._used)
+
+def test_interleaved_generators_and_writes(db, org):
+    goal_ids = [
+        new_goal(db, org["employee"], f"Goal {n}", (date(2030, 1, 1) + timedelta(days=n)).isoformat())
+        for n in range(5)
+    ]
+    for n in range(5):
+        db.create_feedback(goal_ids[0], org["manager"], f"Feedback {n}")
+    assert db.get_tasks_for_goal(goal_ids[1]) == []
+
+    goals = db.iter_goals_for_employee(org["employee"], 2)
+    feedback = db.iter_feedback_for_goal(goal_ids[0], 2)
+    streamed_goals = [next(goals)]
+    streamed_feedback = [next(feedback)]
+    assert not _holding_connection()
+    # A write between rows commits on its own and drops its cache entries at once.
+    db.create_task(goal_ids[1], "Written while streaming")
+    assert [task[1] for task in db.get_tasks_for_goal(goal_ids[1])] == ["Written while streaming"]
+    streamed_goals += list(goals)
+    # Closed in a different order from the one they were started in.
+    goals.close()
+    streamed_feedback += list(feedback)
+    feedback.close()
+
+    assert [goal[0] for goal in streamed_goals] == goal_ids[::-1]
+    assert streamed_feedback == db.get_feedback_for_goal(goal_ids[0])
+    db.create_task(goal_ids[1], "Written afterwards")
+    assert len(db.get_tasks_for_goal(goal_ids[1])) == 2
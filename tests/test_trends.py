@@ -0,0 +1,32 @@
+"""Trend rollups advance from a watermark and only drop the cached series when they change."""
+import Metrics_pms as metrics
+import pytest
+
+from conftest import latest_id
+
+pytestmark = pytest.mark.postgres
+
+def _statements(func, *args):
+    """How many statements func ran; 0 means it was served from the read cache."""
+    metrics.start_trace()
+    try:
+        func(*args)
+    finally:
+        calls = [call for call in metrics.stop_trace() if call.depth == 0]
+    return sum(call.statements for call in calls)
+
+def test_refresh_keeps_the_cache_when_nothing_new_was_counted(db, org, monkeypatch):
+    monkeypatch.setenv("PMS_TREND_SETTLE_SECONDS", "0")
+    db.create_goal(org["employee"], "Goal", "2030-01-01")
+    assert db.refresh_trends()
+    before = db.get_goal_trends("week", 1)
+    assert before[-1][1] == 1
+
+    # The watermark moves on, but no rollup row changes.
+    assert db.refresh_trends()
+    assert _statements(db.get_goal_trends, "week", 1) == 0
+
+    db.update_goal_status(latest_id("goals"), "Completed")
+    assert db.refresh_trends()
+    assert _statements(db.get_goal_trends, "week", 1) == 1
+    assert db.get_goal_trends("week", 1) != before